@@ -0,0 +1,258 @@
+from __future__ import unicode_literals, print_function
+
+import base64
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+
+from qordoba import session
+
+log = logging.getLogger('qordoba')
+
+CASSETTE_VERSION = 1
+
+# Only these response headers are saved. Everything else, including cookies, is dropped.
+RECORDED_HEADERS = ('Content-Type', 'Content-Length', 'Retry-After')
+
+SCRUBBED = '***'
+
+_CASSETTE = None
+
+
+class CassetteError(Exception):
+    """
+    Request can not be served from the cassette
+    """
+
+
+def request_key(method, url, json=None, data=None, files=None, **kwargs):
+    """
+    Identify a request by everything which selects the response: method, url and body.
+    Uploads are identified by the field and the file name, not by the content.
+    """
+    parts = [method.upper(), url]
+    if json is not None:
+        parts.append(_dumps(json))
+    if data:
+        parts.append(_dumps(data))
+    if files:
+        parts.append(','.join(sorted('{}={}'.format(field, value[0]) for field, value in files.items())))
+    return ' '.join(parts)
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return io.open(path, mode)
+
+
+class Recorder(object):
+    """
+    Send requests with ``requests`` and save every request/response pair to a cassette.
+
+    The cassette is a JSON lines file, gzip compressed when the name ends with ``.gz``. The first line keeps the
+    settings of the run without the access token. Response bodies are saved once per content, so the same
+    response of many requests costs one line. Request headers are never saved and the access token is removed
+    from urls and bodies.
+    """
+
+    def __init__(self, path, send=None):
+        self.path = path
+        self._send = send
+        self._secrets = set()
+        self._bodies = set()
+        self._header_written = False
+        self._lock = threading.Lock()
+        self._file = _open(path, 'wb')
+
+    def set_settings(self, config):
+        """
+        Save the settings of the run, so the cassette can be replayed without a config file.
+        """
+        if config.get('access_token'):
+            self._secrets.add(config['access_token'])
+        with self._lock:
+            self._write_header(config)
+
+    def _write_header(self, config=None):
+        if self._header_written:
+            return
+        config = config or {}
+        self._write({'cassette': CASSETTE_VERSION, 'recorded': int(time.time()), 'api_url': config.get('api_url'),
+                     'project_id': config.get('project_id'), 'organization_id': config.get('organization_id')})
+        self._header_written = True
+
+    def _write(self, entry):
+        self._file.write((_dumps(entry) + '\n').encode('utf-8'))
+
+    def _scrub(self, text):
+        for secret in self._secrets:
+            text = text.replace(secret, SCRUBBED)
+        return text
+
+    def __call__(self, method, url, headers=None, **kwargs):
+        token = (headers or {}).get('X-AUTH-TOKEN')
+        if token:
+            self._secrets.add(token)
+
+        key = request_key(method, url, **kwargs)
+        started = time.time()
+        try:
+            resp = (self._send or session.send)(method, url, headers=headers, **kwargs)
+            # reading the content consumes a stream, so the caller gets a stream over the saved content
+            content = resp.content
+        except requests.RequestException as e:
+            self._record(key, {'error': self._scrub(str(e)), 'elapsed': time.time() - started})
+            raise
+
+        if kwargs.get('stream'):
+            resp.raw = io.BytesIO(content)
+        entry = {
+            'status': resp.status_code,
+            'reason': resp.reason,
+            'headers': {k: resp.headers[k] for k in RECORDED_HEADERS if k in resp.headers},
+            'elapsed': time.time() - started,
+        }
+        self._record(key, entry, content)
+        return resp
+
+    def _record(self, key, entry, content=None):
+        entry['key'] = self._scrub(key)
+        with self._lock:
+            self._write_header()
+            if content is not None:
+                entry['body'] = self._write_body(content)
+            self._write(entry)
+            self._file.flush()
+
+    def _write_body(self, content):
+        try:
+            text = self._scrub(content.decode('utf-8'))
+        except UnicodeDecodeError:
+            text = None
+        data = text.encode('utf-8') if text is not None else content
+        digest = hashlib.sha1(data).hexdigest()
+        if digest not in self._bodies:
+            self._bodies.add(digest)
+            if text is not None:
+                self._write({'sha1': digest, 'text': text})
+            else:
+                self._write({'sha1': digest, 'base64': base64.b64encode(content).decode('ascii')})
+        return digest
+
+    def close(self):
+        with self._lock:
+            self._write_header()
+            self._file.close()
+
+
+class Player(object):
+    """
+    Serve the responses of a cassette instead of sending requests.
+
+    Responses to the same request are served in the recorded order; the last one is repeated when the run sends
+    the request more often. Every response takes the recorded time multiplied by ``scale``; 0 replays as fast as
+    possible.
+    """
+
+    def __init__(self, path, scale=1.0):
+        self.path = path
+        self.scale = scale
+        self.settings = {}
+        self._interactions = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        bodies = {}
+        with _open(self.path, 'rb') as f:
+            for line in f:
+                entry = json.loads(line.decode('utf-8'))
+                if 'cassette' in entry:
+                    self.settings = {k: entry.get(k) for k in ('api_url', 'project_id', 'organization_id')}
+                elif 'sha1' in entry:
+                    if 'text' in entry:
+                        bodies[entry['sha1']] = entry['text'].encode('utf-8')
+                    else:
+                        bodies[entry['sha1']] = base64.b64decode(entry['base64'])
+                else:
+                    if entry.get('body'):
+                        entry['content'] = bodies[entry['body']]
+                    self._interactions[entry['key']].append(entry)
+
+    def __call__(self, method, url, headers=None, **kwargs):
+        key = request_key(method, url, **kwargs)
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if not interactions:
+                raise CassetteError('Request `{} {}` was not recorded in `{}`'.format(method, url, self.path))
+            entry = interactions.popleft() if len(interactions) > 1 else interactions[0]
+
+        if self.scale:
+            time.sleep(entry['elapsed'] * self.scale)
+
+        if 'error' in entry:
+            raise requests.ConnectionError(entry['error'])
+        return self._build_response(method, url, entry, **kwargs)
+
+    @staticmethod
+    def _build_response(method, url, entry, stream=False, **kwargs):
+        content = entry.get('content', b'')
+        resp = requests.Response()
+        resp.status_code = entry['status']
+        resp.reason = entry.get('reason')
+        resp.headers.update(entry.get('headers', {}))
+        resp.url = url
+        resp.elapsed = datetime.timedelta(seconds=entry['elapsed'])
+        resp.request = requests.Request(method, url).prepare()
+        resp.raw = io.BytesIO(content)
+        if not stream:
+            resp._content = content
+        return resp
+
+
+def enable_recording(path):
+    global _CASSETTE
+    disable_cassette()
+    _CASSETTE = Recorder(path)
+    return _CASSETTE
+
+
+def enable_replay(path, scale=1.0):
+    global _CASSETTE
+    disable_cassette()
+    _CASSETTE = Player(path, scale=scale)
+    return _CASSETTE
+
+
+def disable_cassette():
+    global _CASSETTE
+    if isinstance(_CASSETTE, Recorder):
+        _CASSETTE.close()
+    _CASSETTE = None
+
+
+def get_cassette():
+    """
+    :return: Active Recorder, Player or None
+    """
+    return _CASSETTE
+
+
+def get_transport():
+    """
+    :return: callable with the signature of ``requests.request`` which sends the API requests
+    """
+    return _CASSETTE or session.send
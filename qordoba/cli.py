@@ -5,20 +5,40 @@ import os
 import sys
 import logging
 import itertools
+import time
 
 from abc import ABCMeta, abstractmethod
 
 from terminaltables import AsciiTable
 
-from qordoba.commands.delete import delete_command
+from qordoba.cassette import enable_recording, enable_replay, disable_cassette, get_cassette, Recorder, Player
+from qordoba.concurrency import JobsType, parse_jobs
+from qordoba.commands.delete import delete_command, read_targets
+from qordoba.deadline import set_deadline, clear_deadline
+from qordoba.dryrun import enable_dry_run, disable_dry_run
+from qordoba.hedging import enable_hedging, disable_hedging
 from qordoba.commands.init import init_command
-from qordoba.commands.ls import ls_command
+from qordoba.commands.ls import ls_command, HEADERS as LS_HEADERS, PAGE_SIZE
 from qordoba.commands.pull import pull_command
 from qordoba.commands.push import push_command
-from qordoba.commands.status import status_command
+from qordoba.commands.status import status_command, org_status_command, page_status_command
+from qordoba.commands.sync import sync_command, SyncAction
+from qordoba.commands.sync_meta import sync_meta_command
+from qordoba.memo import DEFAULT_TTL
+from qordoba.mirror import DEFAULT_MIRROR_PATH
+from qordoba.output import FORMATS, TABLE, write_rows
+from qordoba.journal import Journal, cleanup_temp_files, default_journal_path
 from qordoba.settings import load_settings, SettingsError
-from qordoba.utils import with_metaclass, FilePathType, CommaSeparatedSet
-from qordoba.log import init
+from qordoba.sharding import ShardType
+from qordoba.utils import with_metaclass, FilePathType, CommaSeparatedSet, PositiveIntType, PositiveFloatType
+from qordoba.log import init, flush as flush_log
+from qordoba.metrics import enable_metrics, finish_run, StatsdAddressType, StatsdSink, write_prometheus_textfile
+from qordoba.progress import enable_progress, disable_progress
+from qordoba.profiling import create_profiler, PROFILE_MODES
+from qordoba.project import PageStatus
+from qordoba.routes import TimeoutType, TIMEOUT_CLASSES
+from qordoba.tracing import enable_tracing, format_summary
+from qordoba.workspace import DEFAULT_WORKSPACE_PATH, WorkspaceError, load_workspace, run_workspace, summary_rows
 
 log = logging.getLogger('qordoba')
 
@@ -29,6 +49,8 @@ try:
     def exithandler(signum, frame):
         signal.signal(signal.SIGINT, signal.SIG_IGN)
         signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for path in cleanup_temp_files():
+            log.debug('Removed unfinished download `{}`'.format(path))
         sys.exit(1)
 
 
@@ -65,14 +87,62 @@ class BaseHandler(with_metaclass(ABCMeta)):
         self._curdir = os.path.abspath(os.getcwd())
 
     def load_settings(self):
-        config, loaded = load_settings(access_token=self.access_token,
-                                       project_id=self.project_id,
-                                       organization_id=self.organization_id)
-        config.validate()
+        cassette = get_cassette()
+        if isinstance(cassette, Player):
+            # the recorded requests are matched by url, so the run has to use the recorded project
+            config, loaded = load_settings(access_token=self.access_token or 'replay',
+                                           project_id=cassette.settings['project_id'],
+                                           organization_id=cassette.settings['organization_id'],
+                                           api_url=cassette.settings['api_url'])
+        else:
+            config, loaded = load_settings(access_token=self.access_token,
+                                           project_id=self.project_id,
+                                           organization_id=self.organization_id,
+                                           api_url=self.api_url)
+        self.configure(config, self._curdir)
+        if isinstance(cassette, Recorder):
+            cassette.set_settings(config)
         if not loaded:
             log.info('Config not found...')
         return config
 
+    def configure(self, config, curdir):
+        """
+        Apply the options of the command line to the settings of a project in ``curdir``.
+        """
+        if self.timeouts:
+            config['timeouts'] = dict(config.get('timeouts') or {}, **dict(self.timeouts))
+        if self.cache_ttl is not None:
+            config['cache_ttl'] = self.cache_ttl
+        if hasattr(self, 'mirror'):
+            config['mirror'] = os.path.join(curdir, self.mirror or DEFAULT_MIRROR_PATH)
+            config['offline'] = getattr(self, 'offline', False)
+            # an explicit --mirror without --offline is used as a warm start
+            config['warm_start'] = bool(self.mirror) and not config['offline']
+        config.validate()
+
+    def load_workspace(self):
+        """
+        :rtype: list of qordoba.workspace.WorkspaceProject
+        """
+        projects = load_workspace(os.path.join(self._curdir, self.workspace or DEFAULT_WORKSPACE_PATH),
+                                  access_token=self.access_token, organization_id=self.organization_id,
+                                  api_url=self.api_url)
+        for project in projects:
+            self.configure(project.config, project.curdir)
+        return projects
+
+    def run_all_projects(self, run):
+        """
+        Run the command in every project of the workspace and print a summary per project.
+        :param run: callable(WorkspaceProject, WorkerPool) which returns the number of processed files
+        """
+        results = run_workspace(self.load_workspace(), run, jobs=self.jobs)
+        print(AsciiTable(summary_rows(results)).table)
+        failed = [result for result in results if result.error is not None]
+        if failed:
+            raise WorkspaceError('{} of {} projects failed'.format(len(failed), len(results)))
+
     @classmethod
     def register(cls, root, **kwargs):
         kwargs.setdefault('name', cls.name)
@@ -91,8 +161,46 @@ class BaseHandler(with_metaclass(ABCMeta)):
         parser.add_argument('--organization-id', required=False, type=int, dest='organization_id',
                             help='The ID of your Qordoba organization.',
                             default=None)
+        parser.add_argument('--api-url', required=False, type=str, dest='api_url',
+                            help='Base url of the Qordoba API.',
+                            default=None)
+        parser.add_argument('--timeout', dest='timeouts', metavar='CLASS=SECONDS', action='append',
+                            type=TimeoutType(), default=None,
+                            help='Connect timeout (connect=SECONDS) or read timeout of an endpoint class: {}. '
+                                 'Can be repeated.'.format(', '.join(TIMEOUT_CLASSES)))
+        parser.add_argument('--cache-ttl', dest='cache_ttl', metavar='SECONDS', type=float, default=None,
+                            help='Reuse the project, page listings and page details fetched in the last SECONDS '
+                                 'of the run. 0 disables it. Default: {:.0f}.'.format(DEFAULT_TTL))
         parser.add_argument('--traceback', dest='traceback', action='store_true')
         parser.add_argument('--debug', dest='debug', default=False, action='store_true')
+        parser.add_argument('--trace', dest='trace', metavar='FILE', type=str, default=None,
+                            help='Save a span for every API request. '
+                                 'Chrome trace format for *.json files, JSONL otherwise.')
+        parser.add_argument('--stats', dest='stats', default=False, action='store_true',
+                            help='Print API latency and call count summary at the end of the run.')
+        parser.add_argument('--metrics-file', dest='metrics_file', metavar='FILE', type=str, default=None,
+                            help='Write run metrics to FILE in the Prometheus textfile format.')
+        parser.add_argument('--statsd', dest='statsd', metavar='HOST:PORT', type=StatsdAddressType(), default=None,
+                            help='Send run metrics over UDP in the StatsD line protocol. Default port: 8125')
+        parser.add_argument('--profile', dest='profile', default=None, choices=PROFILE_MODES,
+                            help='Profile the command. `cpu` saves pstats and collapsed stacks, '
+                                 '`mem` saves peak memory and top allocation sites per stage.')
+        parser.add_argument('--profile-output', dest='profile_output', metavar='PREFIX', type=str, default=None,
+                            help='Path prefix of the profile files. Default: qor-<command>-profile')
+        parser.add_argument('--hedge', dest='hedge', metavar='PERCENTILE', nargs='?', type=float, const=95.0,
+                            default=None,
+                            help='Send a duplicate of a read request which is slower than the PERCENTILE latency '
+                                 'of its endpoint and use the first response.')
+        parser.add_argument('--hedge-budget', dest='hedge_budget', metavar='FRACTION', type=float, default=0.05,
+                            help='Maximum share of extra requests sent by --hedge.')
+        cassette = parser.add_mutually_exclusive_group()
+        cassette.add_argument('--record', dest='record', metavar='FILE', type=str, default=None,
+                              help='Save all API requests and responses to a cassette, gzipped for *.gz files. '
+                                   'The access token is not saved.')
+        cassette.add_argument('--replay', dest='replay', metavar='FILE', type=str, default=None,
+                              help='Serve the API responses from a cassette instead of the API.')
+        parser.add_argument('--replay-scale', dest='replay_scale', metavar='FACTOR', type=float, default=1.0,
+                            help='Multiply the recorded response times on --replay. 0 replays without delays.')
         parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                             help='Show this help message and exit.')
 
@@ -106,6 +214,88 @@ class BaseHandler(with_metaclass(ABCMeta)):
         pass
 
 
+def add_worker_arguments(parser, journal=True):
+    """
+    :param bool journal: add the options of commands which shard and journal their work
+    """
+    parser.add_argument('-j', '--jobs', dest='jobs', type=JobsType(), default=1, metavar='N|auto[:MAX]',
+                        help='Number of files processed in parallel. `auto` adapts the number to the API: it '
+                             'grows while requests are fast and shrinks on throttling, errors and slow '
+                             'responses, up to MAX (default: 32).')
+    parser.add_argument('--progress', dest='progress', nargs='?', type=float, const=5.0, default=None,
+                        metavar='SECONDS', help='Report throughput and ETA every SECONDS.')
+    parser.add_argument('--quiet-summary', dest='quiet_summary', action='store_true',
+                        help='Do not log every file. Print only the aggregated numbers at the end.')
+    parser.add_argument('--deadline', dest='deadline', metavar='SECONDS', type=float, default=None,
+                        help='Stop starting new files after SECONDS, finish the files in flight and report '
+                             'what was left undone.')
+    if not journal:
+        return
+    parser.add_argument('--shard', dest='shard', type=ShardType(), default=None, metavar='I/N',
+                        help='Process only the I-th of N deterministic parts of the work, e.g. 2/4. '
+                             'Push splits source files, pull splits page x language pairs.')
+    parser.add_argument('--resume', dest='resume', action='store_true',
+                        help='Skip the files finished by an interrupted run and process only the rest.')
+    parser.add_argument('--journal', dest='journal', metavar='FILE', type=str, default=None,
+                        help='Journal of the finished files. Default: .qordoba-<command>.journal')
+
+
+def add_mirror_arguments(parser, offline=None):
+    """
+    :param str offline: help of the --offline option; None if the command has no such option
+    """
+    parser.add_argument('--mirror', dest='mirror', metavar='FILE', type=str, default=None,
+                        help='Local mirror of the project made by `qor sync-meta`, which also keeps the state '
+                             'of `qor sync`. Without --offline the changed pages are refreshed in the mirror and '
+                             'the stats of the unchanged ones are read from it. Default: {}'
+                             .format(DEFAULT_MIRROR_PATH))
+    if offline:
+        parser.add_argument('--offline', dest='offline', action='store_true', help=offline)
+
+
+def add_format_argument(parser):
+    parser.add_argument('--format', dest='format', choices=FORMATS, default=TABLE,
+                        help='Output format. jsonl and csv rows are written as soon as they are known.')
+
+
+def add_dry_run_argument(parser):
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true',
+                        help='Only discover the work and report the files, bytes, API requests and estimated '
+                             'duration. Nothing is changed remotely or locally.')
+
+
+def add_workspace_arguments(parser):
+    parser.add_argument('--all-projects', dest='all_projects', action='store_true',
+                        help='Run the command in every project of the workspace in one process. The projects '
+                             'share the connections, the language catalog and the worker pool.')
+    parser.add_argument('--workspace', dest='workspace', metavar='FILE', type=str, default=None,
+                        help='Workspace config which lists the projects. Default: {}'
+                        .format(DEFAULT_WORKSPACE_PATH))
+
+
+def open_journal(handler, config, curdir=None):
+    """
+    Journal of the push/pull run. Call ``close_journal`` when the run succeeds.
+
+    A dry run only reads the journal it would resume, so the finished units are not counted. It never writes it.
+    :param curdir: directory of the project, the current directory by default
+    :return: Journal or None
+    """
+    curdir = curdir or handler._curdir
+    path = os.path.join(curdir, handler.journal) if handler.journal else default_journal_path(curdir, handler.name)
+    if handler.dry_run and not (handler.resume and os.path.exists(path)):
+        return None
+    return Journal(path, handler.name, config['project_id'], resume=handler.resume)
+
+
+def close_journal(handler, journal):
+    """
+    Drop the journal of a successful run, a dry run keeps it.
+    """
+    if journal is not None and not handler.dry_run:
+        journal.remove()
+
+
 class InitHandler(BaseHandler):
     name = 'init'
     help = """
@@ -114,7 +304,7 @@ class InitHandler(BaseHandler):
 
     def main(self):
         init_command(self._curdir, self.access_token, self.project_id, organization_id=self.organization_id,
-                     force=self.force)
+                     api_url=self.api_url, force=self.force)
 
     @classmethod
     def register(cls, root, **kwargs):
@@ -133,6 +323,9 @@ class InitHandler(BaseHandler):
         parser.add_argument('--project-id', type=int, required=True, dest='project_id',
                             help='The ID of your Qordoba project.',
                             default=None)
+        parser.add_argument('--api-url', type=str, required=False, dest='api_url',
+                            help='Base url of the Qordoba API.',
+                            default=None)
 
         parser.add_argument('--traceback', dest='traceback', action='store_true')
         parser.add_argument('--debug', dest='debug', action='store_true')
@@ -150,10 +343,36 @@ class StatusHandler(BaseHandler):
     def main(self):
         config = self.load_settings()
 
-        rows = list(status_command(config))
+        if self.org:
+            config.validate(keys=('organization_id',))
+            if config.get('offline'):
+                raise SettingsError('--org can not run with --offline')
+            rows = org_status_command(config, jobs=self.jobs)
+        elif self.pages:
+            rows = page_status_command(config, jobs=self.jobs)
+        else:
+            rows = status_command(config)
+
+        try:
+            write_rows(rows, fmt=self.format)
+        finally:
+            # stops the workers of the page matrix when the output fails
+            rows.close()
 
-        table = AsciiTable(rows).table
-        print(table)
+    @classmethod
+    def register(cls, *args, **kwargs):
+        parser = super(StatusHandler, cls).register(*args, **kwargs)
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument('--org', dest='org', action='store_true',
+                           help='Show the status of every project in the organization.')
+        group.add_argument('--pages', dest='pages', action='store_true',
+                           help='Show the completion of every page in every language.')
+        parser.add_argument('-j', '--jobs', dest='jobs', type=JobsType(), default=8, metavar='N|auto[:MAX]',
+                            help='Number of progress reports (--org) or page stats (--pages) requested in '
+                                 'parallel.')
+        add_format_argument(parser)
+        add_mirror_arguments(parser, offline='Show the progress saved by the last `qor sync-meta`.')
+        return parser
 
 
 class PullHandler(BaseHandler):
@@ -178,6 +397,11 @@ class PullHandler(BaseHandler):
         group.add_argument('--replace', dest='replace', action='store_true', help='Replace existing file.')
         group.add_argument('--set-new', dest='set_new', action='store_true',
                            help='Ask to set new filename if file exists.')
+        add_worker_arguments(parser)
+        add_mirror_arguments(parser, offline='Select the pages from the local mirror instead of searching the '
+                                             'API. Translations are still downloaded.')
+        add_dry_run_argument(parser)
+        add_workspace_arguments(parser)
         return parser
 
     def get_update_action(self):
@@ -191,12 +415,25 @@ class PullHandler(BaseHandler):
         return action
 
     def main(self):
-        config = self.load_settings()
+        if self.all_projects:
+            return self.run_all_projects(self.pull)
+        self.pull(None, self.jobs)
+
+    def pull(self, project, jobs):
+        """
+        :param project: WorkspaceProject or None for the project of the current directory
+        """
+        config = self.load_settings() if project is None else project.config
+        curdir = self._curdir if project is None else project.curdir
         languages = []
         if isinstance(self.languages, (list, tuple, set)):
             languages.extend(self.languages)
-        pull_command(self._curdir, config, languages=set(itertools.chain(*languages)),
-                     in_progress=self.in_progress, update_action=self.get_update_action(), force=self.force)
+        journal = open_journal(self, config, curdir)
+        count = pull_command(curdir, config, languages=set(itertools.chain(*languages)),
+                             in_progress=self.in_progress, update_action=self.get_update_action(), force=self.force,
+                             jobs=jobs, shard=self.shard, journal=journal)
+        close_journal(self, journal)
+        return count
 
 
 class PushHandler(BaseHandler):
@@ -205,10 +442,9 @@ class PushHandler(BaseHandler):
     Use the push command to upload your resource files to the project.
     """
 
-    def load_settings(self):
-        config = super(PushHandler, self).load_settings()
+    def configure(self, config, curdir):
+        super(PushHandler, self).configure(config, curdir)
         config.validate(keys=('organization_id',))
-        return config
 
     @classmethod
     def register(cls, *args, **kwargs):
@@ -216,11 +452,31 @@ class PushHandler(BaseHandler):
         parser.add_argument('files', nargs='*', metavar='PATH', default=None, type=FilePathType(), help="")
         parser.add_argument('--update', dest='update', action='store_true', help="Force to update file.")
         parser.add_argument('--version', dest='version', default=None, type=str, help="Set version tag.")
+        add_worker_arguments(parser)
+        add_mirror_arguments(parser, offline='Find the existing resources in the local mirror instead of '
+                                             'searching the API. Files are still uploaded.')
+        add_dry_run_argument(parser)
+        add_workspace_arguments(parser)
         return parser
 
     def main(self):
-        config = self.load_settings()
-        push_command(self._curdir, config, update=self.update, version=self.version, files=self.files)
+        if self.all_projects:
+            if self.files:
+                raise WorkspaceError('Files can not be selected with --all-projects')
+            return self.run_all_projects(self.push)
+        self.push(None, self.jobs)
+
+    def push(self, project, jobs):
+        """
+        :param project: WorkspaceProject or None for the project of the current directory
+        """
+        config = self.load_settings() if project is None else project.config
+        curdir = self._curdir if project is None else project.curdir
+        journal = open_journal(self, config, curdir)
+        count = push_command(curdir, config, update=self.update, version=self.version, files=self.files,
+                             jobs=jobs, shard=self.shard, journal=journal)
+        close_journal(self, journal)
+        return count
 
 
 class ListHandler(BaseHandler):
@@ -230,17 +486,88 @@ class ListHandler(BaseHandler):
     """
 
     def main(self):
-        rows = [['ID', 'NAME', '#SEGMENTS', 'UPDATED_ON', 'STATUS'], ]
-        rows.extend(ls_command(self.load_settings()))
+        rows = ls_command(self.load_settings(), status=self.status, name=self.name_filter, limit=self.limit)
+        write_rows(itertools.chain([LS_HEADERS], rows), fmt=self.format, batch=PAGE_SIZE)
+
+    @classmethod
+    def register(cls, *args, **kwargs):
+        parser = super(ListHandler, cls).register(*args, **kwargs)
+        parser.add_argument('--status', dest='status', nargs='+', default=None, choices=PageStatus.all,
+                            help='List only the resources with any of these statuses.')
+        parser.add_argument('--name', dest='name_filter', metavar='TEXT', type=str, default=None,
+                            help='List only the resources with TEXT in the name.')
+        parser.add_argument('--limit', dest='limit', metavar='N', type=PositiveIntType(), default=None,
+                            help='List at most N resources.')
+        add_format_argument(parser)
+        add_mirror_arguments(parser, offline='List the resources saved by the last `qor sync-meta`.')
+        return parser
+
+
+class SyncHandler(BaseHandler):
+    name = 'sync'
+    help = """
+    Use the sync command to upload the changed sources and download the changed translations in one run.
+    """
+
+    def load_settings(self):
+        config = super(SyncHandler, self).load_settings()
+        config.validate(keys=('organization_id',))
+        return config
+
+    @classmethod
+    def register(cls, *args, **kwargs):
+        parser = super(SyncHandler, cls).register(*args, **kwargs)
+        parser.add_argument('--in-progress', dest='in_progress', action='store_true',
+                            help='Allow to download not completed translations.')
+        parser.add_argument('-f', '--force', dest='force', action='store_true',
+                            help='Overwrite translation files which were changed locally.')
+        add_worker_arguments(parser, journal=False)
+        add_mirror_arguments(parser, offline='Plan with the page listings of the local mirror instead of '
+                                             'searching the API.')
+        return parser
+
+    def main(self):
+        config = self.load_settings()
+        sync_command(self._curdir, config, in_progress=self.in_progress, jobs=self.jobs, report=self.report,
+                     force=self.force)
 
-        table = AsciiTable(rows).table
-        print(table)
+    @staticmethod
+    def report(plan):
+        rows = plan.rows()
+        if len(rows) > 1:
+            print(AsciiTable(rows).table)
+        log.info(plan.summary())
+        if plan.counts()[SyncAction.conflict]:
+            log.warning('Translations changed locally and remotely are kept. Use --force to overwrite them.')
+
+
+class SyncMetaHandler(BaseHandler):
+    name = 'sync-meta'
+    help = """
+    Use the sync-meta command to mirror the project, its pages and progress into a local database.
+    """
+
+    @classmethod
+    def register(cls, *args, **kwargs):
+        parser = super(SyncMetaHandler, cls).register(*args, **kwargs)
+        parser.add_argument('-j', '--jobs', dest='jobs', type=JobsType(), default=1, metavar='N|auto[:MAX]',
+                            help='Number of page stats requested in parallel.')
+        parser.add_argument('--no-stats', dest='stats', action='store_false',
+                            help='Do not mirror the stats of every page.')
+        add_mirror_arguments(parser)
+        return parser
+
+    def main(self):
+        config = self.load_settings()
+        result = sync_meta_command(config, stats=self.stats, jobs=self.jobs)
+        log.info('Mirrored {} pages to `{}`: {} changed, {} removed.'.format(result.pages, config['mirror'],
+                                                                            result.changed, result.removed))
 
 
 class DeleteHandler(BaseHandler):
     name = 'delete'
     help = """
-    Use the delete command to delete any resource and its translations.
+    Use the delete command to delete resources and their translations by name, glob or ID.
     """
 
     def load_settings(self):
@@ -251,14 +578,29 @@ class DeleteHandler(BaseHandler):
     @classmethod
     def register(cls, *args, **kwargs):
         parser = super(DeleteHandler, cls).register(*args, **kwargs)
-        parser.add_argument('file', default=(), type=str,
-                            help="Define resource name or ID.")
+        parser.add_argument('targets', nargs='*', metavar='RESOURCE', default=(), type=str,
+                            help="Resource names, globs like 'docs/*.json' or IDs.")
+        parser.add_argument('--from-file', dest='from_file', metavar='FILE', type=FilePathType(), default=None,
+                            help='Read more resources from FILE, one per line.')
         parser.add_argument('-f', '--force', dest='force', action='store_true', help='Force delete resources.')
+        parser.add_argument('--all-versions', dest='all_versions', action='store_true',
+                            help='Delete every version of a resource name, not only the first one found.')
+        parser.add_argument('--rate', dest='rate', metavar='N', type=PositiveFloatType(), default=None,
+                            help='Send at most N delete requests per second.')
+        add_worker_arguments(parser, journal=False)
+        add_dry_run_argument(parser)
         return parser
 
     def main(self):
+        targets = list(self.targets)
+        if self.from_file:
+            targets.extend(read_targets(self.from_file))
+        if not targets:
+            raise SettingsError('Set the resources to delete or --from-file')
+
         config = self.load_settings()
-        delete_command(self._curdir, config, self.file, force=self.force)
+        delete_command(self._curdir, config, targets, force=self.force, jobs=self.jobs, rate=self.rate,
+                       all_versions=self.all_versions)
 
 
 def parse_arguments():
@@ -286,6 +628,8 @@ def parse_arguments():
     PushHandler.register(subparsers, **args)
     ListHandler.register(subparsers, **args)
     DeleteHandler.register(subparsers, **args)
+    SyncHandler.register(subparsers, **args)
+    SyncMetaHandler.register(subparsers, **args)
 
     args = parser.parse_args()
     return args, parser
@@ -299,11 +643,55 @@ def main():
 
     else:
         log_level = logging.DEBUG if args.debug else logging.INFO
-        init(log_level, traceback=args.traceback)
+        init(log_level, traceback=args.traceback, non_blocking=True)
         cli_handler = args._handler(**vars(args))
 
+    tracer = None
+    if getattr(args, 'trace', None) or getattr(args, 'stats', False):
+        tracer = enable_tracing(command=args._handler.name)
+
+    run_metrics = None
+    if getattr(args, 'metrics_file', None) or getattr(args, 'statsd', None):
+        sinks = []
+        if args.statsd:
+            sinks.append(StatsdSink(*args.statsd))
+        run_metrics = enable_metrics(labels={'command': args._handler.name}, sinks=sinks)
+
+    progress = None
+    quiet_summary = getattr(args, 'quiet_summary', False)
+    if getattr(args, 'progress', None) or quiet_summary:
+        progress = enable_progress(interval=0 if quiet_summary else args.progress)
+        if quiet_summary:
+            log.setLevel(max(log.getEffectiveLevel(), logging.WARNING))
+
+    hedging = None
+    if getattr(args, 'hedge', None):
+        hedging = enable_hedging(percentile=args.hedge, budget=args.hedge_budget)
+
+    dry_run = None
+    if getattr(args, 'dry_run', False):
+        dry_run = enable_dry_run(jobs=parse_jobs(getattr(args, 'jobs', 1))[0])
+
+    started = time.time()
+    success = False
+    profiler = None
     try:
+        set_deadline(getattr(args, 'deadline', None))
+        if getattr(args, 'record', None):
+            enable_recording(args.record)
+        elif getattr(args, 'replay', None):
+            enable_replay(args.replay, scale=args.replay_scale)
+
+        if getattr(args, 'profile', None):
+            profiler = create_profiler(args.profile,
+                                       args.profile_output or 'qor-{}-profile'.format(args._handler.name))
+            profiler.start()
+
         cli_handler()
+        success = True
+        if dry_run is not None:
+            print(AsciiTable(dry_run.rows()).table)
+            log.info(dry_run.summary())
     except Exception as e:
         log.critical(e)
         if args.traceback:
@@ -311,6 +699,39 @@ def main():
             traceback.print_exc()
 
         sys.exit(1)
+    finally:
+        flush_log()
+        clear_deadline()
+        disable_cassette()
+        disable_dry_run()
+        if hedging is not None:
+            log.info(hedging.summary())
+            disable_hedging()
+        if profiler is not None:
+            for path in profiler.stop():
+                log.info('Profile saved to `{}`'.format(path))
+        if progress is not None:
+            disable_progress()
+            if quiet_summary:
+                for rows in progress.summary():
+                    print(AsciiTable(rows).table, file=sys.stderr)
+        if tracer is not None:
+            report_tracing(tracer, trace_path=args.trace, stats=args.stats)
+        if run_metrics is not None:
+            finish_run(run_metrics, started, success)
+            if args.metrics_file:
+                write_prometheus_textfile(run_metrics, args.metrics_file)
+
+
+def report_tracing(tracer, trace_path=None, stats=False):
+    if trace_path:
+        tracer.export(trace_path)
+        log.info('Trace saved to `{}`'.format(trace_path))
+
+    if stats:
+        endpoint_rows, command_rows = format_summary(tracer)
+        print(AsciiTable(endpoint_rows).table, file=sys.stderr)
+        print(AsciiTable(command_rows).table, file=sys.stderr)
 
 
 if __name__ == '__main__':
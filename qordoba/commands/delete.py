@@ -1,39 +1,176 @@
 from __future__ import unicode_literals, print_function
 
+import fnmatch
+import io
 import logging
+import threading
+from collections import namedtuple, OrderedDict
 
+from qordoba import metrics
+from qordoba.commands.pull import format_file_name
 from qordoba.commands.utils import ask_bool
+from qordoba.concurrency import RateLimiter
+from qordoba.dryrun import get_dry_run
 from qordoba.languages import get_destination_languages
-from qordoba.project import ProjectAPI
+from qordoba.progress import add_total
+from qordoba.project import ProjectAPI, QordobaResponseError
+from qordoba.stages import Stage, iterate
+from qordoba.workers import WorkerPool
 
 log = logging.getLogger('qordoba')
 
+GLOB_CHARS = '*?['
+
+# names shown in the confirmation of a bulk delete
+MAX_LISTED = 20
+
+
+class DeleteError(QordobaResponseError):
+    """
+    Some resources could not be deleted
+    """
+
+
+class DeleteResult(namedtuple('_DeleteResult', ('deleted', 'missing', 'failed'))):
+    """
+    ``deleted`` is a list of pages, ``missing`` the targets which matched no resource and ``failed`` a list of
+    (page, error) pairs.
+    """
 
-def delete_command(curdir, config, file_name, force=False):
-    api = ProjectAPI(config)
-    project = api.get_project()
-    lang = next(get_destination_languages(project))
 
-    page_id = None
+def read_targets(path):
+    """
+    Targets listed in a file, one per line. Empty lines and lines starting with # are skipped.
+    """
+    with io.open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+def parse_target(target):
+    """
+    :return: ('id', page id), ('glob', pattern) or ('name', resource name)
+    """
     try:
-        page_id = int(file_name)
+        return 'id', int(target)
     except ValueError:
         pass
+    if any(c in target for c in GLOB_CHARS):
+        return 'glob', target
+    return 'name', target
 
-    if not page_id:
-        for page in api.page_search(lang.id, search_string=file_name):
-            if page['url'] == file_name:
-                page_id = page['page_id']
-                break
 
-    if page_id:
-        if not force:
-            if not ask_bool(
-                    'Are you sure you want to delete `{}` and all translations for this resource?'.format(file_name)
-            ):
-                return
+def resolve_targets(api, lang, targets, all_versions=False):
+    """
+    Find the pages of all targets with one scan of the page index.
 
-        api.delete_page(page_id)
+    A name matches the first page of the resource found, or every version of it with ``all_versions``. A glob
+    matches every page whose resource name it matches. An id matches only a page found by the scan, so an unknown
+    id is reported as missing whatever the other targets are; a single name is searched by the API.
+    :return: (list of pages, list of targets which matched nothing)
+    """
+    parsed = [(target, ) + parse_target(target) for target in targets]
+    ids = {value: target for target, kind, value in parsed if kind == 'id'}
+    names = {value: target for target, kind, value in parsed if kind == 'name'}
+    globs = [(value, target) for target, kind, value in parsed if kind == 'glob']
 
+    if len(names) == 1 and not globs and not ids:
+        pages = api.page_search(lang.id, search_string=next(iter(names)))
     else:
-        log.info('Resource `{}` not found.'.format(file_name))
+        pages = api.page_search(lang.id)
+
+    selected = OrderedDict()
+    matched = set()
+    for page in iterate(Stage.search, pages.stream()):
+        if page.get('deleted'):
+            continue
+        name = names.get(page['url'])
+        if name in matched and not all_versions:
+            name = None
+        hits = [ids.get(page['page_id']), name]
+        hits.extend(target for pattern, target in globs if fnmatch.fnmatchcase(page['url'], pattern))
+        hits = [hit for hit in hits if hit is not None]
+        if hits:
+            matched.update(hits)
+            selected[page['page_id']] = page
+
+    missing = [target for target in OrderedDict.fromkeys(targets) if target not in matched]
+    return list(selected.values()), missing
+
+
+def confirm(pages):
+    if len(pages) == 1:
+        return ask_bool('Are you sure you want to delete `{}` and all translations for this resource?'
+                        .format(format_file_name(pages[0])))
+
+    for page in pages[:MAX_LISTED]:
+        log.info('    {}'.format(format_file_name(page)))
+    if len(pages) > MAX_LISTED:
+        log.info('    ... and {} more'.format(len(pages) - MAX_LISTED))
+    return ask_bool('Are you sure you want to delete these {} resources and all their translations?'
+                    .format(len(pages)))
+
+
+def delete_command(curdir, config, targets, force=False, jobs=1, rate=None, all_versions=False):
+    """
+    Delete resources by id, name or glob. The targets are resolved with one scan of the page index, confirmed
+    once and deleted on a worker pool.
+
+    :param targets: one target or a list of them
+    :param float rate: maximum number of delete requests per second
+    :param bool all_versions: delete every version of a resource name instead of the first one found
+    :rtype: DeleteResult
+    """
+    if not isinstance(targets, (list, tuple)):
+        targets = [targets]
+
+    api = ProjectAPI(config)
+    project = api.get_project()
+    lang = next(get_destination_languages(project))
+
+    pages, missing = resolve_targets(api, lang, targets, all_versions=all_versions)
+    for target in missing:
+        log.info('Resource `{}` not found.'.format(target))
+    result = DeleteResult([], missing, [])
+    if not pages:
+        return result
+
+    dry_run = get_dry_run()
+    if dry_run is not None:
+        for page in pages:
+            dry_run.add_requests('delete_page')
+            dry_run.add_file()
+            log.info('Would delete `{}` and all translations for this resource.'.format(format_file_name(page)))
+        return result
+
+    if not force and not confirm(pages):
+        return result
+
+    limiter = RateLimiter(rate) if rate else None
+    lock = threading.Lock()
+
+    def delete_unit(page):
+        if limiter is not None:
+            limiter.wait()
+        try:
+            api.delete_page(page['page_id'])
+        except QordobaResponseError as e:
+            log.error('Could not delete `{}`: {}'.format(format_file_name(page), e))
+            with lock:
+                result.failed.append((page, e))
+            return
+        metrics.inc('files_total', action='deleted')
+        log.info('Deleted `{}`.'.format(format_file_name(page)))
+        with lock:
+            result.deleted.append(page)
+
+    add_total(len(pages))
+    WorkerPool(jobs).run(delete_unit, pages)
+
+    if len(pages) > 1 or missing:
+        log.info('Deleted {} resources, {} not found, {} failed.'.format(len(result.deleted), len(missing),
+                                                                         len(result.failed)))
+    if result.failed:
+        if len(pages) == 1:
+            raise result.failed[0][1]
+        raise DeleteError('{} of {} resources could not be deleted'.format(len(result.failed), len(pages)))
+    return result
@@ -10,10 +10,10 @@ from qordoba.settings import load_settings, SettingsError, SettingsValidationErr
 log = logging.getLogger('qordoba')
 
 
-def init_command(curpath, access_token, project_id, organization_id=None, force=False):
+def init_command(curpath, access_token, project_id, organization_id=None, api_url=None, force=False):
     try:
         config, loaded = load_settings(access_token=access_token, project_id=project_id,
-                                       organization_id=organization_id)
+                                       organization_id=organization_id, api_url=api_url)
     except SettingsValidationError:
         raise
     else:
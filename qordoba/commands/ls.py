@@ -6,7 +6,9 @@ from datetime import datetime
 import logging
 
 from qordoba.languages import get_destination_languages
+from qordoba.mirror import use_mirror
 from qordoba.project import ProjectAPI
+from qordoba.stages import Stage, iterate
 
 log = logging.getLogger('qordoba')
 
@@ -36,17 +38,34 @@ def get_status(page):
 
 
 
+HEADERS = ('ID', 'NAME', '#SEGMENTS', 'UPDATED_ON', 'STATUS')
+
+# results requested per page_search call
+PAGE_SIZE = 50
+
+
 class ResultRow(namedtuple('_ResultRow', ('id', 'name', 'segments', 'updated_on', 'status'))):
     pass
 
 
-def ls_command(config):
-    api = ProjectAPI(config)
+def ls_command(config, status=None, name=None, limit=None):
+    """
+    Stream the resources of the project as they are listed.
+
+    The filters are sent to the API with page_search, so only matching pages are transferred, and the listing
+    stops after ``limit`` resources. Listed pages are not kept, neither by the result nor by the memo.
+    :param list status: PageStatus values, a page matches any of them
+    :param str name: part of the resource name
+    """
+    # every listing is read once, memoizing it would only keep all pages in memory
+    api = use_mirror(ProjectAPI(dict(config, cache_ttl=0)), config)
     project = api.get_project()
 
     lang = next(get_destination_languages(project))
 
-    for page in api.page_search(lang.id):
+    pages = api.page_search(lang.id, status=status, search_string=name, limit=min(limit or PAGE_SIZE, PAGE_SIZE))
+    count = 0
+    for page in iterate(Stage.search, pages.stream()):
         if page.get('deleted', False):
             continue
         if page.get('version_tag', None):
@@ -60,3 +79,6 @@ def ls_command(config):
             datetime.fromtimestamp(page['update'] / 1e3),
             get_status(page)
         )
+        count += 1
+        if limit is not None and count >= limit:
+            return
@@ -1,15 +1,23 @@
 from __future__ import unicode_literals, print_function
 
+import hashlib
 import logging
 import os
-import shutil
 from argparse import ArgumentTypeError
 
-from qordoba.commands.utils import mkdirs, ask_select, ask_question
-from qordoba.languages import get_destination_languages, init_language_storage, normalize_language
+from qordoba import metrics
+from qordoba.commands.utils import mkdirs, ask_select, ask_question, bootstrap, PROMPT_LOCK
+from qordoba.dryrun import get_dry_run
+from qordoba.journal import temp_file, is_file_unchanged
+from qordoba.languages import get_destination_languages, normalize_language
+from qordoba.mirror import use_mirror
+from qordoba.progress import add_total
 from qordoba.project import ProjectAPI, PageStatus
 from qordoba.settings import get_pull_pattern
+from qordoba.sharding import filter_shard
 from qordoba.sources import create_target_path_by_pattern
+from qordoba.stages import Stage, stage, iterate
+from qordoba.workers import worker_pool
 
 log = logging.getLogger('qordoba')
 
@@ -51,10 +59,133 @@ def validate_languges_input(languages, project_languages):
     return list(selected_langs)
 
 
-def pull_command(curdir, config, force=False, languages=(), in_progress=False, update_action=None, **kwargs):
-    api = ProjectAPI(config)
-    init_language_storage(api)
-    project = api.get_project()
+def pull_unit_key(unit):
+    language, page = unit
+    return '{}:{}'.format(page['page_id'], language.code)
+
+
+def copy_with_sha256(src, path, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for chunk in iter(lambda: src.read(chunk_size), b''):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def pull_page(api, curdir, language, page, pattern=None, force=False, in_progress=False, update_action=None):
+    """
+    Download the translation of one page to the path built by the pull pattern.
+    :return: (target path, sha256 of the content) or None if the download was skipped
+    """
+    with stage(Stage.search):
+        page_status = api.get_page_details(language.id, page['page_id'], )
+
+    log.info('Downloading translation file for source `{}` and language `{}`'.format(
+        format_file_name(page),
+        language.code,
+    ))
+    milestone = None
+    if in_progress:
+        milestone = page_status['status']['id']
+        log.debug('Selected status for page `{}` - {}'.format(page_status['id'], page_status['status']['name']))
+
+    target_path = create_target_path_by_pattern(curdir, language, pattern=pattern,
+                                                source_name=page_status['name'],
+                                                content_type_code=page_status['content_type_code'])
+
+    with PROMPT_LOCK:
+        if os.path.exists(target_path.native_path) and not force:
+            log.warning('Translation file already exists. `{}`'.format(target_path.native_path))
+            answer = FileUpdateOptions.get_action(update_action) or ask_select(FileUpdateOptions.all,
+                                                                               prompt='Choice: ')
+            if answer == FileUpdateOptions.skip:
+                log.info('Download translation file `{}` was skipped.'.format(target_path.native_path))
+                metrics.inc('files_total', action='skipped')
+                return
+            elif answer == FileUpdateOptions.new_name:
+                while os.path.exists(target_path.native_path):
+                    target_path = ask_question('Set new filename: ', answer_type=target_path.replace)
+            # pass to replace file
+
+    with stage(Stage.download):
+        res = api.download_file(page_status['id'], language.id, milestone=milestone)
+    res.raw.decode_content = True  # required to decompress content
+    with stage(Stage.write):
+        # ensure to create all directories
+        mkdirs(os.path.dirname(target_path.native_path))
+        # copy content to dest path. The file is replaced only after the whole content is written
+        with temp_file(target_path.native_path) as tmp_path:
+            sha256 = copy_with_sha256(res.raw, tmp_path)
+
+    metrics.inc('files_total', action='pulled')
+    log.info('Downloaded translation file `{}` for source `{}` and language `{}`'
+             .format(target_path.native_path,
+                     format_file_name(page),
+                     language.code))
+    return target_path.native_path, sha256
+
+
+def estimate_pull(api, curdir, dry_run, language, page, pattern=None, force=False, in_progress=False,
+                  update_action=None, chunk_size=64 * 1024):
+    """
+    Count the requests and bytes of pull_page without writing files. An existing translation file which
+    ``update_action`` skips is not counted, like in pull_page. The first DRY_RUN_SAMPLES translations are
+    downloaded and discarded to measure them, the size of the others is estimated from the samples.
+    :param qordoba.dryrun.DryRun dry_run:
+    """
+    dry_run.add_requests('page_details')
+    with stage(Stage.search):
+        page_status = api.get_page_details(language.id, page['page_id'], )
+
+    target_path = create_target_path_by_pattern(curdir, language, pattern=pattern,
+                                                source_name=page_status['name'],
+                                                content_type_code=page_status['content_type_code'])
+    if os.path.exists(target_path.native_path) and not force:
+        answer = FileUpdateOptions.get_action(update_action)
+        if answer == FileUpdateOptions.skip:
+            log.info('Would skip existing translation file `{}`.'.format(target_path.native_path))
+            return
+        if answer is None:
+            log.info('Would ask what to do with existing translation file `{}`.'.format(target_path.native_path))
+
+    dry_run.add_requests('export', 'file_download')
+    log.info('Would download translation file for source `{}` and language `{}`'.format(
+        format_file_name(page), language.code))
+    if not dry_run.take_sample():
+        dry_run.add_file(bytes_in=None)
+        return
+
+    milestone = page_status['status']['id'] if in_progress else None
+    with stage(Stage.download):
+        res = api.download_file(page_status['id'], language.id, milestone=milestone)
+        res.raw.decode_content = True
+        size = sum(len(chunk) for chunk in iter(lambda: res.raw.read(chunk_size), b''))
+    dry_run.add_sample(size)
+    dry_run.add_file(bytes_in=size)
+
+
+def pull_command(curdir, config, force=False, languages=(), in_progress=False, update_action=None, jobs=1,
+                 shard=None, journal=None, **kwargs):
+    """
+    :param jobs: number of jobs or a WorkerPool shared with other commands
+    :return: number of processed translations
+    """
+    api = use_mirror(ProjectAPI(config), config)
+
+    status_filter = [PageStatus.enabled, ]
+    if in_progress is False:
+        log.debug('Pull only completed translations.')
+        status_filter = [PageStatus.completed, ]
+
+    page_index = None
+    if not languages:
+        # All target languages are pulled, so their searches can start together with the bootstrap
+        def page_index(project):
+            for language in get_destination_languages(project):
+                yield language, api.page_search(language.id, status=status_filter)
+
+    project, prefetched_pages = bootstrap(api, page_index=page_index)
     target_languages = list(get_destination_languages(project))
     if languages:
         languages = validate_languges_input(languages, target_languages)
@@ -63,55 +194,44 @@ def pull_command(curdir, config, force=False, languages=(), in_progress=False, u
 
     pattern = get_pull_pattern(config, default=None)
 
-    status_filter = [PageStatus.enabled, ]
-    if in_progress is False:
-        log.debug('Pull only completed translations.')
-        status_filter = [PageStatus.completed, ]
-
-    for language in languages:
-        is_started = False
-
-        for page in api.page_search(language.id, status=status_filter):
-            is_started = True
-            page_status = api.get_page_details(language.id, page['page_id'], )
-
-            log.info('Downloading translation file for source `{}` and language `{}`'.format(
-                format_file_name(page),
-                language.code,
-            ))
-            milestone = None
-            if in_progress:
-                milestone = page_status['status']['id']
-                log.debug('Selected status for page `{}` - {}'.format(page_status['id'], page_status['status']['name']))
-
-            target_path = create_target_path_by_pattern(curdir, language, pattern=pattern,
-                                                        source_name=page_status['name'],
-                                                        content_type_code=page_status['content_type_code'])
-
-            if os.path.exists(target_path.native_path) and not force:
-                log.warning('Translation file already exists. `{}`'.format(target_path.native_path))
-                answer = FileUpdateOptions.get_action(update_action) or ask_select(FileUpdateOptions.all,
-                                                                                   prompt='Choice: ')
-                if answer == FileUpdateOptions.skip:
-                    log.info('Download translation file `{}` was skipped.'.format(target_path.native_path))
-                    continue
-                elif answer == FileUpdateOptions.new_name:
-                    while os.path.exists(target_path.native_path):
-                        target_path = ask_question('Set new filename: ', answer_type=target_path.replace)
-                # pass to replace file
-
-            res = api.download_file(page_status['id'], language.id, milestone=milestone)
-            res.raw.decode_content = True  # required to decompress content
-            # ensure to create all directories
-            mkdirs(os.path.dirname(target_path.native_path))
-            # copy content to dest path
-            with open(target_path.native_path, 'wb') as f:
-                shutil.copyfileobj(res.raw, f)
-
-            log.info('Downloaded translation file `{}` for source `{}` and language `{}`'
-                     .format(target_path.native_path,
-                             format_file_name(page),
-                             language.code))
-
-        if not is_started:
-            log.info('Nothing to download for language `{}`'.format(language.code))
+    def units():
+        for language in languages:
+            is_started = False
+
+            pages = prefetched_pages.get(language)
+            if pages is None:
+                pages = api.page_search(language.id, status=status_filter)
+
+            for page in iterate(Stage.search, pages):
+                if not is_started:
+                    is_started = True
+                    # with a shard only its expected part of the pages is downloaded
+                    add_total(int(round(len(pages) / float(shard.count if shard else 1))))
+                yield language, page
+
+            if not is_started:
+                log.info('Nothing to download for language `{}`'.format(language.code))
+
+    dry_run = get_dry_run()
+
+    def pull_unit(unit):
+        language, page = unit
+        key = 'pull:{}'.format(pull_unit_key(unit))
+        if journal is not None:
+            entry = journal.get(key)
+            if entry and is_file_unchanged(entry['target'], entry['sha256']):
+                log.debug('Translation file `{}` was downloaded before the interruption.'.format(entry['target']))
+                metrics.inc('files_total', action='resumed')
+                return
+
+        if dry_run is not None:
+            return estimate_pull(api, curdir, dry_run, language, page, pattern=pattern, force=force,
+                                 in_progress=in_progress, update_action=update_action)
+
+        result = pull_page(api, curdir, language, page, pattern=pattern, force=force, in_progress=in_progress,
+                           update_action=update_action)
+        if journal is not None and result is not None:
+            target, sha256 = result
+            journal.record(key, page_id=page['page_id'], language=language.code, target=target, sha256=sha256)
+
+    return worker_pool(jobs).run(pull_unit, filter_shard(units(), shard, key=pull_unit_key))
@@ -1,13 +1,22 @@
 from __future__ import unicode_literals, print_function
 
 import logging
-
-from qordoba.commands.utils import ask_question, ask_select_multiple, ask_select
-from qordoba.languages import get_source_language, init_language_storage, get_destination_languages
+import os
+
+from qordoba.commands.utils import ask_question, ask_select_multiple, ask_select, bootstrap, PROMPT_LOCK
+from qordoba import metrics
+from qordoba.dryrun import get_dry_run
+from qordoba.journal import file_sha256
+from qordoba.languages import get_source_language, get_destination_languages
+from qordoba.mirror import use_mirror
+from qordoba.progress import add_total
 from qordoba.project import ProjectAPI
 from qordoba.settings import get_push_pattern
+from qordoba.sharding import filter_shard
 from qordoba.sources import find_files_by_pattern, validate_path, validate_push_pattern, get_content_type_code, \
     get_mimetype
+from qordoba.stages import Stage, stage
+from qordoba.workers import worker_pool
 
 log = logging.getLogger('qordoba')
 
@@ -97,16 +106,20 @@ def upload_file(api, path, version=None, **kwargs):
                                        **kwargs)
     log.debug('File `{}` uploaded. Name - `{}`. Adding to the project...'.format(path.native_path, file_name))
 
-    if resp.get('version_tags', ()):
-        if version_tag is None or version_tag in resp.get('version_tags'):
-            version_tag = select_version_tag(file_name, resp.get('version_tags'))
+    with PROMPT_LOCK:
+        if resp.get('version_tags', ()):
+            if version_tag is None or version_tag in resp.get('version_tags'):
+                version_tag = select_version_tag(file_name, resp.get('version_tags'))
 
-    if resp.get('columns'):
-        kwargs.update(select_source_columns(resp.get('columns')))
+        if resp.get('columns'):
+            kwargs.update(select_source_columns(resp.get('columns')))
 
-    resp = api.append_file(resp['upload_id'], file_name, version_tag=version_tag, **kwargs)
+    upload_id = resp['upload_id']
+    api.append_file(upload_id, file_name, version_tag=version_tag, **kwargs)
 
+    metrics.inc('files_total', action='uploaded')
     log.info('Uploaded {} successfully as {}'.format(path.native_path, file_name))
+    return {'upload_id': upload_id, 'name': file_name, 'version_tag': version_tag}
 
 
 def update_file(api, path, remote_files, version=None):
@@ -123,33 +136,88 @@ def update_file(api, path, remote_files, version=None):
     with open(path.native_path, 'rb') as f:
         resp = api.update_upload_anyType_file(f, file_name, remote_file['page_id'])
 
-    resp = api.apply_upload_file(resp['id'], remote_file['page_id'])
+    api.apply_upload_file(resp['id'], remote_file['page_id'])
 
+    metrics.inc('files_total', action='updated')
     log.info('Updated {} successfully.'.format(file_name))
+    return {'upload_id': resp['id'], 'name': file_name, 'page_id': remote_file['page_id']}
+
+
+def push_file(api, curdir, file, source_lang, lang, update=False, version=None):
+    """
+    Upload one source file, or update the existing resource with the same name.
+    :return: dict with the upload id and the name of the resource
+    """
+    path = validate_path(curdir, file, source_lang)
+
+    file_name = path.unique_name
+
+    with stage(Stage.search):
+        remote_file_pages = list(api.page_search(language_id=lang.id, search_string=file_name))
+
+    with stage(Stage.upload):
+        if remote_file_pages and update:
+            return update_file(api, path, remote_file_pages, version=version)
+        else:
+            return upload_file(api, path, version=version)
+
 
+def estimate_push(api, dry_run, path, lang, update=False):
+    """
+    Count the requests and bytes of push_file without uploading the file.
+    :param qordoba.dryrun.DryRun dry_run:
+    """
+    with stage(Stage.search):
+        remote_file_pages = list(api.page_search(language_id=lang.id, search_string=path.unique_name))
+
+    if remote_file_pages and update:
+        dry_run.add_requests('update_upload_file', 'apply_upload_file')
+        log.info('Would update {}'.format(path.unique_name))
+    else:
+        dry_run.add_requests('upload_anytype_file', 'append_files')
+        log.info('Would upload {}'.format(path.native_path))
+    dry_run.add_file(bytes_out=os.path.getsize(path.native_path))
 
-def push_command(curdir, config, update=False, version=None, files=()):
-    api = ProjectAPI(config)
-    init_language_storage(api)
 
-    project = api.get_project()
+def push_command(curdir, config, update=False, version=None, files=(), jobs=1, shard=None, journal=None):
+    """
+    :param jobs: number of jobs or a WorkerPool shared with other commands
+    :return: number of processed files
+    """
+    api = use_mirror(ProjectAPI(config), config)
+    project, _ = bootstrap(api)
+
     source_lang = get_source_language(project)
     lang = next(get_destination_languages(project))
 
     if not files:
         pattern = get_push_pattern(config)
-        files = list(find_files_by_pattern(curdir, pattern, source_lang))
+        with stage(Stage.scan):
+            files = list(find_files_by_pattern(curdir, pattern, source_lang))
         if not files:
             raise FilesNotFound('Files not found by pattern `{}`'.format(pattern))
 
-    for file in files:
-        path = validate_path(curdir, file, source_lang)
-
-        file_name = path.unique_name
-
-        remote_file_pages = list(api.page_search(language_id=lang.id, search_string=file_name))
-
-        if remote_file_pages and update:
-            update_file(api, path, remote_file_pages, version=version)
-        else:
-            upload_file(api, path, version=version)
+    paths = [validate_path(curdir, file, source_lang) for file in files]
+    paths = list(filter_shard(paths, shard, key=lambda path: path.posix_path))
+    add_total(len(paths))
+    dry_run = get_dry_run()
+
+    def push_unit(path):
+        key = 'push:{}'.format(path.posix_path)
+        sha256 = None
+        if journal is not None:
+            sha256 = file_sha256(path.native_path)
+            entry = journal.get(key)
+            if entry and entry['sha256'] == sha256:
+                log.debug('File `{}` was pushed before the interruption.'.format(path.native_path))
+                metrics.inc('files_total', action='resumed')
+                return
+
+        if dry_run is not None:
+            return estimate_push(api, dry_run, path, lang, update=update)
+
+        result = push_file(api, curdir, path, source_lang, lang, update=update, version=version)
+        if journal is not None:
+            journal.record(key, sha256=sha256, **result)
+
+    return worker_pool(jobs).run(push_unit, paths)
@@ -1,8 +1,24 @@
 from __future__ import unicode_literals, print_function
 
+import logging
+import threading
 from operator import itemgetter
 
-from qordoba.project import ProjectAPI
+try:
+    from queue import Queue, Full
+except ImportError:
+    from Queue import Queue, Full
+
+from qordoba.commands.pull import format_file_name
+from qordoba.concurrency import parse_jobs
+from qordoba.languages import get_destination_languages
+from qordoba.mirror import use_mirror
+from qordoba.project import ProjectAPI, QordobaResponseError
+from qordoba.session import shared_session
+from qordoba.stages import Stage, iterate
+from qordoba.workers import WorkerPool
+
+log = logging.getLogger('qordoba')
 
 
 def prepare_milestones(milestones):
@@ -21,11 +37,17 @@ def prepare_milestones(milestones):
 
 DEFAULT_HEADERS = ('LOCALE', '#WORDS', '#SEGMENTS')
 
+ORG_HEADERS = ('PROJECT_ID', 'PROJECT', 'LOCALE', '#WORDS', '#SEGMENTS')
+
+PAGE_HEADERS = ('PAGE_ID', 'NAME')
+
+_DONE = object()
+
 
 def status_command(config):
     """
     """
-    api = ProjectAPI(config)
+    api = use_mirror(ProjectAPI(config), config)
     report = api.get_report_progress()['languages']
 
     header = None
@@ -45,3 +67,165 @@ def status_command(config):
         row.extend(percentage)
 
         yield row
+
+
+def fetch_org_progress(config, jobs=1):
+    """
+    Progress reports of all projects of the organization. Reports are fetched on a worker pool while the list of
+    projects is still being paginated, over one shared HTTP session.
+    :return: list of (project, report) in the order of the project list. ``report`` is None if it is not available.
+    """
+    api = ProjectAPI(config)
+    reports = {}
+    lock = threading.Lock()
+
+    def fetch(unit):
+        index, project = unit
+        try:
+            report = ProjectAPI(dict(config, project_id=project['id'])).get_report_progress()
+        except QordobaResponseError as e:
+            log.warning('Progress of project {} `{}` is not available: {}'.format(project['id'], project['name'], e))
+            report = None
+        with lock:
+            reports[index] = (project, report)
+
+    with shared_session(pool_size=parse_jobs(jobs)[0] * 2):
+        WorkerPool(jobs).run(fetch, enumerate(api.get_projects()))
+    return [reports[index] for index in sorted(reports)]
+
+
+def org_status_command(config, jobs=1):
+    """
+    Words, segments and milestone percentages of every locale of every project in the organization.
+    The milestone columns are the union of the milestones of all projects, a missing one is None.
+    """
+    reports = fetch_org_progress(config, jobs=jobs)
+
+    orders = {}
+    for _, report in reports:
+        for lang in (report or {}).get('languages', ()):
+            for milestone in lang['milestones']:
+                name = milestone['name'].upper()
+                orders[name] = min(orders.get(name, milestone['order']), milestone['order'])
+    names = sorted(orders, key=lambda n: (orders[n], n))
+
+    header = list(ORG_HEADERS)
+    header.extend('{} %'.format(name) for name in names)
+    yield header
+
+    for project, report in reports:
+        if report is None:
+            continue
+        for lang in report['languages']:
+            percentage = {milestone['name'].upper(): milestone['percent'] for milestone in lang['milestones']}
+            row = [
+                project['id'],
+                project['name'],
+                lang['code'],
+                lang['total_words'],
+                lang['segments'],
+            ]
+            row.extend(percentage.get(name) for name in names)
+            yield row
+
+
+def completion(stats):
+    """
+    :param dict stats: response of get_page_stats
+    :return: percent of completed segments or None for a page without segments
+    """
+    total = stats.get('stats') or 0
+    if not total:
+        return None
+    return round(stats.get('complete_segment_count', 0) * 100.0 / total, 1)
+
+
+def page_status_command(config, jobs=1):
+    """
+    Completion matrix with a row per page and a column per target language, in percent of completed segments.
+
+    The stats of all page x language pairs are fetched on a worker pool while the pages are still being listed.
+    A row is yielded as soon as the stats of all its languages arrived, so rows come in the order they complete
+    and only the pages in flight are kept in memory. Every pair is read once, so nothing is memoized. With
+    --offline the stats are read from the local mirror.
+
+    Rows wait in a bounded queue, so a slow consumer holds the workers back. When the generator is closed
+    before the end, no more stats are requested and the units in flight are drained before it returns.
+    """
+    # memoizing the stats would keep every page x language pair until the end of the run
+    api = use_mirror(ProjectAPI(dict(config, cache_ttl=0)), config)
+    languages = list(get_destination_languages(api.get_project()))
+
+    header = list(PAGE_HEADERS)
+    header.extend(language.code.upper() for language in languages)
+    yield header
+    if not languages:
+        return
+
+    max_jobs = parse_jobs(jobs)[0]
+    pending = {}
+    lock = threading.Lock()
+    rows = Queue(maxsize=max_jobs * 2)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                rows.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def units():
+        for page in iterate(Stage.search, api.page_search(languages[0].id)):
+            if stopped.is_set():
+                return
+            if page.get('deleted'):
+                continue
+            with lock:
+                pending[page['page_id']] = (page, {})
+            for language in languages:
+                yield page['page_id'], language.id
+
+    def fetch(unit):
+        page_id, language_id = unit
+        if stopped.is_set():
+            return
+        try:
+            percent = completion(api.get_page_stats(language_id, page_id))
+        except QordobaResponseError as e:
+            log.debug('Stats of page {} in language {} are not available: {}'.format(page_id, language_id, e))
+            percent = None
+        with lock:
+            page, done = pending[page_id]
+            done[language_id] = percent
+            if len(done) < len(languages):
+                return
+            del pending[page_id]
+        row = [page_id, format_file_name(page)]
+        row.extend(done[language.id] for language in languages)
+        put(row)
+
+    def run():
+        try:
+            with shared_session(pool_size=max_jobs * 2):
+                WorkerPool(jobs).run(fetch, units())
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=run, name='qordoba-page-status')
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            row = rows.get()
+            if row is _DONE:
+                break
+            if isinstance(row, Exception):
+                raise row
+            yield row
+    finally:
+        stopped.set()
+        thread.join()
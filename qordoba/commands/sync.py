@@ -0,0 +1,254 @@
+from __future__ import unicode_literals, print_function
+
+import logging
+import os
+from collections import namedtuple, OrderedDict, defaultdict
+
+from qordoba.commands.pull import pull_page, format_file_name
+from qordoba.commands.push import upload_file, update_file
+from qordoba.commands.utils import bootstrap
+from qordoba.journal import file_sha256, is_file_unchanged
+from qordoba.languages import get_source_language, get_destination_languages
+from qordoba.mirror import Mirror, DEFAULT_MIRROR_PATH, use_mirror
+from qordoba.progress import add_total
+from qordoba.project import ProjectAPI
+from qordoba.settings import get_push_pattern, get_pull_pattern, PatternNotFound
+from qordoba.sources import find_files_by_pattern, validate_path
+from qordoba.stages import Stage, stage, iterate
+from qordoba.workers import worker_pool
+
+log = logging.getLogger('qordoba')
+
+
+class SyncAction:
+    upload = 'upload'
+    update = 'update'
+    download = 'download'
+    skip = 'skip'
+    prune = 'prune'
+    conflict = 'conflict'
+
+    all = upload, update, download, skip, prune, conflict
+
+
+# API requests sent to run one action
+ACTION_REQUESTS = {
+    SyncAction.upload: 2,
+    SyncAction.update: 2,
+    SyncAction.download: 3,
+    SyncAction.skip: 0,
+    SyncAction.prune: 0,
+    SyncAction.conflict: 0,
+}
+
+
+class PlanItem(namedtuple('_PlanItem', ('action', 'name', 'language', 'reason', 'key', 'path', 'remote',
+                                        'sha256'))):
+    """
+    One step of a sync plan.
+
+    ``key`` identifies the file in the synced files of the mirror. ``path`` is the TranslationFile of a source
+    or the local path of a pruned translation. ``remote`` is the page to download or the pages to update.
+    """
+
+
+class SyncPlan(object):
+    def __init__(self, items=()):
+        self.items = list(items)
+
+    def counts(self):
+        counts = OrderedDict((action, 0) for action in SyncAction.all)
+        for item in self.items:
+            counts[item.action] += 1
+        return counts
+
+    def requests(self):
+        """
+        :return: estimated number of API requests to run the plan
+        """
+        return sum(ACTION_REQUESTS[item.action] for item in self.items)
+
+    def work(self):
+        return [item for item in self.items if item.action not in (SyncAction.skip, SyncAction.conflict)]
+
+    def rows(self):
+        """
+        :return: rows for AsciiTable with every step and conflict, without the skipped files
+        """
+        rows = [['ACTION', 'FILE', 'LANGUAGE', 'REASON'], ]
+        for item in self.items:
+            if item.action == SyncAction.skip:
+                continue
+            rows.append([item.action.upper(), item.name, item.language.code if item.language else '', item.reason])
+        return rows
+
+    def summary(self):
+        counts = ', '.join('{} {}'.format(count, action) for action, count in self.counts().items())
+        return 'Plan: {}. About {} API requests.'.format(counts, self.requests())
+
+
+def source_key(path):
+    return 'source:{}'.format(path.posix_path)
+
+
+def target_key(page, language):
+    return 'target:{}:{}'.format(page['page_id'], language.code)
+
+
+def plan_sources(curdir, pattern, source_lang, remote_pages, synced):
+    """
+    :param dict remote_pages: url -> list of remote pages
+    :param dict synced: synced files of the mirror
+    """
+    with stage(Stage.scan):
+        paths = [validate_path(curdir, file, source_lang) for file in find_files_by_pattern(curdir, pattern,
+                                                                                          source_lang)]
+    for path in paths:
+        key = source_key(path)
+        sha256 = file_sha256(path.native_path)
+        remote = remote_pages.get(path.unique_name)
+        state = synced.get(key)
+
+        if not remote:
+            action, reason = SyncAction.upload, 'new'
+        elif state is None:
+            action, reason = SyncAction.update, 'not synced before'
+        elif state['sha256'] != sha256:
+            action, reason = SyncAction.update, 'changed'
+        else:
+            action, reason = SyncAction.skip, 'unchanged'
+        yield PlanItem(action, path.native_path, None, reason, key, path, remote, sha256)
+
+
+def plan_targets(language, pages, synced, in_progress=False, force=False):
+    """
+    A translation which was edited locally is never overwritten without ``force``: it is skipped while the page
+    is unchanged and a conflict when the page changed too.
+
+    :param pages: all pages of the language
+    """
+    listed = set()
+    for page in pages:
+        key = target_key(page, language)
+        listed.add(key)
+        if not (page.get('enabled') if in_progress else page.get('completed')):
+            continue
+
+        state = synced.get(key)
+        if state is None:
+            action, reason = SyncAction.download, 'new'
+        elif not os.path.exists(state['path']):
+            action, reason = SyncAction.download, 'missing locally'
+        else:
+            remote_changed = state['remote_update'] != page.get('update')
+            local_changed = not is_file_unchanged(state['path'], state['sha256'])
+            if local_changed and force:
+                action, reason = SyncAction.download, 'changed locally, overwritten'
+            elif local_changed and remote_changed:
+                action, reason = SyncAction.conflict, 'changed locally and remotely'
+            elif local_changed:
+                action, reason = SyncAction.skip, 'changed locally'
+            elif remote_changed:
+                action, reason = SyncAction.download, 'changed'
+            else:
+                action, reason = SyncAction.skip, 'unchanged'
+        yield PlanItem(action, format_file_name(page), language, reason, key, None, page, None)
+
+    prefix = 'target:'
+    suffix = ':{}'.format(language.code)
+    for key, state in sorted(synced.items()):
+        if key.startswith(prefix) and key.endswith(suffix) and key not in listed:
+            yield PlanItem(SyncAction.prune, state['path'], language, 'removed from the project', key,
+                           state['path'], None, state['sha256'])
+
+
+def plan_sync(api, curdir, config, synced, in_progress=False, force=False):
+    """
+    Compare the local sources and translations with the remote pages.
+
+    A source is updated when its sha256 differs from the last synced one. A translation is downloaded when the
+    ``update`` time of its page changed since it was synced or the local file is missing. Local edits of a
+    translation are kept unless ``force`` is set. Translations of removed pages are pruned.
+    :rtype: SyncPlan
+    """
+    def page_index(project):
+        for language in get_destination_languages(project):
+            yield language, api.page_search(language.id)
+
+    project, listings = bootstrap(api, page_index=page_index)
+    plan = SyncPlan()
+
+    try:
+        push_pattern = get_push_pattern(config)
+    except PatternNotFound:
+        log.debug('Push pattern is not configured, only translations are synced.')
+    else:
+        remote_pages = defaultdict(list)
+        languages = list(listings)
+        if languages:
+            listings[languages[0]] = pages = list(iterate(Stage.search, listings[languages[0]]))
+            for page in pages:
+                if not page.get('deleted'):
+                    remote_pages[page['url']].append(page)
+        plan.items.extend(plan_sources(curdir, push_pattern, get_source_language(project), remote_pages, synced))
+
+    for language, pages in listings.items():
+        pages = [page for page in iterate(Stage.search, pages) if not page.get('deleted')]
+        plan.items.extend(plan_targets(language, pages, synced, in_progress=in_progress, force=force))
+    return plan
+
+
+def execute_plan(api, curdir, plan, mirror, project_id, pattern=None, in_progress=False, jobs=1):
+    """
+    Run the steps of the plan on a worker pool. Every finished step is saved to the synced files of the mirror
+    at once, so an interrupted sync continues where it stopped.
+    """
+    def run(item):
+        if item.action == SyncAction.upload:
+            upload_file(api, item.path)
+            mirror.save_synced_file(project_id, item.key, item.path.native_path, sha256=item.sha256)
+        elif item.action == SyncAction.update:
+            result = update_file(api, item.path, item.remote)
+            mirror.save_synced_file(project_id, item.key, item.path.native_path, page_id=result['page_id'],
+                                    sha256=item.sha256)
+        elif item.action == SyncAction.download:
+            result = pull_page(api, curdir, item.language, item.remote, pattern=pattern, force=True,
+                               in_progress=in_progress)
+            if result is not None:
+                target, sha256 = result
+                mirror.save_synced_file(project_id, item.key, target, page_id=item.remote['page_id'],
+                                        sha256=sha256, remote_update=item.remote.get('update'))
+        elif item.action == SyncAction.prune:
+            if is_file_unchanged(item.path, item.sha256):
+                os.remove(item.path)
+                log.info('Removed translation file `{}` of a removed page.'.format(item.path))
+            elif os.path.exists(item.path):
+                log.warning('Translation file `{}` of a removed page was changed locally and is kept.'
+                            .format(item.path))
+            mirror.remove_synced_file(project_id, item.key)
+
+    work = plan.work()
+    add_total(len(work))
+    return worker_pool(jobs).run(run, work)
+
+
+def sync_command(curdir, config, in_progress=False, jobs=1, report=None, force=False):
+    """
+    Plan the minimal set of uploads, updates, downloads and prunes and run it.
+
+    :param bool force: overwrite translations which were edited locally
+    :param report: callable(SyncPlan) called before the plan runs
+    :rtype: SyncPlan
+    """
+    # the mirror keeps the state of the sync, it is only read as a whole with --offline
+    api = use_mirror(ProjectAPI(config), config, warm=False)
+    project_id = config['project_id']
+
+    with Mirror(config.get('mirror') or DEFAULT_MIRROR_PATH) as mirror:
+        plan = plan_sync(api, curdir, config, mirror.synced_files(project_id), in_progress=in_progress,
+                         force=force)
+        if report is not None:
+            report(plan)
+        execute_plan(api, curdir, plan, mirror, project_id, pattern=get_pull_pattern(config, default=None),
+                     in_progress=in_progress, jobs=jobs)
+    return plan
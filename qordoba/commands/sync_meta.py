@@ -0,0 +1,58 @@
+from __future__ import unicode_literals, print_function
+
+import logging
+import time
+from collections import namedtuple
+
+from qordoba.languages import get_destination_languages
+from qordoba.mirror import Mirror, DEFAULT_MIRROR_PATH
+from qordoba.project import ProjectAPI
+from qordoba.stages import Stage, iterate
+from qordoba.workers import WorkerPool
+
+log = logging.getLogger('qordoba')
+
+
+class SyncResult(namedtuple('_SyncResult', ('languages', 'pages', 'changed', 'removed'))):
+    pass
+
+
+def sync_meta_command(config, stats=True, jobs=1):
+    """
+    Bring the local mirror (see qordoba.mirror) up to date with the API.
+
+    Page listings are always read in full, since the API can not list only the changed pages. Only new and
+    changed pages are written, and only their stats and the missing ones are requested again.
+    :rtype: SyncResult
+    """
+    api = ProjectAPI(config)
+    project_id = config['project_id']
+
+    with Mirror(config.get('mirror') or DEFAULT_MIRROR_PATH) as mirror:
+        project = api.get_project()
+        languages = api.get_languages()
+        mirror.save_languages(languages)
+
+        def sync_stats(unit):
+            language_id, page_id = unit
+            mirror.save_page_stats(project_id, language_id, page_id, api.get_page_stats(language_id, page_id))
+
+        result = SyncResult(len(languages), 0, 0, 0)
+        for language in get_destination_languages(project):
+            pages = list(iterate(Stage.search, api.page_search(language.id)))
+            changed, removed = mirror.diff_pages(project_id, language.id, pages, stats=stats)
+            if stats:
+                WorkerPool(jobs).run(sync_stats, [(language.id, page['page_id']) for page in changed])
+            # pages are saved after their stats, so an interrupted sync requests them again
+            mirror.save_pages(project_id, language.id, changed, removed=removed)
+
+            log.info('Language `{}`: {} pages, {} changed, {} removed.'.format(language.code, len(pages),
+                                                                             len(changed), len(removed)))
+            result = result._replace(pages=result.pages + len(pages), changed=result.changed + len(changed),
+                                     removed=result.removed + len(removed))
+
+        mirror.save_progress(project_id, api.get_report_progress())
+        # the project is marked as synced last, so an interrupted sync is never read offline
+        mirror.save_project(project, organization_id=config.get('organization_id'), synced=time.time())
+
+    return result
@@ -4,11 +4,22 @@ import sys
 import errno
 import logging
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from qordoba.languages import init_language_storage
+from qordoba.log import flush as flush_log
 
 log = logging.getLogger('qordoba')
 
 PY3 = sys.version_info[0] == 3
 
+BOOTSTRAP_WORKERS = 8
+
+# Held by workers while they ask the user, so questions of parallel work units do not interleave
+PROMPT_LOCK = threading.RLock()
+
 
 def ask_select(question_list, prompt='Select: '):
     """
@@ -91,6 +102,7 @@ def ask_bool(question='[y/n]?'):
 
 
 def ask_simple(question):
+    flush_log()
     if PY3:
         answer = input(question)
     else:
@@ -127,3 +139,34 @@ def mkdirs(path):
             pass
         else:
             raise
+
+
+def bootstrap(api, page_index=None):
+    """
+    Run the independent setup requests of a command concurrently.
+
+    The language storage and the project are loaded in parallel. ``page_index`` is an optional callable which
+    takes the project and returns ``(key, ResponsePaginatedResult)`` pairs. The first page of every result is
+    requested as soon as the project is known, while the language storage is still loading.
+
+    :param qordoba.project.ProjectAPI api:
+    :param page_index: callable(project) -> iterable of (key, ResponsePaginatedResult)
+    :return: project and OrderedDict of prefetched page search results
+    """
+    pages = OrderedDict()
+    with ThreadPoolExecutor(max_workers=BOOTSTRAP_WORKERS) as pool:
+        languages_future = pool.submit(init_language_storage, api)
+        project_future = pool.submit(api.get_project)
+
+        page_futures = []
+        if page_index is not None:
+            for key, result in page_index(project_future.result()):
+                pages[key] = result
+                page_futures.append(pool.submit(result.prefetch))
+
+        project = project_future.result()
+        languages_future.result()
+        for future in page_futures:
+            future.result()
+
+    return project, pages
@@ -0,0 +1,175 @@
+from __future__ import unicode_literals, print_function
+
+import argparse
+import logging
+import threading
+import time
+
+from qordoba import metrics
+
+log = logging.getLogger('qordoba')
+
+# value of --jobs which enables the adaptive limit
+AUTO = 'auto'
+
+DEFAULT_INITIAL = 4
+DEFAULT_MAX = 32
+
+
+class AIMDLimiter(object):
+    """
+    Concurrency limit of a worker pool which follows the health of the API
+    (additive increase, multiplicative decrease).
+
+    Every successful request of a saturated pool adds ``1 / limit``, so the limit grows by about one per round of
+    requests. A throttled (429) or failed (5xx, connection error) request, a retried request or a latency spike
+    multiplies the limit by ``decrease``; further decreases wait ``cooldown`` seconds, so a burst of errors
+    caused by one overload counts once. A spike is a request slower than ``latency_factor`` times the usual
+    latency of its endpoint, which is known after ``min_samples`` healthy requests.
+    """
+
+    def __init__(self, initial=DEFAULT_INITIAL, min_limit=1, max_limit=DEFAULT_MAX, decrease=0.5,
+                 latency_factor=3.0, min_samples=10, cooldown=1.0, clock=time.time):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self._clock = clock
+
+        self.active = 0
+        self.increases = 0
+        self.decreases = 0
+        self._limit = float(min(max(initial, min_limit), self.max_limit))
+        self._latencies = {}
+        self._last_decrease = None
+        self._cond = threading.Condition()
+        metrics.set_gauge('concurrency_limit', self.limit)
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self):
+        """
+        Block until a unit may start.
+        """
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def observe_span(self, span):
+        """
+        Adjust the limit by the outcome of one API request.
+        :param qordoba.tracing.Span span:
+        """
+        status = span.status or 0
+        if span.error or status == 429 or status >= 500 or span.retries or span.throttled:
+            self._decrease('{} {} {}'.format(span.method, span.name, span.error or status))
+        elif self._is_spike(span):
+            self._decrease('{} {} took {:.2f}s'.format(span.method, span.name, span.duration))
+        else:
+            self._increase()
+
+    def _is_spike(self, span):
+        if span.duration is None:
+            return False
+        with self._cond:
+            average, count = self._latencies.get(span.name, (span.duration, 0))
+            if count >= self.min_samples and span.duration > average * self.latency_factor:
+                return True
+            # a moving average of the healthy requests only, so spikes do not raise the bar
+            self._latencies[span.name] = (average + (span.duration - average) * 0.1, count + 1)
+        return False
+
+    def _increase(self):
+        with self._cond:
+            # an idle pool does not prove that more requests are healthy
+            if self.active < self.limit or self._limit >= self.max_limit:
+                return
+            before = self.limit
+            self._limit = min(self._limit + 1.0 / self._limit, self.max_limit)
+            if self.limit == before:
+                return
+            self.increases += 1
+            self._cond.notify_all()
+            limit = self.limit
+        metrics.set_gauge('concurrency_limit', limit)
+
+    def _decrease(self, reason):
+        now = self._clock()
+        with self._cond:
+            if self._last_decrease is not None and now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            before = self.limit
+            self._limit = max(self._limit * self.decrease, self.min_limit)
+            if self.limit == before:
+                return
+            self.decreases += 1
+            limit = self.limit
+        log.debug('Concurrency limit {} -> {}: {}'.format(before, limit, reason))
+        metrics.set_gauge('concurrency_limit', limit)
+
+    def summary(self):
+        return 'Concurrency limit {} (max {}), raised {} and lowered {} times.'.format(
+            self.limit, self.max_limit, self.increases, self.decreases)
+
+
+class RateLimiter(object):
+    """
+    Space the calls of ``wait`` at least ``1 / rate`` seconds apart, across all threads of a pool.
+    """
+
+    def __init__(self, rate, clock=time.time, sleep=time.sleep):
+        self.interval = 1.0 / rate
+        self._clock = clock
+        self._sleep = sleep
+        self._next = None
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = self._clock()
+            start = now if self._next is None else max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            self._sleep(start - now)
+
+
+def parse_jobs(value):
+    """
+    :param value: number of threads, ``auto`` or ``auto:MAX``
+    :return: (jobs, adaptive). With ``adaptive`` jobs is the maximum of the adaptive limit.
+    """
+    if isinstance(value, int):
+        return max(value, 1), False
+    value = str(value or 1)
+    if value == AUTO:
+        return DEFAULT_MAX, True
+    adaptive = value.startswith(AUTO + ':')
+    jobs = int(value[len(AUTO) + 1:] if adaptive else value)
+    if jobs < 1:
+        raise ValueError('Number of jobs must be positive, got `{}`'.format(value))
+    return jobs, adaptive
+
+
+class JobsType(object):
+    """
+    Argparse type of --jobs: a number of threads, ``auto`` or ``auto:MAX`` for the adaptive limit.
+    """
+
+    def __call__(self, value):
+        try:
+            jobs, adaptive = parse_jobs(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError('expected a positive number, `auto` or `auto:MAX`, got `{}`'
+                                             .format(value))
+        return value if adaptive else jobs
@@ -0,0 +1,55 @@
+from __future__ import unicode_literals, print_function
+
+import time
+
+_DEADLINE = None
+
+
+class DeadlineExceeded(Exception):
+    """
+    The run reached its deadline before all work units were started
+    """
+
+    def __init__(self, deadline, done, left=None):
+        self.deadline = deadline
+        self.done = done
+        self.left = left
+        super(DeadlineExceeded, self).__init__(
+            'Deadline of {:.0f}s reached: {} files done, {} not started. Run the command again with --resume '
+            'to process the rest.'.format(deadline.seconds, done, 'the rest' if left is None else left))
+
+
+class Deadline(object):
+    """
+    Time budget of the whole command run.
+    """
+
+    def __init__(self, seconds, clock=time.time):
+        self.seconds = seconds
+        self._clock = clock
+        self.expires = clock() + seconds
+
+    def remaining(self):
+        return max(self.expires - self._clock(), 0.0)
+
+    def expired(self):
+        return self._clock() >= self.expires
+
+
+def set_deadline(seconds):
+    global _DEADLINE
+    _DEADLINE = Deadline(seconds) if seconds else None
+    return _DEADLINE
+
+
+def clear_deadline():
+    global _DEADLINE
+    _DEADLINE = None
+
+
+def get_deadline():
+    """
+    :return: Deadline of the run or None
+    :rtype: Deadline
+    """
+    return _DEADLINE
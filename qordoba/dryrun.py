@@ -0,0 +1,158 @@
+from __future__ import unicode_literals, print_function
+
+import threading
+from collections import Counter, OrderedDict
+
+from qordoba.progress import format_duration
+from qordoba.routes import ROUTES
+from qordoba.tracing import add_span_listener, remove_span_listener
+from qordoba.utils import format_bytes
+
+# number of translations downloaded by a pull --dry-run to estimate the size of the others
+DRY_RUN_SAMPLES = 3
+
+_ROUTE_NAMES = {route.template: route.name for route in ROUTES}
+
+_DRY_RUN = None
+
+
+class DryRunError(Exception):
+    """
+    A request which changes the project was sent during a dry run
+    """
+
+
+class DryRun(object):
+    """
+    Cost of a command run which only discovers its work.
+
+    Commands count the files, bytes and API requests they would send. The read requests of the discovery are
+    sent and measured, and their latency estimates the duration of the real run on ``jobs`` threads.
+    Endpoints which were not measured are estimated with the mean latency of all measured requests.
+    """
+
+    def __init__(self, jobs=1):
+        self.jobs = max(jobs, 1)
+        self.files = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.planned = Counter()
+        self.sent = Counter()
+        self._durations = Counter()
+        self._samples = []
+        self._sampling = 0
+        self._unsized = 0
+        self._lock = threading.Lock()
+
+    def add_file(self, bytes_out=0, bytes_in=0):
+        """
+        :param int bytes_in: size of the download or None if it is estimated from the samples
+        """
+        with self._lock:
+            self.files += 1
+            self.bytes_out += bytes_out
+            if bytes_in is None:
+                self._unsized += 1
+            else:
+                self.bytes_in += bytes_in
+
+    def take_sample(self):
+        """
+        :return: True if the caller should transfer the file to measure it
+        """
+        with self._lock:
+            self._sampling += 1
+            return self._sampling <= DRY_RUN_SAMPLES
+
+    def add_sample(self, size):
+        with self._lock:
+            self._samples.append(size)
+
+    def add_requests(self, *routes):
+        """
+        :param routes: names of the routes in qordoba.routes, one per request
+        """
+        with self._lock:
+            self.planned.update(routes)
+
+    def observe_span(self, span):
+        name = _ROUTE_NAMES.get(span.name, span.name)
+        with self._lock:
+            self.sent[name] += 1
+            self._durations[name] += span.duration or 0.0
+
+    def estimated_bytes_in(self):
+        """
+        :return: bytes to download or None if some files are not sized and nothing was sampled
+        """
+        if not self._unsized:
+            return self.bytes_in
+        if not self._samples:
+            return None
+        return self.bytes_in + self._unsized * sum(self._samples) // len(self._samples)
+
+    def latency(self, route):
+        """
+        :return: mean seconds of one request to the route or None if nothing was measured
+        """
+        if self.sent[route]:
+            return self._durations[route] / self.sent[route]
+        total = sum(self.sent.values())
+        if total:
+            return sum(self._durations.values()) / total
+        return None
+
+    def duration(self):
+        """
+        :return: estimated seconds of the real run or None without measured requests
+        """
+        if not self.sent:
+            return None
+        seconds = sum(count * self.latency(route) for route, count in self.planned.items())
+        # measured downloads include the transfer, the upload time is added at the download throughput
+        downloaded = sum(self._samples)
+        if self.bytes_out and downloaded and self._durations['file_download']:
+            seconds += self.bytes_out / (downloaded / self._durations['file_download'])
+        return seconds / self.jobs
+
+    def rows(self):
+        """
+        :return: rows for AsciiTable with the requests per endpoint
+        """
+        rows = [['ENDPOINT', 'REQUESTS', 'SENT BY DRY RUN', 'MEAN LATENCY'], ]
+        for route in OrderedDict.fromkeys(list(self.planned) + list(self.sent)):
+            latency = self.latency(route) if self.sent[route] else None
+            rows.append([route, self.planned[route], self.sent[route],
+                         '-' if latency is None else '{:.0f} ms'.format(latency * 1000)])
+        return rows
+
+    def summary(self):
+        duration = self.duration()
+        bytes_in = self.estimated_bytes_in()
+        return 'Dry run: {} files, {} to upload, {} to download, {} API requests, {} with {} jobs.'.format(
+            self.files, format_bytes(self.bytes_out), 'unknown size' if bytes_in is None else format_bytes(bytes_in),
+            sum(self.planned.values()),
+            'duration unknown' if duration is None else 'about {}'.format(format_duration(duration)), self.jobs)
+
+
+def enable_dry_run(jobs=1):
+    global _DRY_RUN
+    disable_dry_run()
+    _DRY_RUN = DryRun(jobs=jobs)
+    add_span_listener(_DRY_RUN.observe_span)
+    return _DRY_RUN
+
+
+def disable_dry_run():
+    global _DRY_RUN
+    if _DRY_RUN is not None:
+        remove_span_listener(_DRY_RUN.observe_span)
+    _DRY_RUN = None
+
+
+def get_dry_run():
+    """
+    :return: Active DryRun or None
+    :rtype: DryRun
+    """
+    return _DRY_RUN
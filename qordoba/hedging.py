@@ -0,0 +1,129 @@
+from __future__ import unicode_literals, print_function
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from qordoba.tracing import percentile
+
+log = logging.getLogger('qordoba')
+
+_POLICY = None
+
+
+class HedgePolicy(object):
+    """
+    Send a duplicate of a slow read request and use the response which arrives first.
+
+    The hedge is sent when the request has not finished after the ``percentile`` latency of the last ``window``
+    requests to the same endpoint, clipped to ``min_delay`` .. ``max_delay``. Until ``min_samples`` latencies
+    are known ``max_delay`` is used.
+
+    The extra load is capped by a token bucket: every request adds ``budget`` tokens (up to ``burst``) and every
+    hedge takes one, so with ``budget=0.05`` at most about 5% more requests are sent.
+    """
+
+    def __init__(self, percentile=95, budget=0.05, min_delay=0.02, max_delay=2.0, window=200, min_samples=20,
+                 burst=10, max_workers=64):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.burst = burst
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def delay(self, endpoint):
+        """
+        :return: seconds to wait for the response before the hedge is sent
+        """
+        with self._lock:
+            latencies = list(self._latencies[endpoint])
+        if len(latencies) < self.min_samples:
+            return self.max_delay
+        return min(max(percentile(latencies, self.percentile), self.min_delay), self.max_delay)
+
+    def observe(self, endpoint, latency):
+        with self._lock:
+            self._latencies[endpoint].append(latency)
+
+    def _take_token(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.hedged += 1
+                return True
+            return False
+
+    def send(self, endpoint, func, *args, **kwargs):
+        """
+        Call ``func(*args, **kwargs)`` and hedge it when it is slow.
+        :return: (result, hedged)
+        """
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self._tokens + self.budget, self.burst)
+
+        started = time.time()
+        primary = self._executor.submit(func, *args, **kwargs)
+        done, _ = wait([primary], timeout=self.delay(endpoint))
+        if done or not self._take_token():
+            result = primary.result()
+            self.observe(endpoint, time.time() - started)
+            return result, False
+
+        hedge = self._executor.submit(func, *args, **kwargs)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # a failed request is ignored while the other one may still succeed
+            future = next((f for f in done if f.exception() is None), None)
+            if future is not None or not pending:
+                break
+
+        self.observe(endpoint, time.time() - started)
+        if future is None:
+            return primary.result(), True
+        if future is hedge:
+            with self._lock:
+                self.hedge_wins += 1
+        return future.result(), True
+
+    def summary(self):
+        return 'Hedged {} of {} requests, the hedge was faster {} times.'.format(self.hedged, self.requests,
+                                                                                self.hedge_wins)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def enable_hedging(**kwargs):
+    global _POLICY
+    disable_hedging()
+    _POLICY = HedgePolicy(**kwargs)
+    return _POLICY
+
+
+def disable_hedging():
+    global _POLICY
+    if _POLICY is not None:
+        _POLICY.shutdown()
+    _POLICY = None
+
+
+def get_hedging():
+    """
+    :return: Active HedgePolicy or None
+    :rtype: HedgePolicy
+    """
+    return _POLICY
@@ -0,0 +1,158 @@
+from __future__ import unicode_literals, print_function
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+log = logging.getLogger('qordoba')
+
+JOURNAL_VERSION = 1
+TEMP_SUFFIX = '.part'
+
+_TEMP_FILES = set()
+_TEMP_FILES_LOCK = threading.RLock()
+
+
+class JournalError(Exception):
+    """
+    Journal can not be used to resume the run
+    """
+
+
+class Journal(object):
+    """
+    Append-only log of the finished work units of a push/pull run.
+
+    Every entry is a JSON line which is flushed and fsynced before the unit is reported as done, so after a crash
+    or Ctrl+C the journal lists exactly the units which do not need to be repeated. A partially written last line
+    is ignored when the journal is loaded.
+
+    The first line identifies the run (command and project). A journal of a different run is never resumed.
+    """
+
+    def __init__(self, path, command, project_id, resume=False):
+        self.path = path
+        self.command = command
+        self.project_id = project_id
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            self._load()
+            log.info('Resuming from journal `{}`: {} finished units.'.format(path, len(self.entries)))
+        else:
+            self._write({'journal': JOURNAL_VERSION, 'command': command, 'project_id': project_id}, mode='w')
+
+    def _load(self):
+        with io.open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+        header = _decode(lines[0]) if lines else None
+        if not header or header.get('command') != self.command or header.get('project_id') != self.project_id:
+            raise JournalError('Journal `{}` belongs to another run. Remove it or start without --resume.'
+                               .format(self.path))
+
+        for line in lines[1:]:
+            entry = _decode(line)
+            if entry is None:
+                log.debug('Skip incomplete journal entry: {}'.format(line))
+                continue
+            self.entries[entry['key']] = entry
+
+    def _write(self, entry, mode='a'):
+        line = '{}\n'.format(json.dumps(entry, sort_keys=True))
+        with self._lock:
+            with io.open(self.path, mode, encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def get(self, key):
+        """
+        :return: entry of a finished unit or None
+        """
+        return self.entries.get(key)
+
+    def record(self, key, **fields):
+        """
+        Save a finished unit, e.g. ``record('pull:1:fr-fr', target='fr-fr/a.json', sha256='...')``.
+        """
+        entry = dict(fields, key=key)
+        self._write(entry)
+        with self._lock:
+            self.entries[key] = entry
+
+    def remove(self):
+        """
+        Drop the journal once the whole run succeeded.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _decode(line):
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+def default_journal_path(curdir, command):
+    return os.path.join(curdir, '.qordoba-{}.journal'.format(command))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_file_unchanged(path, sha256):
+    return bool(sha256) and os.path.isfile(path) and file_sha256(path) == sha256
+
+
+@contextmanager
+def temp_file(path):
+    """
+    Write to ``path + TEMP_SUFFIX`` and move it to ``path`` only when the block succeeds, so an interrupted
+    download never leaves a truncated translation file behind.
+    The temporary file is registered for cleanup_temp_files while it exists.
+    """
+    tmp_path = path + TEMP_SUFFIX
+    with _TEMP_FILES_LOCK:
+        _TEMP_FILES.add(tmp_path)
+    try:
+        yield tmp_path
+        if os.path.exists(path) and os.name == 'nt':
+            os.remove(path)
+        os.rename(tmp_path, path)
+    finally:
+        with _TEMP_FILES_LOCK:
+            _TEMP_FILES.discard(tmp_path)
+        _remove_quietly(tmp_path)
+
+
+def cleanup_temp_files():
+    """
+    Remove the temporary files of the downloads in flight. Called from the SIGINT/SIGTERM handler.
+    """
+    with _TEMP_FILES_LOCK:
+        paths = list(_TEMP_FILES)
+        _TEMP_FILES.clear()
+    for path in paths:
+        _remove_quietly(path)
+    return paths
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
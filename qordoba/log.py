@@ -1,7 +1,15 @@
+import atexit
 import logging
 import os
 import sys
 
+try:
+    from queue import Queue
+    from logging.handlers import QueueHandler, QueueListener
+except ImportError:
+    # python27
+    QueueHandler = QueueListener = None
+
 
 class BaseFormatter(logging.Formatter):
     def __init__(self, fmt=None, datefmt=None, traceback=False):
@@ -73,7 +81,35 @@ class TextFormatter(BaseFormatter):
             return name + ':'
 
 
-def init(level=None, traceback=False, handler=logging.StreamHandler()):
+_QUEUE = None
+
+
+def flush():
+    """
+    Wait until queued log records are written. Call before asking the user anything.
+    """
+    if _QUEUE is not None:
+        _QUEUE.join()
+
+
+if QueueHandler is not None:
+    class RecordQueueHandler(QueueHandler):
+        """
+        Put records to the queue without formatting them, so the formatters of the output handler
+        still see the original level and exception info.
+        """
+
+        def prepare(self, record):
+            record.msg = record.getMessage()
+            record.args = None
+            return record
+
+
+def init(level=None, traceback=False, handler=logging.StreamHandler(), non_blocking=False):
+    """
+    :param bool non_blocking: Write log records from a background thread, so workers never wait for
+        a slow terminal. Falls back to direct output on python 2.
+    """
     logger = logging.getLogger('qordoba')
 
     if os.isatty(sys.stdout.fileno()) and not sys.platform.startswith('win'):
@@ -81,7 +117,16 @@ def init(level=None, traceback=False, handler=logging.StreamHandler()):
     else:
         fmt = TextFormatter(traceback=traceback)
     handler.setFormatter(fmt)
-    logger.addHandler(handler)
+
+    if non_blocking and QueueHandler is not None:
+        global _QUEUE
+        queue = _QUEUE = Queue(-1)
+        listener = QueueListener(queue, handler)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(RecordQueueHandler(queue))
+    else:
+        logger.addHandler(handler)
 
     if level:
         logger.setLevel(level)
@@ -0,0 +1,201 @@
+from __future__ import unicode_literals, print_function
+
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+DEFAULT_TTL = 60.0
+
+# entries kept by one memo, the oldest are evicted first
+DEFAULT_MAX_SIZE = 1024
+
+# api url -> TTLMemo of the reads which do not depend on the project
+_CATALOGS = None
+_CATALOGS_LOCK = threading.Lock()
+
+
+class TTLMemo(object):
+    """
+    Results of API reads kept for ``ttl`` seconds.
+
+    Every entry has tags, e.g. ``pages`` or ``page:123``. A write invalidates the tags it affects, so a
+    caller never reads a listing which is older than its own changes. ``ttl=0`` disables the memo.
+    Cached values are shared between callers and must not be modified.
+
+    At most ``max_size`` entries are kept, the oldest one is evicted when a new one is set. An expired entry is
+    dropped when it is read.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=time.time, max_size=DEFAULT_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        # tag -> keys of its entries, so an invalidation does not scan all entries
+        self._tags = defaultdict(set)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self):
+        """
+        Number of invalidations so far. Pass it from before the read to ``set``.
+        """
+        return self._generation
+
+    def get(self, key):
+        """
+        :return: (found, value)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self.hits += 1
+                    return True, entry[1]
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, tags=(), generation=None):
+        """
+        :param generation: ``generation`` when the value was read. The value is dropped when a write
+            invalidated entries while it was being read, since it may be older than the write.
+        """
+        if not self.ttl:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (self._clock() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags[tag].add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _call_args(func, self, args, kwargs):
+    """
+    :return: arguments of the call by name, with the defaults and without ``self``
+    """
+    call_args = inspect.getcallargs(func, self, *args, **kwargs)
+    call_args.pop('self', None)
+    return call_args
+
+
+def _format_tags(tags, call_args):
+    return [tag.format(**call_args) for tag in tags]
+
+
+def memoized(*tags, **options):
+    """
+    Keep the result of a read method in ``self._memo``.
+
+    The key is built from the arguments by name, so ``f(1, page_id=5)`` and ``f(1, 5)`` share an entry.
+    :param tags: tags of the entry, formatted with the arguments of the call, e.g. ``page:{page_id}``
+    :param memo: name of the TTLMemo attribute, ``_memo`` by default
+    """
+    attribute = options.pop('memo', '_memo')
+
+    def wrapper(func):
+        @functools.wraps(func)
+        def _wrap(self, *args, **kwargs):
+            memo = getattr(self, attribute)
+            call_args = _call_args(func, self, args, kwargs)
+            key = (func.__name__, tuple(sorted(call_args.items())))
+            try:
+                found, value = memo.get(key)
+            except TypeError:
+                # unhashable arguments, e.g. a list of statuses
+                key = (func.__name__, repr(sorted(call_args.items())))
+                found, value = memo.get(key)
+            if found:
+                return value
+            generation = memo.generation
+            value = func(self, *args, **kwargs)
+            memo.set(key, value, _format_tags(tags, call_args), generation=generation)
+            return value
+
+        return _wrap
+
+    return wrapper
+
+
+def invalidates(*tags):
+    """
+    Drop the memoized reads affected by a write method once it succeeded.
+
+    :param tags: formatted with the arguments of the call like the tags of ``memoized``
+    """
+    def wrapper(func):
+        @functools.wraps(func)
+        def _wrap(self, *args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                # a failed write may still have changed the project
+                if any('{' in tag for tag in tags):
+                    self._memo.invalidate(*_format_tags(tags, _call_args(func, self, args, kwargs)))
+                else:
+                    self._memo.invalidate(*tags)
+
+        return _wrap
+
+    return wrapper
+
+
+def enable_shared_catalog():
+    """
+    Share the reads which do not depend on the project, e.g. the language catalog, between all ProjectAPI
+    instances of the process.
+    """
+    global _CATALOGS
+    _CATALOGS = {}
+
+
+def disable_shared_catalog():
+    global _CATALOGS
+    _CATALOGS = None
+
+
+def get_shared_catalog(api_url, ttl=DEFAULT_TTL):
+    """
+    :return: TTLMemo shared by the ProjectAPIs of ``api_url`` or None if sharing is not enabled
+    """
+    catalogs = _CATALOGS
+    if catalogs is None:
+        return None
+    with _CATALOGS_LOCK:
+        if api_url not in catalogs:
+            catalogs[api_url] = TTLMemo(ttl=ttl)
+        return catalogs[api_url]
@@ -0,0 +1,304 @@
+from __future__ import unicode_literals, print_function
+
+import argparse
+import io
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+from qordoba.stages import StageListener, add_listener, remove_listener
+from qordoba.tracing import add_span_listener, remove_span_listener
+
+log = logging.getLogger('qordoba')
+
+METRIC_PREFIX = 'qordoba_'
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+SUMMARY = 'summary'
+
+METRICS_HELP = {
+    'requests_total': 'API requests by endpoint and status.',
+    'request_duration_seconds': 'API request duration.',
+    'bytes_total': 'Bytes transferred to and from the API.',
+    'retries_total': 'Retried API requests.',
+    'throttle_seconds_total': 'Time spent waiting because the API throttled requests.',
+    'hedged_requests_total': 'Slow read requests which were sent a second time.',
+    'concurrency_limit': 'Current limit of the adaptive worker pool.',
+    'files_total': 'Files processed by the command.',
+    'stage_duration_seconds': 'Time spent in command stages.',
+    'run_duration_seconds': 'Duration of the command run.',
+    'run_success': 'Whether the command run finished without errors.',
+    'last_run_timestamp_seconds': 'Unix time of the end of the command run.',
+}
+
+_METRICS = None
+
+
+class Metrics(StageListener):
+    """
+    In-process metric registry.
+
+    Values are aggregated for the Prometheus textfile and forwarded as single events to the optional sinks
+    (see StatsdSink). ``labels`` are added to every sample, e.g. the command name.
+    """
+
+    def __init__(self, labels=None, sinks=()):
+        self.labels = OrderedDict(sorted((labels or {}).items()))
+        self.sinks = list(sinks)
+        self._types = OrderedDict()
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, kind, name, labels):
+        self._types.setdefault(name, kind)
+        return name, tuple(sorted(labels.items()))
+
+    def _sink_labels(self, labels):
+        """
+        :return: labels of the registry updated by the labels of the event
+        """
+        if not self.labels:
+            return labels
+        merged = dict(self.labels)
+        merged.update(labels)
+        return merged
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            key = self._key(COUNTER, name, labels)
+            self._values[key] = self._values.get(key, 0) + value
+        for sink in self.sinks:
+            sink.count(name, value, self._sink_labels(labels))
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[self._key(GAUGE, name, labels)] = value
+        for sink in self.sinks:
+            sink.gauge(name, value, self._sink_labels(labels))
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            key = self._key(SUMMARY, name, labels)
+            total, count = self._values.get(key, (0.0, 0))
+            self._values[key] = (total + value, count + 1)
+        for sink in self.sinks:
+            sink.timing(name, value, self._sink_labels(labels))
+
+    def observe_span(self, span):
+        """
+        Account one API request.
+        :param qordoba.tracing.Span span:
+        """
+        status = str(span.status) if span.status is not None else 'error'
+        self.inc('requests_total', endpoint=span.name, method=span.method, status=status)
+        self.observe('request_duration_seconds', span.duration or 0.0, endpoint=span.name, method=span.method)
+        if span.bytes_in:
+            self.inc('bytes_total', span.bytes_in, direction='in')
+        if span.bytes_out:
+            self.inc('bytes_total', span.bytes_out, direction='out')
+        if span.retries:
+            self.inc('retries_total', span.retries, endpoint=span.name)
+        if span.throttled:
+            self.inc('throttle_seconds_total', span.throttled, endpoint=span.name)
+        if span.hedged:
+            self.inc('hedged_requests_total', endpoint=span.name)
+
+    def stage_finished(self, name, duration):
+        self.observe('stage_duration_seconds', duration, stage=name)
+
+    def samples(self):
+        """
+        :return: list of (type, name, labels, value). Summaries are split into ``_sum`` and ``_count`` samples.
+        """
+        with self._lock:
+            values = list(self._values.items())
+
+        result = []
+        for (name, labels), value in values:
+            kind = self._types[name]
+            labels = OrderedDict(sorted(list(self.labels.items()) + list(labels)))
+            if kind == SUMMARY:
+                total, count = value
+                result.append((kind, name + '_sum', labels, total))
+                result.append((kind, name + '_count', labels, count))
+            else:
+                result.append((kind, name, labels, value))
+        return result
+
+    def types(self):
+        return self._types.items()
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+class StatsdSink(object):
+    """
+    Send metric events over UDP in the StatsD line protocol. Labels are sent as DogStatsD tags
+    (``name:value|c|#key:value``), which Telegraf and the Datadog agent understand.
+    Lines are batched into datagrams of at most ``max_packet`` bytes.
+    """
+
+    def __init__(self, host, port, prefix='qordoba.', max_packet=512):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self.max_packet = max_packet
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._buffer = []
+        self._buffer_size = 0
+        self._lock = threading.Lock()
+
+    def count(self, name, value, labels):
+        self._send(name, value, 'c', labels)
+
+    def gauge(self, name, value, labels):
+        self._send(name, value, 'g', labels)
+
+    def timing(self, name, value, labels):
+        self._send(name, int(value * 1000), 'ms', labels)
+
+    def _send(self, name, value, kind, labels):
+        line = '{}{}:{}|{}'.format(self.prefix, name, value, kind)
+        if labels:
+            line += '|#' + ','.join('{}:{}'.format(k, v) for k, v in sorted(labels.items()))
+        line = line.encode('utf-8')
+
+        with self._lock:
+            if self._buffer and self._buffer_size + len(line) + 1 > self.max_packet:
+                self._flush()
+            self._buffer.append(line)
+            self._buffer_size += len(line) + 1
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        try:
+            self._socket.sendto(b'\n'.join(self._buffer), self.address)
+        except socket.error as e:
+            log.debug('Could not send metrics to statsd {}: {}'.format(self.address, e))
+        self._buffer = []
+        self._buffer_size = 0
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+
+DEFAULT_STATSD_HOST = '127.0.0.1'
+DEFAULT_STATSD_PORT = 8125
+
+
+def parse_statsd_address(value):
+    """
+    :param str value: ``HOST:PORT``, ``HOST`` or ``:PORT``
+    :return: (host, port)
+    :raises ValueError: the port is not a number
+    """
+    host, sep, port = value.rpartition(':')
+    if not sep:
+        host, port = value, ''
+    return host or DEFAULT_STATSD_HOST, int(port or DEFAULT_STATSD_PORT)
+
+
+class StatsdAddressType(object):
+    """
+    Argparse type of --statsd, see parse_statsd_address.
+    """
+
+    def __call__(self, value):
+        try:
+            host, port = parse_statsd_address(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError('expected HOST:PORT, got `{}`'.format(value))
+        if not 0 < port < 65536:
+            raise argparse.ArgumentTypeError('port out of range in `{}`'.format(value))
+        return host, port
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_prometheus(metrics):
+    samples = metrics.samples()
+    lines = []
+    for name, kind in metrics.types():
+        metric_name = METRIC_PREFIX + name
+        if name in METRICS_HELP:
+            lines.append('# HELP {} {}'.format(metric_name, METRICS_HELP[name]))
+        lines.append('# TYPE {} {}'.format(metric_name, kind))
+        for _, sample_name, labels, value in samples:
+            if sample_name not in (name, name + '_sum', name + '_count'):
+                continue
+            label_text = ','.join('{}="{}"'.format(k, _escape_label(v)) for k, v in labels.items())
+            lines.append('{}{}{} {}'.format(METRIC_PREFIX, sample_name,
+                                            '{' + label_text + '}' if label_text else '', value))
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_textfile(metrics, path):
+    """
+    Write metrics in the Prometheus text format. The file is replaced atomically, so the node exporter
+    textfile collector never reads a partial file.
+    """
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with io.open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(format_prometheus(metrics))
+    if os.path.exists(path) and os.name == 'nt':
+        os.remove(path)
+    os.rename(tmp_path, path)
+
+
+def enable_metrics(labels=None, sinks=()):
+    global _METRICS
+    disable_metrics()
+    _METRICS = Metrics(labels=labels, sinks=sinks)
+    add_listener(_METRICS)
+    add_span_listener(_METRICS.observe_span)
+    return _METRICS
+
+
+def disable_metrics():
+    global _METRICS
+    if _METRICS is not None:
+        remove_listener(_METRICS)
+        remove_span_listener(_METRICS.observe_span)
+    _METRICS = None
+
+
+def get_metrics():
+    """
+    :return: Active registry or None when metrics are disabled.
+    :rtype: Metrics
+    """
+    return _METRICS
+
+
+def inc(name, value=1, **labels):
+    """
+    Increment a counter of the active registry. Does nothing when metrics are disabled.
+    """
+    metrics = _METRICS
+    if metrics is not None:
+        metrics.inc(name, value, **labels)
+
+
+def set_gauge(name, value, **labels):
+    """
+    Set a gauge of the active registry. Does nothing when metrics are disabled.
+    """
+    metrics = _METRICS
+    if metrics is not None:
+        metrics.set(name, value, **labels)
+
+
+def finish_run(metrics, started, success):
+    metrics.set('run_duration_seconds', time.time() - started)
+    metrics.set('run_success', 1 if success else 0)
+    metrics.set('last_run_timestamp_seconds', int(time.time()))
+    metrics.flush()
@@ -0,0 +1,388 @@
+from __future__ import unicode_literals, print_function
+
+import json
+import logging
+import sqlite3
+import threading
+
+from qordoba.project import PageStatus, ResponsePaginatedResult
+
+log = logging.getLogger('qordoba')
+
+DEFAULT_MIRROR_PATH = '.qordoba-meta.db'
+
+SCHEMA_VERSION = 2
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    organization_id INTEGER,
+    data TEXT NOT NULL,
+    synced REAL
+);
+CREATE TABLE IF NOT EXISTS languages (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    project_id INTEGER NOT NULL,
+    language_id INTEGER NOT NULL,
+    page_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    "update" INTEGER,
+    enabled INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    preparing INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (project_id, language_id, page_id)
+);
+CREATE INDEX IF NOT EXISTS pages_url ON pages (project_id, url);
+CREATE INDEX IF NOT EXISTS pages_page_id ON pages (page_id);
+CREATE INDEX IF NOT EXISTS pages_update ON pages (project_id, "update");
+CREATE TABLE IF NOT EXISTS page_stats (
+    project_id INTEGER NOT NULL,
+    language_id INTEGER NOT NULL,
+    page_id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (project_id, language_id, page_id)
+);
+CREATE TABLE IF NOT EXISTS progress (
+    project_id INTEGER NOT NULL,
+    language_id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (project_id, language_id)
+);
+CREATE TABLE IF NOT EXISTS synced_files (
+    project_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    page_id INTEGER,
+    sha256 TEXT,
+    remote_update INTEGER,
+    PRIMARY KEY (project_id, key)
+);
+'''
+
+
+class MirrorError(Exception):
+    """
+    The data is not in the local mirror
+    """
+
+
+_MISSING = object()
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+
+class Mirror(object):
+    """
+    Local SQLite copy of the remote state of projects: the project, languages, pages of every target language,
+    page stats and progress reports. Rows are stored as the API returned them; the columns next to ``data``
+    exist for the indexes and filters.
+
+    ``synced_files`` keeps the local side: the files which `qor sync` pushed or pulled, with their sha256
+    and the ``update`` time of the page they were synced with.
+    """
+
+    def __init__(self, path=DEFAULT_MIRROR_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise MirrorError('Mirror `{}` was created by a newer version of qordoba-cli'.format(path))
+        with self._db:
+            self._db.executescript(SCHEMA)
+            self._db.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def save_project(self, project, organization_id=None, synced=None):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?)',
+                             (project['id'], organization_id, _dumps(project), synced))
+
+    def save_languages(self, languages):
+        with self._lock, self._db:
+            self._db.executemany('INSERT OR REPLACE INTO languages (id, code, data) VALUES (?, ?, ?)',
+                                 [(l['id'], l['code'].lower(), _dumps(l)) for l in languages])
+
+    def diff_pages(self, project_id, language_id, pages, stats=False):
+        """
+        Compare the complete listing of a language from the API with the mirror.
+        :param bool stats: a page without mirrored stats counts as changed
+        :return: (new or changed pages, ids of the pages which are gone)
+        """
+        with self._lock:
+            stored = dict(self._db.execute('SELECT page_id, data FROM pages WHERE project_id = ? AND language_id = ?',
+                                           (project_id, language_id)))
+            with_stats = set(row[0] for row in self._db.execute(
+                'SELECT page_id FROM page_stats WHERE project_id = ? AND language_id = ?', (project_id, language_id)))
+        changed = [page for page in pages if stored.get(page['page_id']) != _dumps(page)
+                   or (stats and page['page_id'] not in with_stats)]
+        listed = set(page['page_id'] for page in pages)
+        return changed, [page_id for page_id in stored if page_id not in listed]
+
+    def refresh_pages(self, project_id, language_id, pages):
+        """
+        Save the new and changed pages of a partial listing, e.g. one result page of a search, and drop the
+        mirrored stats of the changed ones in all languages, since a listing shows only one of them.
+        :return: number of changed pages
+        """
+        if not pages:
+            return 0
+        ids = [page['page_id'] for page in pages]
+        with self._lock:
+            stored = dict(self._db.execute(
+                'SELECT page_id, data FROM pages WHERE project_id = ? AND language_id = ? AND page_id IN ({})'
+                .format(','.join('?' * len(ids))), [project_id, language_id] + ids))
+        changed = [page for page in pages if stored.get(page['page_id']) != _dumps(page)]
+        if changed:
+            self.save_pages(project_id, language_id, changed)
+            with self._lock, self._db:
+                self._db.executemany('DELETE FROM page_stats WHERE project_id = ? AND page_id = ?',
+                                     [(project_id, page['page_id']) for page in changed])
+        return len(changed)
+
+    def save_pages(self, project_id, language_id, pages, removed=()):
+        rows = [(project_id, language_id, page['page_id'], page['url'], page.get('update'),
+                 int(bool(page.get('enabled'))), int(bool(page.get('completed'))), int(bool(page.get('preparing'))),
+                 _dumps(page)) for page in pages]
+        removed = [(project_id, language_id, page_id) for page_id in removed]
+        with self._lock, self._db:
+            self._db.executemany('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            for table in ('pages', 'page_stats'):
+                self._db.executemany('DELETE FROM {} WHERE project_id = ? AND language_id = ? AND page_id = ?'
+                                     .format(table), removed)
+
+    def remove_unlisted_pages(self, project_id, language_id, listed):
+        """
+        Remove the pages of a language which are not in its complete listing.
+        :param set listed: ids of all listed pages
+        """
+        with self._lock:
+            stored = [row[0] for row in self._db.execute(
+                'SELECT page_id FROM pages WHERE project_id = ? AND language_id = ?', (project_id, language_id))]
+        removed = [page_id for page_id in stored if page_id not in listed]
+        if removed:
+            self.save_pages(project_id, language_id, [], removed=removed)
+        return len(removed)
+
+    def save_page_stats(self, project_id, language_id, page_id, stats):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO page_stats VALUES (?, ?, ?, ?)',
+                             (project_id, language_id, page_id, _dumps(stats)))
+
+    def save_progress(self, project_id, report):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM progress WHERE project_id = ?', (project_id,))
+            self._db.executemany('INSERT INTO progress VALUES (?, ?, ?)',
+                                 [(project_id, l['id'], _dumps(l)) for l in report['languages']])
+
+    def synced_files(self, project_id):
+        """
+        :return: dict of key -> dict with path, page_id, sha256 and remote_update
+        """
+        rows = self._query('SELECT key, path, page_id, sha256, remote_update FROM synced_files WHERE project_id = ?',
+                           (project_id,))
+        return {row[0]: dict(zip(('path', 'page_id', 'sha256', 'remote_update'), row[1:])) for row in rows}
+
+    def save_synced_file(self, project_id, key, path, page_id=None, sha256=None, remote_update=None):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO synced_files VALUES (?, ?, ?, ?, ?, ?)',
+                             (project_id, key, path, page_id, sha256, remote_update))
+
+    def remove_synced_file(self, project_id, key):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM synced_files WHERE project_id = ? AND key = ?', (project_id, key))
+
+    def project(self, project_id):
+        rows = self._query('SELECT data FROM projects WHERE id = ? AND synced IS NOT NULL', (project_id,))
+        if not rows:
+            raise MirrorError('Project {} is not in the mirror `{}`. Run `qor sync-meta` first.'
+                              .format(project_id, self.path))
+        return json.loads(rows[0][0])
+
+    def synced(self, project_id):
+        """
+        :return: unix time of the last complete sync or None
+        """
+        rows = self._query('SELECT synced FROM projects WHERE id = ?', (project_id,))
+        return rows[0][0] if rows else None
+
+    def languages(self):
+        return [json.loads(data) for data, in self._query('SELECT data FROM languages ORDER BY id')]
+
+    def pages(self, project_id, language_id, status=None, search_string=None, limit=None, offset=0):
+        """
+        Pages of a language ordered by page id.
+        :param list status: PageStatus values, a page matches any of them
+        :param str search_string: part of the page url
+        :return: (list of pages, total number of matching pages)
+        """
+        where = ['project_id = ?', 'language_id = ?']
+        params = [project_id, language_id]
+        if status:
+            conditions = {PageStatus.enabled: 'enabled = 1', PageStatus.completed: 'completed = 1',
+                          PageStatus.disabled: 'enabled = 0', PageStatus.preparing: 'preparing = 1'}
+            where.append('({})'.format(' OR '.join(conditions[s] for s in status)))
+        if search_string:
+            where.append('instr(url, ?) > 0')
+            params.append(search_string)
+        where = ' AND '.join(where)
+
+        total = self._query('SELECT count(*) FROM pages WHERE {}'.format(where), params)[0][0]
+        sql = 'SELECT data FROM pages WHERE {} ORDER BY page_id LIMIT ? OFFSET ?'.format(where)
+        rows = self._query(sql, params + [-1 if limit is None else limit, offset])
+        return [json.loads(data) for data, in rows], total
+
+    def find_pages(self, project_id, url):
+        """
+        :return: pages of all languages with exactly this url
+        """
+        rows = self._query('SELECT data FROM pages WHERE project_id = ? AND url = ?', (project_id, url))
+        return [json.loads(data) for data, in rows]
+
+    def page_stats(self, project_id, language_id, page_id, default=_MISSING):
+        """
+        :param default: returned when the stats are not mirrored, MirrorError is raised without it
+        """
+        rows = self._query('SELECT data FROM page_stats WHERE project_id = ? AND language_id = ? AND page_id = ?',
+                           (project_id, language_id, page_id))
+        if not rows:
+            if default is not _MISSING:
+                return default
+            raise MirrorError('Stats of page {} are not in the mirror `{}`'.format(page_id, self.path))
+        return json.loads(rows[0][0])
+
+    def progress(self, project_id):
+        rows = self._query('SELECT data FROM progress WHERE project_id = ? ORDER BY rowid', (project_id,))
+        return {'languages': [json.loads(data) for data, in rows]}
+
+
+class MirrorAPI(object):
+    """
+    ProjectAPI which answers the mirrored reads from the local mirror.
+
+    With ``api`` every other call goes to the API, e.g. downloads and uploads. Without it the API is not
+    used at all and such calls raise MirrorError.
+    """
+
+    def __init__(self, mirror, config, api=None):
+        self._mirror = mirror
+        self._project_id = config['project_id']
+        self._api = api
+
+    def get_project(self):
+        return self._mirror.project(self._project_id)
+
+    def get_languages(self):
+        self._mirror.project(self._project_id)
+        return self._mirror.languages()
+
+    def page_search(self, language_id, status=None, limit=50, offset=0, search_string=None):
+        return ResponsePaginatedResult('pages', self._page_search, (language_id, ),
+                                       {'status': status, 'limit': limit, 'offset': offset,
+                                        'search_string': search_string})
+
+    def _page_search(self, language_id, status=None, limit=50, offset=0, search_string=None):
+        pages, total = self._mirror.pages(self._project_id, language_id, status=status, limit=limit,
+                                          offset=offset, search_string=search_string)
+        return {'pages': pages, 'meta': {'paging': {'total_results': total}}}
+
+    def get_page_stats(self, language_id, page_id):
+        return self._mirror.page_stats(self._project_id, language_id, page_id)
+
+    def get_report_progress(self, language_id=None):
+        self._mirror.project(self._project_id)
+        report = self._mirror.progress(self._project_id)
+        if language_id:
+            report['languages'] = [l for l in report['languages'] if l['id'] == language_id]
+        return report
+
+    def __getattr__(self, name):
+        if self._api is None:
+            raise MirrorError('`{}` needs the API and can not run with --offline'.format(name))
+        return getattr(self._api, name)
+
+
+class WarmMirrorAPI(object):
+    """
+    ProjectAPI which uses the local mirror as a warm start.
+
+    Listings and progress reports are always read from the API, since it can not list only the changed pages.
+    The new and changed pages of every listing are written to the mirror and their mirrored stats are dropped,
+    so the stats of a page which did not change since it was mirrored are read from the mirror and only the
+    others are requested. The pages which are gone are removed at the end of a complete, unfiltered listing.
+    Every other call goes to ``api``.
+    """
+
+    def __init__(self, mirror, config, api):
+        self._mirror = mirror
+        self._project_id = config['project_id']
+        self._api = api
+
+    def page_search(self, language_id, status=None, limit=50, offset=0, search_string=None):
+        # the ids of a complete listing, so the pages which are gone can be removed at its end
+        listed = set() if not status and not search_string and not offset else None
+
+        def search(language_id, status=None, limit=50, offset=0, search_string=None):
+            result = self._api.page_search(language_id, status=status, limit=limit, offset=offset,
+                                           search_string=search_string)
+            pages = result.request_next(keep=False)
+            self._mirror.refresh_pages(self._project_id, language_id, pages)
+            if listed is not None:
+                listed.update(page['page_id'] for page in pages)
+                if offset + limit >= len(result):
+                    self._mirror.remove_unlisted_pages(self._project_id, language_id, listed)
+            return {'pages': pages, 'meta': {'paging': {'total_results': len(result)}}}
+
+        return ResponsePaginatedResult('pages', search, (language_id, ),
+                                       {'status': status, 'limit': limit, 'offset': offset,
+                                        'search_string': search_string})
+
+    def get_page_stats(self, language_id, page_id):
+        stats = self._mirror.page_stats(self._project_id, language_id, page_id, default=None)
+        if stats is None:
+            stats = self._api.get_page_stats(language_id, page_id)
+            self._mirror.save_page_stats(self._project_id, language_id, page_id, stats)
+        return stats
+
+    def get_report_progress(self, language_id=None):
+        report = self._api.get_report_progress(language_id)
+        if not language_id:
+            self._mirror.save_progress(self._project_id, report)
+        return report
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+
+def use_mirror(api, config, warm=True):
+    """
+    :param ProjectAPI api:
+    :param bool warm: use the mirror as a warm start when ``config['warm_start']`` is set
+    :return: ``api``, a MirrorAPI which answers the mirrored reads from the local mirror when
+        ``config['offline']`` is set, or a WarmMirrorAPI. Other calls, e.g. downloads, still go to ``api``.
+    """
+    if config.get('offline'):
+        return MirrorAPI(Mirror(config.get('mirror') or DEFAULT_MIRROR_PATH), config, api=api)
+    if warm and config.get('warm_start'):
+        return WarmMirrorAPI(Mirror(config.get('mirror') or DEFAULT_MIRROR_PATH), config, api)
+    return api
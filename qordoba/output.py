@@ -0,0 +1,152 @@
+from __future__ import unicode_literals, print_function
+
+import csv
+import io
+import json
+import re
+import sys
+
+from terminaltables import AsciiTable
+
+TABLE = 'table'
+JSONL = 'jsonl'
+CSV = 'csv'
+
+FORMATS = (TABLE, JSONL, CSV)
+
+_FIELD_RE = re.compile(r'[^a-z0-9]+')
+
+PY3 = sys.version_info[0] == 3
+
+
+def field_name(header):
+    """
+    Key of a column in the machine formats, e.g. ``#SEGMENTS`` -> ``segments``, ``UPDATED_ON`` -> ``updated_on``
+    """
+    return _FIELD_RE.sub('_', header.lower()).strip('_')
+
+
+def _text(value):
+    return '' if value is None else '{}'.format(value)
+
+
+class TableOutput(object):
+    """
+    AsciiTable of all rows, printed when the output is closed.
+
+    With ``batch`` a table is printed every ``batch`` rows, each with the header, so a long listing is shown
+    while it is produced and only one batch is kept in memory.
+    """
+
+    def __init__(self, stream, batch=None):
+        self._stream = stream
+        self._batch = batch
+        self._header = None
+        self._rows = []
+        self._printed = False
+
+    def write_header(self, header):
+        self._header = list(header)
+
+    def write_row(self, row):
+        self._rows.append([_text(value) for value in row])
+        if self._batch and len(self._rows) >= self._batch:
+            self._print()
+
+    def close(self):
+        if self._rows or not self._printed:
+            self._print()
+
+    def _print(self):
+        rows = [self._header] if self._header is not None else []
+        rows.extend(self._rows)
+        if rows:
+            self._stream.write(AsciiTable(rows).table + '\n')
+            self._stream.flush()
+            self._printed = True
+        self._rows = []
+
+
+class JsonlOutput(object):
+    """
+    One JSON object per row, keyed by the field names of the header. Every line is flushed at once.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._fields = None
+
+    def write_header(self, header):
+        self._fields = [field_name(h) for h in header]
+
+    def write_row(self, row):
+        self._stream.write(json.dumps(dict(zip(self._fields, row)), sort_keys=True, default=_text) + '\n')
+        self._stream.flush()
+
+    def close(self):
+        self._stream.flush()
+
+
+class CsvOutput(object):
+    """
+    The csv module of python27 only writes bytes, so there every line is written as UTF-8 to a buffer and
+    decoded again for the text stream.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write_header(self, header):
+        self._write([field_name(h) for h in header])
+
+    def write_row(self, row):
+        self._write([_text(value) for value in row])
+        self._stream.flush()
+
+    def _write(self, cells):
+        if PY3:
+            buf = io.StringIO()
+            csv.writer(buf, lineterminator='\n').writerow(cells)
+            self._stream.write(buf.getvalue())
+        else:
+            buf = io.BytesIO()
+            csv.writer(buf, lineterminator=b'\n').writerow([cell.encode('utf-8') for cell in cells])
+            self._stream.write(buf.getvalue().decode('utf-8'))
+
+    def close(self):
+        self._stream.flush()
+
+
+_OUTPUTS = {
+    TABLE: TableOutput,
+    JSONL: JsonlOutput,
+    CSV: CsvOutput,
+}
+
+
+def create_output(fmt=TABLE, stream=None, batch=None):
+    """
+    :param str fmt: one of FORMATS
+    :param stream: text stream, stdout by default
+    :param int batch: rows per printed table, all rows in one table by default
+    """
+    if fmt == TABLE:
+        return TableOutput(stream or sys.stdout, batch=batch)
+    return _OUTPUTS[fmt](stream or sys.stdout)
+
+
+def write_rows(rows, fmt=TABLE, stream=None, batch=None):
+    """
+    :param rows: iterable of rows, the first one is the header
+    :return: number of rows without the header
+    """
+    output = create_output(fmt, stream, batch=batch)
+    count = 0
+    for index, row in enumerate(rows):
+        if index == 0:
+            output.write_header(row)
+        else:
+            output.write_row(row)
+            count += 1
+    output.close()
+    return count
@@ -0,0 +1,181 @@
+from __future__ import unicode_literals, print_function
+
+import cProfile
+import io
+import logging
+import os
+import sys
+import threading
+from collections import defaultdict, OrderedDict
+
+from qordoba.stages import StageListener, add_listener, remove_listener
+from qordoba.utils import format_bytes
+
+try:
+    import tracemalloc
+except ImportError:
+    # python27
+    tracemalloc = None
+
+log = logging.getLogger('qordoba')
+
+PROFILE_MODES = ('cpu', 'mem')
+
+
+class ProfilerError(Exception):
+    """
+    Profiling is not available
+    """
+
+
+class StackSampler(threading.Thread):
+    """
+    Sample the stacks of all running threads and count them in the collapsed-stack format
+    used by flame graph tools: ``thread;outer_function;...;inner_function count``.
+    """
+
+    def __init__(self, interval=0.005):
+        super(StackSampler, self).__init__(name='qordoba-stack-sampler')
+        self.daemon = True
+        self.interval = interval
+        self.stacks = defaultdict(int)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.current_thread().ident
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.stacks[_collapse(names.get(thread_id, thread_id), frame)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path):
+        with io.open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda i: -i[1]):
+                f.write('{} {}\n'.format(stack, count))
+
+
+def _collapse(thread_name, frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+        frame = frame.f_back
+    names.append(str(thread_name))
+    return ';'.join(reversed(names))
+
+
+class CPUProfiler(object):
+    """
+    Deterministic profile of the main thread saved as pstats, plus sampled stacks of every thread
+    saved in the collapsed-stack format.
+    """
+
+    def __init__(self, output_prefix, interval=0.005):
+        self.output_prefix = output_prefix
+        self._profile = cProfile.Profile()
+        self._sampler = StackSampler(interval=interval)
+
+    def start(self):
+        self._sampler.start()
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        self._sampler.stop()
+
+        pstats_path = '{}.pstats'.format(self.output_prefix)
+        collapsed_path = '{}.collapsed'.format(self.output_prefix)
+        self._profile.dump_stats(pstats_path)
+        self._sampler.write(collapsed_path)
+        return pstats_path, collapsed_path
+
+
+class MemoryProfiler(StageListener):
+    """
+    Track allocations with tracemalloc and attribute the allocated memory to the command stages.
+    """
+
+    def __init__(self, output_prefix, frames=1, top=25):
+        if tracemalloc is None:
+            raise ProfilerError('Memory profiling requires Python 3.4 or newer.')
+
+        self.output_prefix = output_prefix
+        self.frames = frames
+        self.top = top
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stages = OrderedDict()
+
+    def start(self):
+        tracemalloc.start(self.frames)
+        add_listener(self)
+
+    def stage_started(self, name):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(tracemalloc.get_traced_memory()[0])
+
+    def stage_finished(self, name, duration):
+        current = tracemalloc.get_traced_memory()[0]
+        started = self._local.stack.pop()
+        with self._lock:
+            stats = self.stages.setdefault(name, {'calls': 0, 'duration': 0.0, 'allocated': 0, 'max_current': 0})
+            stats['calls'] += 1
+            stats['duration'] += duration
+            stats['allocated'] += current - started
+            stats['max_current'] = max(stats['max_current'], current)
+
+    def stop(self):
+        remove_listener(self)
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+
+        lines = [
+            'Peak traced memory: {}'.format(format_bytes(peak)),
+            'Traced memory at exit: {}'.format(format_bytes(current)),
+            '',
+            'Stages:',
+        ]
+        for name, stats in self.stages.items():
+            lines.append('  {:<10} calls={:<6} time={:.3f}s net_allocated={} max_traced={}'.format(
+                name, stats['calls'], stats['duration'], format_bytes(stats['allocated']),
+                format_bytes(stats['max_current'])))
+
+        lines.extend(['', 'Top {} allocation sites:'.format(self.top)])
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            frame = stat.traceback[0]
+            lines.append('  {}:{} size={} count={}'.format(frame.filename, frame.lineno, format_bytes(stat.size),
+                                                             stat.count))
+
+        path = '{}.mem.txt'.format(self.output_prefix)
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+            f.write('\n')
+
+        log.info('Peak traced memory: {}'.format(format_bytes(peak)))
+        return path,
+
+
+def create_profiler(mode, output_prefix):
+    """
+    :param str mode: one of PROFILE_MODES
+    :param str output_prefix: path prefix of the files with results
+    """
+    if mode == 'cpu':
+        return CPUProfiler(output_prefix)
+    elif mode == 'mem':
+        return MemoryProfiler(output_prefix)
+    raise ProfilerError('Unknown profile mode `{}`. Use one of: {}'.format(mode, ', '.join(PROFILE_MODES)))
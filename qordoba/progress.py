@@ -0,0 +1,172 @@
+from __future__ import unicode_literals, print_function
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from qordoba.stages import StageListener, add_listener, remove_listener
+from qordoba.tracing import add_span_listener, remove_span_listener
+from qordoba.utils import format_bytes
+
+log = logging.getLogger('qordoba.progress')
+
+_PROGRESS = None
+
+
+class StageCounters(object):
+    __slots__ = ('active', 'done', 'duration')
+
+    def __init__(self):
+        self.active = 0
+        self.done = 0
+        self.duration = 0.0
+
+
+class Progress(StageListener):
+    """
+    Throughput of a command run: finished work units, transferred bytes and the work in every stage.
+
+    ``total`` may grow while the run goes on, e.g. when the next page of a search arrives.
+    """
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.started = time.time()
+        self.total = 0
+        self.done = 0
+        self.bytes = 0
+        self.requests = 0
+        self.stages = OrderedDict()
+        self.pool = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_total(self, count=1):
+        with self._lock:
+            self.total += count
+
+    def unit_finished(self):
+        with self._lock:
+            self.done += 1
+
+    def observe_span(self, span):
+        with self._lock:
+            self.requests += 1
+            self.bytes += span.bytes_in + span.bytes_out
+
+    def stage_started(self, name):
+        with self._lock:
+            self.stages.setdefault(name, StageCounters()).active += 1
+
+    def stage_finished(self, name, duration):
+        with self._lock:
+            counters = self.stages.setdefault(name, StageCounters())
+            counters.active -= 1
+            counters.done += 1
+            counters.duration += duration
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+    def eta(self):
+        """
+        :return: seconds left or None if it can not be estimated yet
+        """
+        if not self.done or self.total <= self.done:
+            return None
+        return (self.total - self.done) * self.elapsed / self.done
+
+    def render(self):
+        elapsed = max(self.elapsed, 1e-6)
+        with self._lock:
+            parts = ['{}/{} files'.format(self.done, self.total or '?'),
+                     '{:.1f} files/s'.format(self.done / elapsed),
+                     '{}/s'.format(format_bytes(self.bytes / elapsed))]
+            eta = self.eta()
+            if eta is not None:
+                parts.append('ETA {}'.format(format_duration(eta)))
+
+            stages = ', '.join('{} {}'.format(name, counters.active)
+                               for name, counters in self.stages.items() if counters.active)
+            if stages:
+                parts.append('active: {}'.format(stages))
+
+        pool = self.pool
+        if pool is not None:
+            parts.append('queued: {}'.format(pool.queued))
+            if pool.limiter is not None:
+                parts.append('limit: {}/{}'.format(pool.limiter.limit, pool.limiter.max_limit))
+
+        return ' | '.join(parts)
+
+    def summary(self):
+        """
+        :return: rows for AsciiTable with the aggregated numbers of the run
+        """
+        elapsed = max(self.elapsed, 1e-6)
+        rows = [['STAGE', 'CALLS', 'TIME'], ]
+        with self._lock:
+            for name, counters in self.stages.items():
+                rows.append([name, counters.done, format_duration(counters.duration)])
+            rows.append(['total', self.done, format_duration(elapsed)])
+
+        totals = [['FILES', 'FILES/S', 'REQUESTS', 'TRANSFERRED', 'BYTES/S'],
+                  [self.done, '{:.2f}'.format(self.done / elapsed), self.requests, format_bytes(self.bytes),
+                   format_bytes(self.bytes / elapsed)]]
+        return totals, rows
+
+    def _report(self):
+        while not self._stop_event.wait(self.interval):
+            log.info(self.render())
+
+    def start(self):
+        add_listener(self)
+        add_span_listener(self.observe_span)
+        if self.interval:
+            self._thread = threading.Thread(target=self._report, name='qordoba-progress')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        remove_listener(self)
+        remove_span_listener(self.observe_span)
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return '{}:{:02d}:{:02d}'.format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+def enable_progress(interval=5.0):
+    global _PROGRESS
+    disable_progress()
+    _PROGRESS = Progress(interval=interval)
+    _PROGRESS.start()
+    return _PROGRESS
+
+
+def disable_progress():
+    global _PROGRESS
+    if _PROGRESS is not None:
+        _PROGRESS.stop()
+    _PROGRESS = None
+
+
+def get_progress():
+    """
+    :return: Active progress or None when progress reporting is disabled.
+    :rtype: Progress
+    """
+    return _PROGRESS
+
+
+def add_total(count=1):
+    progress = _PROGRESS
+    if progress is not None:
+        progress.add_total(count)
@@ -4,9 +4,16 @@ import json
 import functools
 
 import logging
+import time
 import requests
 
-from qordoba.utils import build_url
+from qordoba.cassette import get_transport
+from qordoba.dryrun import get_dry_run, DryRunError
+from qordoba.hedging import get_hedging
+from qordoba.memo import TTLMemo, DEFAULT_TTL, memoized, invalidates, get_shared_catalog
+from qordoba.routes import RouteTable, get_timeouts, METADATA
+from qordoba.tracing import span_listeners, Span
+from qordoba.utils import build_url, json_loads
 
 try:
     from json import JSONDecodeError
@@ -21,6 +28,11 @@ API_URL = 'https://app.qordoba.com/api/'
 
 DEFAULT_MILESTONE_ID = -100
 
+MAX_RETRIES = 5
+RETRY_STATUSES = (429, 502, 503, 504)
+RETRY_BACKOFF = 0.5
+MAX_RETRY_DELAY = 60.0
+
 
 class QordobaResponseError(Exception):
     """
@@ -45,6 +57,26 @@ class FileAlreadyExistResponse(QordobaResponseError):
     pass
 
 
+class ApiResponse(object):
+    """
+    Wrapper around requests.Response which decodes the JSON body at most once.
+    All other attributes are taken from the wrapped response.
+    """
+    _NOT_DECODED = object()
+
+    def __init__(self, response):
+        self._response = response
+        self._data = self._NOT_DECODED
+
+    def json(self):
+        if self._data is self._NOT_DECODED:
+            self._data = json_loads(self._response.content)
+        return self._data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
 def exception_from_response(resp):
     error_cls = QordobaResponseError
 
@@ -69,6 +101,8 @@ class PageStatus:
     preparing = 'preparing'
     disabled = 'disabled'
 
+    all = enabled, completed, preparing, disabled
+
 
 class ResponsePaginatedResult(object):
     def __init__(self, source_name, func, args, kwargs):
@@ -79,23 +113,38 @@ class ResponsePaginatedResult(object):
         self._nativa_kwargs = kwargs
         self._limit = kwargs.get('limit', 50)
         self._offset = kwargs.get('offset', 0)
-        self._next_offset = 0
+        self._next_offset = self._offset
 
         self._total_result = None
         self._result = []
+        self._loaded = 0
 
-    def request_next(self):
+    def request_next(self, keep=True):
+        """
+        :param bool keep: keep the results for later iterations
+        """
         kwargs = {k: v for k, v in self._nativa_kwargs.items()}
         kwargs['offset'] = self._next_offset
         result = self._func(*self._nativa_args, **kwargs)
-        self._result.extend(result[self._source_name])
+        if keep:
+            self._result.extend(result[self._source_name])
+        self._loaded += len(result[self._source_name])
         self._total_result = result['meta']['paging']['total_results']
 
         self._next_offset += self._limit
         return result[self._source_name]
 
+    def prefetch(self):
+        """
+        Request the first page of results unless it is already loaded.
+        :rtype: ResponsePaginatedResult
+        """
+        if self._total_result is None:
+            self.request_next()
+        return self
+
     def has_next(self):
-        return self._total_result is None or len(self._result) < self._total_result
+        return self._total_result is None or self._loaded < self._total_result
 
     def __len__(self):
         return self._total_result
@@ -109,6 +158,17 @@ class ResponsePaginatedResult(object):
             for res in next_result:
                 yield res
 
+    def stream(self):
+        """
+        Iterate once over all results without keeping them, so a huge listing needs memory for one page only.
+        """
+        for res in self._result:
+            yield res
+
+        while self.has_next():
+            for res in self.request_next(keep=False):
+                yield res
+
     def filter_by(self, func):
         for res in iter(self):
             if func(res):
@@ -137,6 +197,8 @@ def paginated(source_name):
 
 
 def _debug_response(resp):
+    if not log.isEnabledFor(logging.DEBUG):
+        return
     try:
         log.debug('Request({}):\nmethod: {}\nheaders: {}\nbody: {}'.format(
             resp.request.url,
@@ -156,26 +218,99 @@ def _debug_response(resp):
         log.debug('Request debug was disabled because of unsupported terminal encoding')
 
 
+def _trace_response(span, resp, stream=False):
+    span.status = resp.status_code
+    span.wait = resp.elapsed.total_seconds()
+
+    body = resp.request.body
+    if isinstance(body, (bytes, str)):
+        span.bytes_out = len(body)
+
+    if stream:
+        # Reading the content would consume the stream
+        span.bytes_in = int(resp.headers.get('Content-Length') or 0)
+    else:
+        span.bytes_in = len(resp.content or b'')
+
+
+def retry_delay(resp, attempt):
+    """
+    :return: seconds to wait before the next attempt: the Retry-After of the response or an exponential backoff
+    """
+    try:
+        delay = float(resp.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        delay = RETRY_BACKOFF * 2 ** attempt
+    return min(max(delay, 0.0), MAX_RETRY_DELAY)
+
+
+def _rewind(files):
+    # the failed attempt has read the uploaded streams
+    for value in (files or {}).values():
+        stream = value[1] if isinstance(value, tuple) else value
+        if hasattr(stream, 'seek'):
+            stream.seek(0)
+
+
 class ProjectAPI(object):
     def __init__(self, config):
         self._config = config
-
-    def do_post(self, url, files=None, json=None, data=None, headers=None, **kwargs):
+        self._api_url = config.get('api_url') or API_URL
+        self._routes = RouteTable(self._api_url,
+                                  project_id=config.get('project_id'),
+                                  organization_id=config.get('organization_id'))
+        self._timeouts = get_timeouts(config)
+        # reads are memoized for the run; writes invalidate what they change
+        self._memo = TTLMemo(ttl=config.get('cache_ttl', DEFAULT_TTL))
+        self._catalog = get_shared_catalog(self._api_url, ttl=self._memo.ttl)
+        if self._catalog is None:
+            self._catalog = self._memo
+
+    def request(self, method, url, route=None, headers=None, **kwargs):
+        """
+        :param str route: Name of the route in qordoba.routes. Used to group requests by endpoint
+            and to select the timeout.
+        """
+        if get_dry_run() is not None and not (route and self._routes[route].route.read_only):
+            raise DryRunError('{} {} would change the project and is not sent in a dry run'.format(method, url))
         headers = self.build_headers(custom_headers=headers)
+        kwargs.setdefault('timeout', self._timeouts[self._routes[route].route.timeout_class if route else METADATA])
 
-        resp = requests.post(url, files=files, json=json, data=data, headers=headers, **kwargs)
-        _debug_response(resp)
-        try:
-            resp.raise_for_status()
-        except requests.HTTPError:
-            raise exception_from_response(resp)
-        else:
-            return resp
+        listeners = span_listeners()
+        span = None
+        if listeners:
+            span = Span(self._routes[route].route.template if route else url, method)
 
-    def do_put(self, url, files=None, json=None, data=None, headers=None, **kwargs):
-        headers = self.build_headers(custom_headers=headers)
+        try:
+            attempt = 0
+            while True:
+                resp, hedged = self._send(method, url, route, headers=headers, **kwargs)
+                if not self._should_retry(resp, route, attempt):
+                    break
+                delay = retry_delay(resp, attempt)
+                log.debug('{} {} returned {}, retry in {:.1f}s'.format(method, url, resp.status_code, delay))
+                if span is not None:
+                    span.retries += 1
+                    if resp.status_code == 429:
+                        span.throttled += delay
+                resp.close()
+                time.sleep(delay)
+                _rewind(kwargs.get('files'))
+                attempt += 1
+
+            if span is not None:
+                span.hedged = hedged
+                _trace_response(span, resp, stream=kwargs.get('stream', False))
+        except requests.RequestException as e:
+            if span is not None:
+                span.error = str(e)
+            raise
+        finally:
+            if span is not None:
+                span.finish()
+                for listener in listeners:
+                    listener(span)
 
-        resp = requests.put(url, files=files, json=json, data=data, headers=headers, **kwargs)
         _debug_response(resp)
         try:
             resp.raise_for_status()
@@ -184,29 +319,38 @@ class ProjectAPI(object):
         else:
             return resp
 
-    def do_get(self, url, headers=None, **kwargs):
-        headers = self.build_headers(custom_headers=headers)
+    def _should_retry(self, resp, route, attempt):
+        """
+        A throttled request (429) was not processed and is always retried. Server errors are retried only for
+        requests which can be safely sent twice.
+        """
+        if attempt >= MAX_RETRIES or resp.status_code not in RETRY_STATUSES:
+            return False
+        return resp.status_code == 429 or bool(route and self._routes[route].route.idempotent)
 
-        resp = requests.get(url, headers=headers, **kwargs)
-        _debug_response(resp)
-        try:
-            resp.raise_for_status()
-        except requests.HTTPError:
-            raise exception_from_response(resp)
+    def _send(self, method, url, route, **kwargs):
+        """
+        :return: (ApiResponse, whether a hedge request was sent)
+        """
+        transport = get_transport()
+        policy = get_hedging()
+        if policy is not None and route and self._routes[route].route.hedgeable:
+            resp, hedged = policy.send(route, transport, method, url, **kwargs)
         else:
-            return resp
+            resp, hedged = transport(method, url, **kwargs), False
+        return ApiResponse(resp), hedged
 
-    def do_delete(self, url, headers=None, json=None, **kwargs):
-        headers = self.build_headers(custom_headers=headers)
+    def do_post(self, url, files=None, json=None, data=None, headers=None, **kwargs):
+        return self.request('POST', url, files=files, json=json, data=data, headers=headers, **kwargs)
 
-        resp = requests.delete(url, json=json, headers=headers, **kwargs)
-        _debug_response(resp)
-        try:
-            resp.raise_for_status()
-        except requests.HTTPError:
-            raise exception_from_response(resp)
-        else:
-            return resp
+    def do_put(self, url, files=None, json=None, data=None, headers=None, **kwargs):
+        return self.request('PUT', url, files=files, json=json, data=data, headers=headers, **kwargs)
+
+    def do_get(self, url, headers=None, **kwargs):
+        return self.request('GET', url, headers=headers, **kwargs)
+
+    def do_delete(self, url, headers=None, json=None, **kwargs):
+        return self.request('DELETE', url, json=json, headers=headers, **kwargs)
 
     def build_headers(self, custom_headers=None):
         default_headers = {
@@ -219,25 +363,19 @@ class ProjectAPI(object):
         return default_headers
 
     def build_url(self, *args, **kwargs):
-        return build_url(API_URL, *args, **kwargs)
+        return build_url(self._api_url, *args, **kwargs)
 
+    @memoized('languages', memo='_catalog')
     def get_languages(self):
-        params = (
-            'languages',
-        )
-        language_url = self.build_url(*params)
+        language_url = self._routes.url('languages')
 
-        resp = self.do_get(language_url)
+        resp = self.do_get(language_url, route='languages')
 
         return resp.json()['languages']
 
+    @memoized('project')
     def get_project(self):
-        params = (
-            'projects',
-            str(self._config['project_id'])
-        )
-
-        resp = self.do_get(self.build_url(*params))
+        resp = self.do_get(self._routes.url('project'), route='project')
 
         return resp.json()['project']
 
@@ -338,44 +476,35 @@ class ProjectAPI(object):
             }
         :return:
         """
-        params = (
-            'organizations',
-            str(self._config['organization_id']),
-            'projects',
-        )
         query = {
             'limit': limit,
             'offset': offset
         }
 
-        project_list_url = self.build_url(*params, **query)
+        project_list_url = self._routes.url('projects', query=query)
 
-        resp = self.do_get(project_list_url)
+        resp = self.do_get(project_list_url, route='projects')
         # @todo add pagination
         return resp.json()
 
+    @invalidates('pages')
     def upload_file(self, stream, file_name, mimetype='', force=False):
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'files'
-
-        )
-
         query = {}
         if force:
             query['update'] = 'true'
         # @todo bug in endpoint. Can't upload file without `update` query param
 
-        upload_url = self.build_url(*params, **query)
+        upload_url = self._routes.url('upload_file', query=query)
 
         values = {
             'file_names': json.dumps([{"upload_id": "", "file_name": str(file_name)}])
         }
 
-        resp = self.do_post(upload_url, files={'file': (str(file_name), stream, mimetype)}, data=values)
+        resp = self.do_post(upload_url, files={'file': (str(file_name), stream, mimetype)}, data=values,
+                            route='upload_file')
         return resp.json()
 
+    @invalidates('pages')
     def upload_anytype_file(self, stream, file_name, content_type_code,
                             mimetype='application/octet-stream', force=False, **kwargs):
         """
@@ -400,27 +529,23 @@ class ProjectAPI(object):
         :param mimetype: Request mimetype. By default application/octet-stream
         :return: Upload result. Contains upload_id required to append file to the project
         """
-        params = (
-            'organizations',
-            str(self._config['organization_id']),
-            'upload',
-            'uploadFile_anyType'
-        )
         query = {
             'projectId': self._config['project_id'],
             'content_type_code': content_type_code
         }
 
-        upload_url = self.build_url(*params, **query)
+        upload_url = self._routes.url('upload_anytype_file', query=query)
 
         values = {
             'file_names': json.dumps([])
         }
 
-        resp = self.do_post(upload_url, files={'file': (str(file_name), stream, mimetype)}, data=values)
-        log.debug('Response body: {}'.format(resp.json()))
+        resp = self.do_post(upload_url, files={'file': (str(file_name), stream, mimetype)}, data=values,
+                            route='upload_anytype_file')
+        log.debug('Response body: %s', resp.json())
         return resp.json()
 
+    @invalidates('pages', 'page:{file_id}')
     def update_upload_anyType_file(self, stream, file_name, file_id, mimetype='application/octet-stream'):
         """
 
@@ -430,21 +555,14 @@ class ProjectAPI(object):
         :param mimetype: Request mimetype. By default application/octet-stream
         :return: Upload result. Contains upload_id required to append file to the project
         """
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'files',
-            str(file_id),
-            'update',
-            'upload'
-        )
-
-        upload_url = self.build_url(*params)
+        upload_url = self._routes.url('update_upload_file', file_id=file_id)
 
-        resp = self.do_post(upload_url, files={'file': (str(file_name), stream, mimetype)})
-        log.debug('Response body: {}'.format(resp.json()))
+        resp = self.do_post(upload_url, files={'file': (str(file_name), stream, mimetype)},
+                            route='update_upload_file')
+        log.debug('Response body: %s', resp.json())
         return resp.json()
 
+    @invalidates('pages', 'page:{file_id}', 'progress')
     def apply_upload_file(self, upload_id, file_id):
         """
 
@@ -453,25 +571,17 @@ class ProjectAPI(object):
         :return:
         """
 
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'files',
-            str(file_id),
-            'update',
-            'apply'
-        )
-
         payload = {
             'new_file_id': upload_id
         }
 
-        upload_url = self.build_url(*params)
+        upload_url = self._routes.url('apply_upload_file', file_id=file_id)
 
-        resp = self.do_put(upload_url, json=payload)
-        log.debug('Response body: {}'.format(resp.json()))
+        resp = self.do_put(upload_url, json=payload, route='apply_upload_file')
+        log.debug('Response body: %s', resp.json())
         return resp.json()
 
+    @invalidates('pages', 'progress')
     def append_file(self, upload_id, file_name, source_columns=None, reference_columns=None, version_tag=None):
         """
         Attach uploaded file to qordoba project.
@@ -484,12 +594,6 @@ class ProjectAPI(object):
         :param bool force:
         :return:
         """
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'append_files'
-        )
-
         query = {}
 
         payload = {
@@ -502,50 +606,32 @@ class ProjectAPI(object):
         if version_tag is not None:
             payload['version_tag'] = version_tag
 
-        upload_url = self.build_url(*params, **query)
+        upload_url = self._routes.url('append_files', query=query)
 
-        resp = self.do_post(upload_url, json=[payload, ])
-        log.debug('Response body: {}'.format(resp.json()))
+        resp = self.do_post(upload_url, json=[payload, ], route='append_files')
+        log.debug('Response body: %s', resp.json())
         return resp.json()
 
     def download_file(self, page_id, language_id, milestone=None):
         if milestone is None:
             milestone = DEFAULT_MILESTONE_ID
 
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'languages',
-            str(language_id),
-            'pages',
-            str(page_id),
-            'segments',
-            'milestones',
-            str(milestone),
-            'export'
-        )
-
-        download_url = self.build_url(*params)
-
-        resp = self.do_get(download_url)
+        download_url = self._routes.url('export', language_id=language_id, page_id=page_id, milestone=milestone)
+
+        resp = self.do_get(download_url, route='export')
         data = resp.json()
 
         return self._download_raw_file(data['token'], data['filename'])
 
     def _download_raw_file(self, token, filename):
-        params = (
-            'file',
-            'download'
-        )
-
         query = {
             'token': token,
             'filename': filename
         }
 
-        download_url = self.build_url(*params, **query)
+        download_url = self._routes.url('file_download', query=query)
 
-        return self.do_get(download_url, stream=True)
+        return self.do_get(download_url, stream=True, route='file_download')
 
     def download_files(self, page_ids, languages):
         """
@@ -554,12 +640,7 @@ class ProjectAPI(object):
         :param list languages:
         :return:
         """
-        params = (
-            'projects',
-            self._config['project_id'],
-            'export_files_bulk'
-        )
-        download_url = self.build_url(*params)
+        download_url = self._routes.url('export_files_bulk')
         payload = {
             'bilingual': False,
             'language_ids': languages,
@@ -567,10 +648,11 @@ class ProjectAPI(object):
 
         }
 
-        resp = self.do_post(download_url, json=payload)
+        resp = self.do_post(download_url, json=payload, route='export_files_bulk')
         return resp.json()
 
     @paginated('files')
+    @memoized('pages')
     def get_pages(self, language_id, limit=50, offset=0):
         """
         Example response:
@@ -602,23 +684,17 @@ class ProjectAPI(object):
         :return:
         :rtype:
         """
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'languages',
-            str(language_id),
-            'files'
-        )
         query = {
             'limit': limit,
             'offset': offset
         }
 
-        pages_url = self.build_url(*params, **query)
+        pages_url = self._routes.url('pages', query=query, language_id=language_id)
 
-        resp = self.do_get(pages_url)
+        resp = self.do_get(pages_url, route='pages')
         return resp.json()
 
+    @memoized('page:{page_id}')
     def get_page_stats(self, language_id, page_id):
         """
         Example response:
@@ -631,21 +707,12 @@ class ProjectAPI(object):
         :param page_id:
         :return:
         """
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'languages',
-            str(language_id),
-            'files',
-            str(page_id),
-            'stats'
-        )
-
-        stats_url = self.build_url(*params)
+        stats_url = self._routes.url('page_stats', language_id=language_id, page_id=page_id)
 
-        resp = self.do_get(stats_url)
+        resp = self.do_get(stats_url, route='page_stats')
         return resp.json()
 
+    @memoized('page:{page_id}')
     def get_page_details(self, language_id, page_id):
         """
         Example response:
@@ -703,20 +770,12 @@ class ProjectAPI(object):
                     }
                 }
         """
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'languages',
-            str(language_id),
-            'pages',
-            str(page_id)
-        )
-
-        page_url = self.build_url(*params)
+        page_url = self._routes.url('page_details', language_id=language_id, page_id=page_id)
 
-        resp = self.do_get(page_url)
+        resp = self.do_get(page_url, route='page_details')
         return resp.json()['page']
 
+    @memoized('progress')
     def get_report_progress(self, language_id=None):
         """
         Example response:
@@ -831,13 +890,6 @@ class ProjectAPI(object):
             }
         :rtype: list
         """
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'reports',
-            'progress'
-        )
-
         # Available query params:
         # - limit (doesn't work)
         # - offset (doesn't work)
@@ -847,12 +899,13 @@ class ProjectAPI(object):
         if language_id:
             query['language_id'] = language_id
 
-        progress_url = self.build_url(*params, **query)
+        progress_url = self._routes.url('report_progress', query=query)
 
-        resp = self.do_get(progress_url)
+        resp = self.do_get(progress_url, route='report_progress')
         return resp.json()
 
     @paginated('pages')
+    @memoized('pages')
     def page_search(self, language_id, status=None, limit=50, offset=0, search_string=None):
         """
         Example response:
@@ -923,40 +976,24 @@ class ProjectAPI(object):
         :return:
         :rtype: ResponsePaginatedResult
         """
-        params = (
-            'projects',
-            str(self._config['project_id']),
-            'languages',
-            str(language_id),
-            'page_settings',
-            'search'
-        )
         query = {'limit': limit,
                  'offset': offset}
 
-        page_url = self.build_url(*params, **query)
+        page_url = self._routes.url('page_search', query=query, language_id=language_id)
         body = {}
         if status:
             body['status'] = status
         if search_string:
             body['title'] = search_string
 
-        resp = self.do_post(page_url, json=body)
-        log.debug('ResponseContent: {}'.format(resp.content))
+        resp = self.do_post(page_url, json=body, route='page_search')
+        log.debug('ResponseContent: %s', resp.json())
         return resp.json()
 
+    @invalidates('pages', 'page:{page_id}', 'progress')
     def delete_page(self, page_id):
-        params = (
-            'organizations',
-            str(self._config['organization_id']),
-            'projects',
-            str(self._config['project_id']),
-            'pages',
-            str(page_id)
-        )
-
-        delete_url = self.build_url(*params)
-
-        resp = self.do_delete(delete_url)
+        delete_url = self._routes.url('delete_page', page_id=page_id)
+
+        resp = self.do_delete(delete_url, route='delete_page')
 
         return resp.json()
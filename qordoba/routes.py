@@ -0,0 +1,162 @@
+from __future__ import unicode_literals, print_function
+
+import re
+from argparse import ArgumentTypeError
+
+from qordoba.utils import urlquote, urlencode
+
+_FIELD_RE = re.compile(r'\{(\w+)\}')
+
+METADATA = 'metadata'
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+
+TIMEOUT_CLASSES = (METADATA, UPLOAD, DOWNLOAD)
+
+# Seconds. ``connect`` is shared by all endpoint classes, the others are read timeouts.
+DEFAULT_TIMEOUTS = {
+    'connect': 10.0,
+    METADATA: 60.0,
+    UPLOAD: 300.0,
+    DOWNLOAD: 300.0,
+}
+
+
+class Route(object):
+    """
+    API endpoint description.
+
+    ``template`` is a path relative to the API base url with ``{field}`` placeholders for the path segments.
+    ``timeout_class`` selects the read timeout, see TIMEOUT_CLASSES.
+    ``read_only`` is True for GET requests and for the POST searches which change nothing.
+    """
+
+    def __init__(self, name, method, template, timeout_class=METADATA, read_only=None):
+        self.name = name
+        self.method = method
+        self.template = template
+        self.timeout_class = timeout_class
+        self.read_only = method == 'GET' if read_only is None else read_only
+        self.fields = tuple(_FIELD_RE.findall(template))
+
+    @property
+    def idempotent(self):
+        return self.method in ('GET', 'PUT', 'DELETE')
+
+    @property
+    def hedgeable(self):
+        """
+        A duplicate request is safe and cheap: the request changes nothing and the response is small.
+        """
+        return self.read_only and self.timeout_class == METADATA
+
+    def compile(self, base_url, static=None):
+        """
+        Pre-quote static fields and return the route ready to build urls.
+        :param str base_url: API base url
+        :param dict static: Field values which are the same for every request. ``None`` values are ignored.
+        :rtype: CompiledRoute
+        """
+        static = static or {}
+
+        def replace(match):
+            value = static.get(match.group(1))
+            if value is None:
+                return match.group(0)
+            return _quote_segment(value).replace('{', '{{').replace('}', '}}')
+
+        path = _FIELD_RE.sub(replace, self.template)
+        url_template = base_url.rstrip('/').replace('{', '{{').replace('}', '}}') + '/' + path
+        return CompiledRoute(self, url_template)
+
+    def __repr__(self):
+        return '<Route({} {})>'.format(self.method, self.template)
+
+
+class CompiledRoute(object):
+    def __init__(self, route, url_template):
+        self.route = route
+        self._url_template = url_template
+
+    def url(self, query=None, **fields):
+        url = self._url_template.format(**{k: _quote_segment(v) for k, v in fields.items()})
+        if query:
+            # sorted, so the url of a request is the same in every process, whatever the order of the dict
+            url = '{}?{}'.format(url, urlencode(sorted(query.items())))
+        return url
+
+
+def _quote_segment(value):
+    return urlquote(str(value).strip('/'))
+
+
+ROUTES = (
+    Route('languages', 'GET', 'languages'),
+    Route('project', 'GET', 'projects/{project_id}'),
+    Route('projects', 'GET', 'organizations/{organization_id}/projects'),
+    Route('upload_file', 'POST', 'projects/{project_id}/files', timeout_class=UPLOAD),
+    Route('upload_anytype_file', 'POST', 'organizations/{organization_id}/upload/uploadFile_anyType',
+          timeout_class=UPLOAD),
+    Route('update_upload_file', 'POST', 'projects/{project_id}/files/{file_id}/update/upload', timeout_class=UPLOAD),
+    Route('apply_upload_file', 'PUT', 'projects/{project_id}/files/{file_id}/update/apply'),
+    Route('append_files', 'POST', 'projects/{project_id}/append_files'),
+    Route('export', 'GET',
+          'projects/{project_id}/languages/{language_id}/pages/{page_id}/segments/milestones/{milestone}/export'),
+    Route('file_download', 'GET', 'file/download', timeout_class=DOWNLOAD),
+    Route('export_files_bulk', 'POST', 'projects/{project_id}/export_files_bulk', timeout_class=DOWNLOAD),
+    Route('pages', 'GET', 'projects/{project_id}/languages/{language_id}/files'),
+    Route('page_stats', 'GET', 'projects/{project_id}/languages/{language_id}/files/{page_id}/stats'),
+    Route('page_details', 'GET', 'projects/{project_id}/languages/{language_id}/pages/{page_id}'),
+    Route('report_progress', 'GET', 'projects/{project_id}/reports/progress'),
+    Route('page_search', 'POST', 'projects/{project_id}/languages/{language_id}/page_settings/search',
+          read_only=True),
+    Route('delete_page', 'DELETE', 'organizations/{organization_id}/projects/{project_id}/pages/{page_id}'),
+)
+
+
+def get_timeouts(config):
+    """
+    Timeouts from the ``timeouts`` section of the settings merged with DEFAULT_TIMEOUTS.
+    :return: dict of endpoint class -> (connect, read) for ``requests``
+    """
+    values = dict(DEFAULT_TIMEOUTS)
+    for key, value in (config.get('timeouts') or {}).items():
+        if key not in values:
+            raise ValueError('Unknown timeout `{}`. Use one of: connect, {}'.format(key, ', '.join(TIMEOUT_CLASSES)))
+        values[key] = float(value)
+    return {name: (values['connect'], values[name]) for name in TIMEOUT_CLASSES}
+
+
+class TimeoutType(object):
+    """
+    Argparse type for ``CLASS=SECONDS`` values, e.g. ``download=600``.
+    """
+
+    def __call__(self, string):
+        key, _, value = string.partition('=')
+        if key not in DEFAULT_TIMEOUTS:
+            raise ArgumentTypeError('Unknown timeout `{}`. Use one of: connect, {}'
+                                    .format(key, ', '.join(TIMEOUT_CLASSES)))
+        try:
+            return key, float(value)
+        except ValueError:
+            raise ArgumentTypeError("Timeout should be defined as CLASS=SECONDS, got '{}'".format(string))
+
+    def __repr__(self):
+        return type(self).__name__
+
+
+class RouteTable(object):
+    """
+    Routes of all ProjectAPI endpoints compiled for one API base url and one project.
+    """
+
+    def __init__(self, base_url, routes=ROUTES, **static):
+        self.base_url = base_url
+        self._routes = {route.name: route.compile(base_url, static) for route in routes}
+
+    def __getitem__(self, name):
+        return self._routes[name]
+
+    def url(self, name, query=None, **fields):
+        return self._routes[name].url(query=query, **fields)
@@ -0,0 +1,66 @@
+from __future__ import unicode_literals, print_function
+
+import contextlib
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# connections kept open to the API host
+DEFAULT_POOL_SIZE = 10
+
+_SESSION = None
+
+
+def enable_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Send the API requests of the process through one ``requests.Session``, so connections and TLS sessions are
+    reused by every request, thread and project of the run.
+
+    :param int pool_size: connections kept open per host, at least the number of threads sending requests
+    """
+    global _SESSION
+    disable_session()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    _SESSION = session
+    return session
+
+
+def disable_session():
+    global _SESSION
+    if _SESSION is not None:
+        _SESSION.close()
+    _SESSION = None
+
+
+def get_session():
+    """
+    :return: Shared requests.Session or None
+    """
+    return _SESSION
+
+
+@contextlib.contextmanager
+def shared_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Enable the shared session for the block, unless an outer block already did.
+    """
+    if _SESSION is not None:
+        yield _SESSION
+        return
+    session = enable_session(pool_size=pool_size)
+    try:
+        yield session
+    finally:
+        disable_session()
+
+
+def send(method, url, **kwargs):
+    """
+    ``requests.request`` over the shared session when it is enabled.
+    """
+    if _SESSION is not None:
+        return _SESSION.request(method, url, **kwargs)
+    return requests.request(method, url, **kwargs)
@@ -0,0 +1,110 @@
+from __future__ import unicode_literals, print_function
+
+import hashlib
+import logging
+from argparse import ArgumentTypeError
+
+log = logging.getLogger('qordoba')
+
+
+def stable_hash(key):
+    """
+    Hash which is the same on every machine and python version, unlike the builtin ``hash``.
+    """
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class Shard(object):
+    """
+    Shard ``index`` of ``count``. Indexes start from 1, e.g. ``1/4`` ... ``4/4``.
+    """
+
+    def __init__(self, index, count):
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError('Shard index should be between 1 and {}'.format(count))
+        self.index = index
+        self.count = count
+
+    def index_of(self, key):
+        return stable_hash(key) % self.count + 1
+
+    def owns(self, key):
+        return self.index_of(key) == self.index
+
+    def __str__(self):
+        return '{}/{}'.format(self.index, self.count)
+
+
+class ShardBalance(object):
+    """
+    Count the work units of every shard while the owned ones are selected.
+    """
+
+    def __init__(self, shard):
+        self.shard = shard
+        self.counts = [0] * shard.count
+
+    def owns(self, key):
+        index = self.shard.index_of(key)
+        self.counts[index - 1] += 1
+        return index == self.shard.index
+
+    def filter(self, units, key):
+        """
+        :param units: iterable of work units
+        :param key: callable(unit) -> str
+        :return: generator of units which belong to the shard
+        """
+        for unit in units:
+            if self.owns(key(unit)):
+                yield unit
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def imbalance(self):
+        """
+        :return: how much the biggest shard is above the mean, in percent
+        """
+        if not self.total:
+            return 0.0
+        mean = float(self.total) / self.shard.count
+        return (max(self.counts) - mean) / mean * 100
+
+    def report(self):
+        return 'Shard {}: {} of {} work units. Units per shard: {}. Imbalance: {:.1f}%'.format(
+            self.shard, self.counts[self.shard.index - 1], self.total,
+            ', '.join(str(c) for c in self.counts), self.imbalance())
+
+
+def filter_shard(units, shard, key):
+    """
+    Select the units of ``shard`` and log the balance report once the units are exhausted.
+    Without a shard all units are returned.
+    """
+    if shard is None:
+        for unit in units:
+            yield unit
+        return
+
+    balance = ShardBalance(shard)
+    for unit in balance.filter(units, key):
+        yield unit
+    log.info(balance.report())
+
+
+class ShardType(object):
+    """
+    Argparse type for ``I/N`` values.
+    """
+
+    def __call__(self, string):
+        try:
+            index, count = (int(v) for v in string.split('/'))
+            return Shard(index, count)
+        except ValueError:
+            raise ArgumentTypeError("Shard should be defined as I/N where 1 <= I <= N, got '{}'".format(string))
+
+    def __repr__(self):
+        return type(self).__name__
@@ -0,0 +1,76 @@
+from __future__ import unicode_literals, print_function
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Stage:
+    scan = 'scan'
+    search = 'search'
+    upload = 'upload'
+    download = 'download'
+    write = 'write'
+
+    all = scan, search, upload, download, write
+
+
+class StageListener(object):
+    """
+    Base class for objects which want to know when commands enter and leave a stage.
+    Listeners are called from the thread which runs the stage.
+    """
+
+    def stage_started(self, name):
+        pass
+
+    def stage_finished(self, name, duration):
+        pass
+
+
+_LISTENERS = []
+_LOCK = threading.Lock()
+
+
+def add_listener(listener):
+    with _LOCK:
+        _LISTENERS.append(listener)
+
+
+def remove_listener(listener):
+    with _LOCK:
+        if listener in _LISTENERS:
+            _LISTENERS.remove(listener)
+
+
+@contextmanager
+def stage(name):
+    """
+    Mark a block of command code as part of the stage ``name``.
+    """
+    listeners = tuple(_LISTENERS)
+    for listener in listeners:
+        listener.stage_started(name)
+
+    start = time.time()
+    try:
+        yield
+    finally:
+        duration = time.time() - start
+        for listener in listeners:
+            listener.stage_finished(name, duration)
+
+
+def iterate(name, iterable):
+    """
+    Iterate over ``iterable`` and attribute the time spent producing each item to the stage ``name``.
+    Useful for lazy paginated results.
+    """
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
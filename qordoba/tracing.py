@@ -0,0 +1,225 @@
+from __future__ import unicode_literals, print_function
+
+import io
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+log = logging.getLogger('qordoba')
+
+TRACE_FORMATS = ('jsonl', 'chrome')
+
+_TRACER = None
+_SPAN_LISTENERS = []
+_LOCK = threading.Lock()
+
+
+class Span(object):
+    """
+    One API request.
+
+    ``name`` is the endpoint template of the route, so all calls to the same endpoint are grouped together.
+    Times are in seconds.
+    """
+
+    __slots__ = ('name', 'method', 'command', 'thread', 'start', 'duration', 'wait', 'status', 'bytes_in',
+                 'bytes_out', 'retries', 'throttled', 'hedged', 'error')
+
+    def __init__(self, name, method, command=None):
+        self.name = name
+        self.method = method
+        self.command = command
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.duration = None
+        self.wait = None
+        self.status = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.throttled = 0.0
+        self.hedged = False
+        self.error = None
+
+    def finish(self):
+        self.duration = time.time() - self.start
+
+    def to_dict(self):
+        return OrderedDict((k, getattr(self, k)) for k in self.__slots__)
+
+
+class Tracer(object):
+    def __init__(self, command=None):
+        self.command = command
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def start_span(self, name, method):
+        return Span(name, method, command=self.command)
+
+    def finish_span(self, span):
+        span.finish()
+        self.add_span(span)
+
+    def add_span(self, span):
+        if span.command is None:
+            span.command = self.command
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """
+        Latency percentiles and traffic per endpoint.
+        :return: list of dicts ordered by the total time spent in the endpoint
+        """
+        by_endpoint = defaultdict(list)
+        for span in list(self.spans):
+            by_endpoint[(span.method, span.name)].append(span)
+
+        rows = []
+        for (method, name), spans in by_endpoint.items():
+            durations = sorted(s.duration for s in spans)
+            rows.append(OrderedDict((
+                ('endpoint', '{} {}'.format(method, name)),
+                ('calls', len(spans)),
+                ('errors', sum(1 for s in spans if s.error or (s.status or 0) >= 400)),
+                ('retries', sum(s.retries for s in spans)),
+                ('p50', percentile(durations, 50)),
+                ('p95', percentile(durations, 95)),
+                ('p99', percentile(durations, 99)),
+                ('total', sum(durations)),
+                ('bytes_in', sum(s.bytes_in for s in spans)),
+                ('bytes_out', sum(s.bytes_out for s in spans)),
+            )))
+
+        return sorted(rows, key=lambda r: r['total'], reverse=True)
+
+    def calls_per_command(self):
+        counts = defaultdict(int)
+        for span in list(self.spans):
+            counts[(span.command, '{} {}'.format(span.method, span.name))] += 1
+        return counts
+
+    def export(self, path, fmt=None):
+        fmt = fmt or guess_trace_format(path)
+        spans = list(self.spans)
+        with io.open(path, 'w', encoding='utf-8') as f:
+            if fmt == 'chrome':
+                f.write(_to_text(json.dumps({'traceEvents': [_chrome_event(s) for s in spans]})))
+            else:
+                for span in spans:
+                    f.write(_to_text(json.dumps(span.to_dict())))
+                    f.write('\n')
+
+        log.debug('Trace with {} spans saved to `{}`'.format(len(spans), path))
+
+
+def _to_text(value):
+    return value if not isinstance(value, bytes) else value.decode('utf-8')
+
+
+def _chrome_event(span):
+    args = span.to_dict()
+    for k in ('name', 'thread', 'start', 'duration'):
+        args.pop(k)
+    return {
+        'name': '{} {}'.format(span.method, span.name),
+        'cat': 'http',
+        'ph': 'X',
+        'ts': int(span.start * 1e6),
+        'dur': int((span.duration or 0) * 1e6),
+        'pid': os.getpid(),
+        'tid': span.thread,
+        'args': args,
+    }
+
+
+def guess_trace_format(path):
+    return 'chrome' if path.endswith('.json') else 'jsonl'
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+def add_span_listener(listener):
+    """
+    :param listener: callable(span) called with every finished API request span.
+    """
+    with _LOCK:
+        _SPAN_LISTENERS.append(listener)
+
+
+def remove_span_listener(listener):
+    with _LOCK:
+        if listener in _SPAN_LISTENERS:
+            _SPAN_LISTENERS.remove(listener)
+
+
+def span_listeners():
+    return tuple(_SPAN_LISTENERS)
+
+
+def enable_tracing(command=None):
+    global _TRACER
+    disable_tracing()
+    _TRACER = Tracer(command=command)
+    add_span_listener(_TRACER.add_span)
+    return _TRACER
+
+
+def disable_tracing():
+    global _TRACER
+    if _TRACER is not None:
+        remove_span_listener(_TRACER.add_span)
+    _TRACER = None
+
+
+def get_tracer():
+    """
+    :return: Active tracer or None when tracing is disabled.
+    :rtype: Tracer
+    """
+    return _TRACER
+
+
+def format_summary(tracer):
+    """
+    :return: rows for AsciiTable with the latency summary per endpoint followed by the calls per command.
+    """
+    rows = [['ENDPOINT', 'CALLS', 'ERRORS', 'RETRIES', 'P50', 'P95', 'P99', 'TOTAL', 'BYTES IN', 'BYTES OUT'], ]
+    for row in tracer.summary():
+        rows.append([
+            row['endpoint'],
+            row['calls'],
+            row['errors'],
+            row['retries'],
+            _format_seconds(row['p50']),
+            _format_seconds(row['p95']),
+            _format_seconds(row['p99']),
+            _format_seconds(row['total']),
+            row['bytes_in'],
+            row['bytes_out'],
+        ])
+
+    command_rows = [['COMMAND', 'ENDPOINT', 'CALLS'], ]
+    for (command, endpoint), count in sorted(tracer.calls_per_command().items(), key=lambda i: -i[1]):
+        command_rows.append([command or '', endpoint, count])
+
+    return rows, command_rows
+
+
+def _format_seconds(value):
+    if value is None:
+        return ''
+    return '{:.0f}ms'.format(value * 1e3)
@@ -1,5 +1,7 @@
 from __future__ import unicode_literals, print_function
 
+import importlib
+import json
 import os
 import sys
 
@@ -11,9 +13,42 @@ import furl as furl
 PY3 = sys.version_info[0] == 3
 
 if PY3:
-    from urllib.parse import quote as urlquote
+    from urllib.parse import quote as urlquote, urlencode
 else:
-    from urllib import quote as urlquote
+    from urllib import quote as urlquote, urlencode
+
+
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def _stdlib_json_loads(content):
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return json.loads(content)
+
+
+def get_json_loads(backend=None):
+    """
+    Return the name and the ``loads`` function of a JSON backend.
+
+    Without ``backend`` the first installed one from JSON_BACKENDS is used, so an optional faster decoder
+    is picked up automatically. All backends accept bytes and raise ValueError on invalid input.
+    """
+    for name in ((backend, ) if backend else JSON_BACKENDS):
+        if name == 'json':
+            return name, _stdlib_json_loads
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            if backend:
+                raise
+            continue
+        return name, module.loads
+
+    raise ValueError('Unknown JSON backend `{}`'.format(backend))
+
+
+JSON_BACKEND, json_loads = get_json_loads(os.environ.get('QORDOBA_JSON_BACKEND'))
 
 
 def python_2_unicode_compatible(klass):
@@ -62,6 +97,13 @@ def build_url(base, *segments, **query):
     return url.url
 
 
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024 or unit == 'GiB':
+            return '{:.0f}{}'.format(size, unit) if unit == 'B' else '{:.1f}{}'.format(size, unit)
+        size /= 1024.0
+
+
 class FilePathType(object):
     """Factory for creating file path types
 
@@ -89,3 +131,26 @@ class CommaSeparatedSet(object):
 
         return values
 
+
+class PositiveIntType(object):
+    def __call__(self, string):
+        try:
+            value = int(string)
+        except ValueError:
+            value = 0
+        if value < 1:
+            raise ArgumentTypeError("Expected a positive number, got '{}'".format(string))
+
+        return value
+
+
+class PositiveFloatType(object):
+    def __call__(self, string):
+        try:
+            value = float(string)
+        except ValueError:
+            value = 0
+        if not value > 0:
+            raise ArgumentTypeError("Expected a positive number, got '{}'".format(string))
+
+        return value
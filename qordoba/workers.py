@@ -0,0 +1,127 @@
+from __future__ import unicode_literals, print_function
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from qordoba.concurrency import AIMDLimiter, parse_jobs
+from qordoba.deadline import get_deadline, DeadlineExceeded
+from qordoba.progress import get_progress
+from qordoba.tracing import add_span_listener, remove_span_listener
+
+log = logging.getLogger('qordoba')
+
+
+class WorkerPool(object):
+    """
+    Run the work units of a command on up to ``jobs`` threads.
+
+    Units are taken lazily from the iterable, so paginated searches keep streaming while workers run.
+    With ``jobs=1`` every unit runs in the calling thread, exactly like a plain loop.
+    Scheduling stops at the first error; units in flight are finished and the error is re-raised.
+    When the deadline of the run (see qordoba.deadline) is reached, scheduling stops as well and
+    DeadlineExceeded is raised once the units in flight are drained.
+
+    With ``jobs='auto'`` or ``'auto:MAX'`` the number of units in flight follows an AIMDLimiter, which is fed
+    by the API requests of the run and never exceeds MAX threads.
+    """
+
+    def __init__(self, jobs=1, name='qordoba-worker'):
+        self.jobs, adaptive = parse_jobs(jobs)
+        self.limiter = AIMDLimiter(max_limit=self.jobs) if adaptive and self.jobs > 1 else None
+        self.name = name
+        self.queued = 0
+        self.active = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def run(self, func, units):
+        """
+        :param func: callable(unit)
+        :param units: iterable of work units
+        :return: number of processed units
+        """
+        # a shared pool runs several commands one after another
+        self.skipped = 0
+        progress = get_progress()
+        if progress is not None:
+            progress.pool = self
+        deadline = get_deadline()
+
+        if self.jobs == 1:
+            count = 0
+            for unit in units:
+                if deadline is not None and deadline.expired():
+                    raise self._deadline_exceeded(deadline, units, count)
+                self._run_unit(func, unit, progress)
+                count += 1
+            return count
+
+        errors = []
+        if self.limiter is not None:
+            acquire, release = self.limiter.acquire, self.limiter.release
+            add_span_listener(self.limiter.observe_span)
+        else:
+            slots = threading.BoundedSemaphore(self.jobs * 2)
+            acquire, release = slots.acquire, slots.release
+
+        def done(future):
+            release()
+            if future.exception() is not None:
+                errors.append(future.exception())
+
+        count = 0
+        expired = False
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                for unit in units:
+                    acquire()
+                    if errors:
+                        release()
+                        break
+                    if deadline is not None and deadline.expired():
+                        release()
+                        expired = True
+                        break
+                    with self._lock:
+                        self.queued += 1
+                    executor.submit(self._run_unit, func, unit, progress, deadline).add_done_callback(done)
+                    count += 1
+        finally:
+            if self.limiter is not None:
+                remove_span_listener(self.limiter.observe_span)
+                log.debug(self.limiter.summary())
+
+        if errors:
+            raise errors[0]
+        if expired or self.skipped:
+            raise self._deadline_exceeded(deadline, units, count)
+        return count
+
+    def _deadline_exceeded(self, deadline, units, count):
+        left = len(units) - count + self.skipped if hasattr(units, '__len__') else None
+        return DeadlineExceeded(deadline, count - self.skipped, left)
+
+    def _run_unit(self, func, unit, progress, deadline=None):
+        with self._lock:
+            self.queued = max(self.queued - 1, 0)
+            if deadline is not None and deadline.expired():
+                # queued, but not started before the deadline
+                self.skipped += 1
+                return
+            self.active += 1
+        try:
+            func(unit)
+        finally:
+            with self._lock:
+                self.active -= 1
+            if progress is not None:
+                progress.unit_finished()
+
+
+def worker_pool(jobs):
+    """
+    :param jobs: number of jobs for a new pool, or a WorkerPool shared by several commands of the run
+    :rtype: WorkerPool
+    """
+    return jobs if isinstance(jobs, WorkerPool) else WorkerPool(jobs)
@@ -0,0 +1,135 @@
+from __future__ import unicode_literals, print_function
+
+import logging
+import os
+import time
+from collections import namedtuple
+
+from qordoba.deadline import DeadlineExceeded
+from qordoba.memo import enable_shared_catalog, disable_shared_catalog
+from qordoba.progress import format_duration
+from qordoba.session import shared_session
+from qordoba.settings import SettingsDict, SettingsError, load_settings_from_file
+from qordoba.workers import WorkerPool
+
+log = logging.getLogger('qordoba')
+
+DEFAULT_WORKSPACE_PATH = '.qordoba-workspace.yml'
+
+PROJECT_SETTINGS_NAME = '.qordoba.yml'
+
+
+class WorkspaceError(SettingsError):
+    """
+    Workspace config is not valid or some of its projects failed
+    """
+
+
+class WorkspaceProject(namedtuple('_WorkspaceProject', ('name', 'curdir', 'config'))):
+    """
+    One project of a workspace. ``curdir`` is the directory of the project, its patterns are relative to it.
+    """
+
+
+class ProjectResult(namedtuple('_ProjectResult', ('name', 'project_id', 'files', 'seconds', 'error'))):
+    """
+    Outcome of a command in one project. ``error`` is None when the command succeeded.
+    """
+
+
+def load_workspace(path, **overrides):
+    """
+    Read the projects of a workspace config:
+
+        qordoba:
+          access_token: ...
+          organization_id: ...
+          projects:
+            - path: web
+            - path: services/api
+              project_id: 12
+
+    Settings of a project are the workspace settings, updated by the ``.qordoba.yml`` in the directory of the
+    project, updated by the entry of the project.
+
+    :param overrides: settings of the command line for every project, None values are ignored
+    :rtype: list of WorkspaceProject
+    """
+    data = load_settings_from_file(path)
+    entries = data.pop('projects', None)
+    if not entries:
+        raise WorkspaceError('Workspace `{}` lists no projects'.format(path))
+
+    root = os.path.dirname(os.path.abspath(path))
+    projects = []
+    for entry in entries:
+        entry = dict(entry) if isinstance(entry, dict) else {'path': entry}
+        curdir = os.path.normpath(os.path.join(root, entry.pop('path', '.')))
+        name = entry.pop('name', None) or os.path.relpath(curdir, root)
+
+        settings = dict(data)
+        settings_path = os.path.join(curdir, PROJECT_SETTINGS_NAME)
+        if os.path.exists(settings_path):
+            settings.update(load_settings_from_file(settings_path))
+        settings.update(entry)
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+        try:
+            config = SettingsDict(path=settings_path, **settings)
+        except SettingsError as e:
+            raise WorkspaceError('Project `{}` of workspace `{}`: {}'.format(name, path, e))
+        projects.append(WorkspaceProject(name, curdir, config))
+    return projects
+
+
+def run_workspace(projects, run, jobs=1):
+    """
+    Run a command in every project of a workspace, one project after another in this process.
+
+    The projects share one HTTP session, the language catalog and a worker pool, so open connections and the
+    adaptive concurrency limit carry over from one project to the next. Each project runs in its directory.
+    A failed project is reported and the next one still runs; the deadline of the run stops all of them.
+
+    :param run: callable(WorkspaceProject, WorkerPool) which returns the number of processed files
+    :rtype: list of ProjectResult
+    """
+    pool = WorkerPool(jobs, name='qordoba-workspace')
+    curdir = os.getcwd()
+    results = []
+    enable_shared_catalog()
+    try:
+        with shared_session(pool_size=pool.jobs * 2):
+            for project in projects:
+                log.info('Project `{}` ({})...'.format(project.name, project.config['project_id']))
+                started = time.time()
+                files, error = None, None
+                try:
+                    os.chdir(project.curdir)
+                    files = run(project, pool)
+                except DeadlineExceeded as e:
+                    results.append(ProjectResult(project.name, project.config['project_id'], e.done,
+                                                 time.time() - started, str(e)))
+                    break
+                except Exception as e:
+                    log.error('Project `{}` failed: {}'.format(project.name, e))
+                    error = str(e)
+                finally:
+                    os.chdir(curdir)
+                results.append(ProjectResult(project.name, project.config['project_id'], files,
+                                             time.time() - started, error))
+    finally:
+        disable_shared_catalog()
+
+    for project in projects[len(results):]:
+        results.append(ProjectResult(project.name, project.config['project_id'], None, 0.0, 'not started'))
+    return results
+
+
+def summary_rows(results):
+    """
+    :return: rows for AsciiTable with one line per project
+    """
+    rows = [['PROJECT', 'ID', 'FILES', 'TIME', 'STATUS'], ]
+    for result in results:
+        rows.append([result.name, result.project_id, '-' if result.files is None else result.files,
+                     format_duration(result.seconds), 'ok' if result.error is None else result.error])
+    return rows
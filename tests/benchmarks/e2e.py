@@ -0,0 +1,191 @@
+"""
+End-to-end benchmarks of push, pull, ls and status against the fake API server.
+
+Every run of a workload gets a fresh server in this process and runs the command in a child process, so the
+peak RSS belongs to the client alone. Results can be saved and compared with the results of another commit:
+
+    python -m tests.benchmarks.e2e --output base.json
+    python -m tests.benchmarks.e2e --compare base.json --threshold 0.1
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.benchmarks.results import save_results, report_comparison, DEFAULT_THRESHOLD
+from tests.fake_server import FakeProject, FakeQordobaServer
+
+try:
+    import resource
+except ImportError:
+    # windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PULL_PATTERN = 'i18n/<language_code>/<filename>.<extension>'
+PUSH_PATTERN = 'sources/*.json'
+
+
+class Workload(object):
+    """
+    Fixed synthetic workload. ``pages`` and ``files`` are multiplied by the scale of the run.
+    """
+
+    def __init__(self, name, command, pages=0, languages=1, files=0, jobs=1, latency=0.002, content_size=1024):
+        self.name = name
+        self.command = command
+        self.pages = pages
+        self.languages = languages
+        self.files = files
+        self.jobs = jobs
+        self.latency = latency
+        self.content_size = content_size
+
+
+WORKLOADS = (
+    Workload('pull', 'pull', pages=200, languages=3),
+    Workload('pull-jobs8', 'pull', pages=200, languages=3, jobs=8),
+    Workload('push', 'push', files=100),
+    Workload('push-jobs8', 'push', files=100, jobs=8),
+    Workload('ls', 'ls', pages=5000),
+    Workload('status', 'status', pages=1000, languages=100),
+)
+
+
+def _scaled(value, scale):
+    return max(int(value * scale), 1) if value else 0
+
+
+def peak_rss():
+    """
+    :return: peak resident set size of the process in bytes or None if it is not available
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_child(spec):
+    """
+    Run one command in the current directory and print the measurements as JSON.
+    """
+    from qordoba.commands.ls import ls_command
+    from qordoba.commands.pull import pull_command
+    from qordoba.commands.push import push_command
+    from qordoba.commands.status import status_command
+
+    logging.getLogger('qordoba').setLevel(logging.WARNING)
+    curdir = os.getcwd()
+    config = spec['config']
+    command = spec['command']
+
+    started = time.time()
+    if command == 'pull':
+        pull_command(curdir, dict(config, pull={'targets': [{'file': PULL_PATTERN}]}), force=True, jobs=spec['jobs'])
+        files = sum(len(names) for _, _, names in os.walk(os.path.join(curdir, 'i18n')))
+    elif command == 'push':
+        push_command(curdir, dict(config, push={'sources': [{'file': PUSH_PATTERN}]}), jobs=spec['jobs'])
+        files = len(os.listdir(os.path.join(curdir, 'sources')))
+    elif command == 'ls':
+        files = len(list(ls_command(config)))
+    elif command == 'status':
+        files = len(list(status_command(config))) - 1
+    else:
+        raise ValueError('Unknown command `{}`'.format(command))
+    wall_time = time.time() - started
+
+    print(json.dumps({'wall_time': wall_time, 'files': files, 'peak_rss': peak_rss()}))
+
+
+def run_workload(workload, scale=1.0):
+    """
+    :type workload: Workload
+    :return: dict of metrics
+    """
+    project = FakeProject(pages=_scaled(workload.pages, scale), languages=workload.languages,
+                          content_size=workload.content_size)
+    workdir = tempfile.mkdtemp(prefix='qor-bench-')
+    try:
+        if workload.files:
+            os.mkdir(os.path.join(workdir, 'sources'))
+            for i in range(_scaled(workload.files, scale)):
+                with io.open(os.path.join(workdir, 'sources', 'source-{:05d}.json'.format(i)), 'w') as f:
+                    f.write('{{"key": "{}"}}'.format('x' * workload.content_size))
+
+        with FakeQordobaServer(project, latency=workload.latency) as server:
+            spec = {'command': workload.command, 'jobs': workload.jobs, 'config': server.config()}
+            env = dict(os.environ, PYTHONPATH=ROOT)
+            output = subprocess.check_output([sys.executable, '-m', 'tests.benchmarks.e2e', '--child',
+                                              json.dumps(spec)], cwd=workdir, env=env)
+            requests = sum(server.calls.values())
+    finally:
+        shutil.rmtree(workdir)
+
+    result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    result['requests'] = requests
+    result['files_per_sec'] = result['files'] / max(result['wall_time'], 1e-9)
+    return result
+
+
+def run_benchmarks(workloads=WORKLOADS, scale=1.0, repeat=1):
+    """
+    :return: results by workload name. With ``repeat`` > 1 the run with the median wall time is kept.
+    """
+    results = {}
+    for workload in workloads:
+        runs = sorted((run_workload(workload, scale=scale) for _ in range(repeat)), key=lambda r: r['wall_time'])
+        results[workload.name] = runs[len(runs) // 2]
+    return results
+
+
+def format_results(results):
+    rows = [['BENCHMARK', 'WALL TIME', 'FILES', 'FILES/S', 'REQUESTS', 'PEAK RSS'], ]
+    for name, result in sorted(results.items()):
+        rss = result['peak_rss']
+        rows.append([name, '{:.3f}s'.format(result['wall_time']), result['files'],
+                     '{:.1f}'.format(result['files_per_sec']), result['requests'],
+                     '{:.1f} MB'.format(rss / 1048576.0) if rss else '-'])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmarks of the qor commands.')
+    parser.add_argument('--workload', dest='workloads', action='append', choices=[w.name for w in WORKLOADS],
+                        help='Run only the selected workloads.')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply the number of pages and files.')
+    parser.add_argument('--repeat', type=int, default=3, help='Keep the median of several runs.')
+    parser.add_argument('--output', metavar='FILE', help='Save results as JSON.')
+    parser.add_argument('--compare', metavar='FILE', help='Compare with saved results. Exit 1 on regression.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed relative change for --compare, 0.1 is 10%%.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(json.loads(args.child))
+
+    from terminaltables import AsciiTable
+
+    workloads = [w for w in WORKLOADS if not args.workloads or w.name in args.workloads]
+    results = run_benchmarks(workloads, scale=args.scale, repeat=args.repeat)
+    print(AsciiTable(format_results(results)).table)
+
+    if args.output:
+        save_results(args.output, results, suite='e2e', scale=args.scale, repeat=args.repeat)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, {'results': results}, threshold=args.threshold))
+
+
+if __name__ == '__main__':
+    main()
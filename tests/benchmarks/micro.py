@@ -0,0 +1,246 @@
+"""
+Microbenchmarks of the per-item functions which large push/pull/ls runs call thousands of times.
+
+Every benchmark reports:
+
+- ``ns_per_op``: best time of one call over several timed loops
+- ``allocs_per_op``: memory blocks allocated by one call and still alive when it returns
+- ``bytes_per_op``: size of these blocks traced by tracemalloc
+
+Results of the calls are kept alive while allocations are measured, so the numbers show what a call leaves
+behind (the result and anything it caches). CPython does not count blocks which are freed before the call
+returns.
+
+    python -m tests.benchmarks.micro --output base.json
+    python -m tests.benchmarks.micro --compare base.json --filter TranslationFile
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+from qordoba.commands.ls import get_status
+from qordoba.languages import init_language_storage, normalize_language
+from qordoba.project import API_URL, ResponsePaginatedResult
+from qordoba.routes import RouteTable
+from qordoba.sources import TranslationFile, create_target_path_by_pattern, get_content_type_code, validate_path
+from qordoba.utils import build_url
+from tests.benchmarks.results import save_results, report_comparison, DEFAULT_THRESHOLD
+
+try:
+    import tracemalloc
+except ImportError:
+    # python27
+    tracemalloc = None
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+CURDIR = os.path.abspath(os.sep)
+
+_BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+    """
+    Register a benchmark. The decorated function prepares the data and returns the callable to measure.
+    """
+    def wrapper(func):
+        _BENCHMARKS[name] = func
+        return func
+    return wrapper
+
+
+class _LanguagesAPI(object):
+    def get_languages(self):
+        with io.open(os.path.join(FIXTURES, 'languages_response.json'), encoding='utf-8') as f:
+            return json.loads(f.read())['languages']
+
+
+def _init_languages():
+    init_language_storage(_LanguagesAPI())
+
+
+@benchmark('build_url')
+def bench_build_url():
+    return lambda: build_url(API_URL, 'projects', 3422, 'languages', 190, 'pages', 723885, limit=50, offset=100)
+
+
+@benchmark('RouteTable.url')
+def bench_route_url():
+    routes = RouteTable(API_URL, project_id=3422, organization_id=1)
+    return lambda: routes.url('page_details', language_id=190, page_id=723885)
+
+
+@benchmark('normalize_language')
+def bench_normalize_language():
+    _init_languages()
+    return lambda: normalize_language('fr_FR')
+
+
+@benchmark('validate_path')
+def bench_validate_path():
+    _init_languages()
+    return lambda: validate_path(CURDIR, os.path.join('i18n', 'en', 'messages.json'), 'en-us')
+
+
+@benchmark('create_target_path_by_pattern')
+def bench_create_target_path():
+    _init_languages()
+    language = normalize_language('fr-fr')
+    pattern = 'i18n/<language_lang_code>/<language_name_cap>/<filename>.<extension>'
+    return lambda: create_target_path_by_pattern(CURDIR, language, 'messages.json', pattern=pattern,
+                                                 content_type_code='JSON')
+
+
+@benchmark('get_content_type_code')
+def bench_get_content_type_code():
+    _init_languages()
+    path = validate_path(CURDIR, os.path.join('i18n', 'en', 'messages.json'), 'en-us')
+    return lambda: get_content_type_code(path)
+
+
+@benchmark('TranslationFile()')
+def bench_translation_file():
+    _init_languages()
+    language = normalize_language('en-us')
+    relpath = os.path.join('i18n', 'en', 'messages.json')
+    return lambda: TranslationFile(relpath, language, CURDIR)
+
+
+@benchmark('TranslationFile properties')
+def bench_translation_file_properties():
+    _init_languages()
+    path = TranslationFile(os.path.join('i18n', 'en', 'messages.json'), normalize_language('en-us'), CURDIR)
+
+    def access():
+        return path.extension, path.posix_path, path.native_path, path.unique_name, path.path_parts
+
+    return access
+
+
+@benchmark('ResponsePaginatedResult iteration (500 items)')
+def bench_paginated_iteration():
+    pages = [{'id': i, 'page_id': i, 'url': 'page-{}.json'.format(i)} for i in range(500)]
+
+    def page_search(limit=50, offset=0):
+        return {'pages': pages[offset:offset + limit], 'meta': {'paging': {'total_results': len(pages)}}}
+
+    def iterate():
+        for _ in ResponsePaginatedResult('pages', page_search, (), {}):
+            pass
+
+    return iterate
+
+
+@benchmark('ls.get_status')
+def bench_get_status():
+    page = {'enabled': True, 'completed': False, 'preparing': False}
+    return lambda: get_status(page)
+
+
+def time_per_op(func, min_time=0.2, repeat=5):
+    """
+    :return: best time of one call in nanoseconds
+    """
+    number = 1
+    while True:
+        elapsed = _timed_loop(func, number)
+        if elapsed >= min_time / repeat or number >= 10 ** 7:
+            break
+        number *= 10 if elapsed < min_time / repeat / 10 else 2
+
+    best = min(_timed_loop(func, number) for _ in range(repeat))
+    return best / number * 1e9
+
+
+def _timed_loop(func, number):
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter() if hasattr(time, 'perf_counter') else time.time()
+        for _ in range(number):
+            func()
+        finished = time.perf_counter() if hasattr(time, 'perf_counter') else time.time()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return finished - started
+
+
+def allocations_per_op(func, number=1000):
+    """
+    :return: (blocks, bytes) allocated by one call and alive when it returns, or (None, None) on python27
+    """
+    if tracemalloc is None or not hasattr(sys, 'getallocatedblocks'):
+        return None, None
+
+    func()  # fill the caches of the first call
+    results = [None] * number
+    gc.collect()
+    gc.disable()
+    try:
+        blocks = sys.getallocatedblocks()
+        for i in range(number):
+            results[i] = func()
+        blocks = sys.getallocatedblocks() - blocks
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(number):
+            results[i] = func()
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+    return float(blocks) / number, float(max(size, 0)) / number
+
+
+def run_benchmarks(names=None, min_time=0.2, alloc_number=1000):
+    results = OrderedDict()
+    for name, setup in _BENCHMARKS.items():
+        if names and not any(n in name for n in names):
+            continue
+        func = setup()
+        allocs, size = allocations_per_op(func, number=alloc_number)
+        results[name] = {'ns_per_op': time_per_op(func, min_time=min_time), 'allocs_per_op': allocs,
+                         'bytes_per_op': size}
+    return results
+
+
+def format_results(results):
+    rows = [['BENCHMARK', 'NS/OP', 'ALLOCS/OP', 'BYTES/OP'], ]
+    for name, result in results.items():
+        rows.append([name, '{:.0f}'.format(result['ns_per_op']),
+                     '-' if result['allocs_per_op'] is None else '{:.1f}'.format(result['allocs_per_op']),
+                     '-' if result['bytes_per_op'] is None else '{:.0f}'.format(result['bytes_per_op'])])
+    return rows
+
+
+def main():
+    from terminaltables import AsciiTable
+
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the per-item hot paths.')
+    parser.add_argument('--filter', dest='names', action='append', help='Run benchmarks which contain NAME.')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds spent timing every benchmark.')
+    parser.add_argument('--output', metavar='FILE', help='Save results as JSON.')
+    parser.add_argument('--compare', metavar='FILE', help='Compare with saved results. Exit 1 on regression.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed relative change for --compare, 0.1 is 10%%.')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names, min_time=args.min_time)
+    print(AsciiTable(format_results(results)).table)
+
+    if args.output:
+        save_results(args.output, results, suite='micro')
+    if args.compare:
+        sys.exit(report_comparison(args.compare, {'results': results}, threshold=args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Storage and comparison of benchmark results.
+
+A result file is JSON: ``{"meta": {...}, "results": {"<benchmark>": {"<metric>": value}}}``.
+"""
+from __future__ import unicode_literals, print_function
+
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+
+# For these metrics a bigger value is a regression, for the rest a smaller value is
+LOWER_IS_BETTER = ('wall_time', 'requests', 'peak_rss', 'ns_per_op', 'allocs_per_op', 'bytes_per_op')
+HIGHER_IS_BETTER = ('files_per_sec', )
+
+DEFAULT_THRESHOLD = 0.1
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.STDOUT).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_meta(**extra):
+    meta = {
+        'created': int(time.time()),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': sys.platform,
+        'revision': git_revision(),
+    }
+    meta.update(extra)
+    return meta
+
+
+def save_results(path, results, **meta):
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'meta': build_meta(**meta), 'results': results}, indent=2, sort_keys=True))
+
+
+def load_results(path):
+    with io.open(path, 'r', encoding='utf-8') as f:
+        return json.loads(f.read())
+
+
+def compare(base, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the metrics of two result files.
+
+    :param dict base: loaded results of the baseline
+    :param dict current: loaded results to check
+    :param float threshold: allowed relative change, 0.1 is 10%
+    :return: rows for AsciiTable and the list of regressions as (benchmark, metric, change)
+    """
+    rows = [['BENCHMARK', 'METRIC', 'BASE', 'CURRENT', 'CHANGE'], ]
+    regressions = []
+    base_results = base['results']
+    for name, metrics in sorted(current['results'].items()):
+        if name not in base_results:
+            continue
+        for metric, value in sorted(metrics.items()):
+            base_value = base_results[name].get(metric)
+            if metric not in LOWER_IS_BETTER + HIGHER_IS_BETTER or not base_value or value is None:
+                continue
+
+            change = (float(value) - base_value) / base_value
+            regression = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+            if regression:
+                regressions.append((name, metric, change))
+            rows.append([name, metric, _format(base_value), _format(value),
+                         '{:+.1f}%{}'.format(change * 100, ' REGRESSION' if regression else '')])
+    return rows, regressions
+
+
+def _format(value):
+    if isinstance(value, float):
+        return '{:.4g}'.format(value)
+    return str(value)
+
+
+def report_comparison(base_path, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Print the comparison table and return the exit code: 1 when any metric regressed more than ``threshold``.
+    """
+    from terminaltables import AsciiTable
+
+    rows, regressions = compare(load_results(base_path), current, threshold=threshold)
+    print(AsciiTable(rows).table)
+    for name, metric, change in regressions:
+        print('Regression: {} {} changed by {:+.1f}%'.format(name, metric, change * 100))
+    return 1 if regressions else 0
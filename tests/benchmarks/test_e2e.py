@@ -0,0 +1,23 @@
+from tests.benchmarks.e2e import Workload, run_workload
+from tests.benchmarks.results import compare
+
+
+def test_run_workload():
+    result = run_workload(Workload('pull', 'pull', pages=5, languages=2, latency=0), scale=1.0)
+
+    assert result['files'] == 10
+    # languages, project, 2 searches and 3 requests for every file
+    assert result['requests'] == 4 + 10 * 3
+    assert result['files_per_sec'] > 0
+    assert result['wall_time'] > 0
+
+
+def test_compare():
+    base = {'results': {'pull': {'wall_time': 1.0, 'files_per_sec': 100.0, 'requests': 30, 'files': 10}}}
+    current = {'results': {'pull': {'wall_time': 1.05, 'files_per_sec': 80.0, 'requests': 40, 'files': 10},
+                           'ls': {'wall_time': 1.0}}}
+
+    rows, regressions = compare(base, current, threshold=0.1)
+
+    assert [(name, metric) for name, metric, _ in regressions] == [('pull', 'files_per_sec'), ('pull', 'requests')]
+    assert len(rows) == 4
@@ -0,0 +1,25 @@
+import pytest
+
+from tests.benchmarks.micro import run_benchmarks, allocations_per_op, tracemalloc, _BENCHMARKS
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(min_time=0.001, alloc_number=10)
+
+    assert list(results) == list(_BENCHMARKS)
+    for result in results.values():
+        assert result['ns_per_op'] > 0
+
+
+def test_run_benchmarks_filter():
+    assert list(run_benchmarks(['TranslationFile'], min_time=0.001, alloc_number=10)) == ['TranslationFile()',
+                                                                        'TranslationFile properties']
+
+
+@pytest.mark.skipif(tracemalloc is None, reason='tracemalloc is not available')
+def test_allocations_per_op():
+    blocks, size = allocations_per_op(lambda: [object() for _ in range(10)], number=100)
+
+    # the list and its 10 objects
+    assert 10 <= blocks < 13
+    assert size > 10 * 16
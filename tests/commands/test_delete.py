@@ -1,7 +1,7 @@
 import pytest
 from mock import MagicMock
 
-from qordoba.commands.delete import delete_command
+from qordoba.commands.delete import delete_command, read_targets, DeleteError
 from qordoba.languages import get_destination_languages
 from qordoba.project import ResponsePaginatedResult, QordobaResponseError
 
@@ -18,9 +18,10 @@ def page_search_paginated(page_search_response):
     return ResponsePaginatedResult('pages', lambda *args, **kwargs: page_search_response, (), {})
 
 
-def test_delete(mock_api, project_response, curdir):
+def test_delete(mock_api, project_response, curdir, page_search_paginated):
     mock_api.get_project.return_value = project_response
     mock_api.delete_page.return_value = {'success': True}
+    mock_api.page_search.return_value = page_search_paginated
 
     page_id = 1
     delete_command(curdir, {}, page_id, force=True)
@@ -64,9 +65,10 @@ def test_delete_not_found(mock_api, project_response, curdir, page_search_pagina
     assert mock_api.delete_page.call_count == 0
 
 
-def test_delete_response_not_found(mock_api, project_response, curdir):
+def test_delete_response_not_found(mock_api, project_response, curdir, page_search_paginated):
     mock_api.get_project.return_value = project_response
     mock_api.delete_page.side_effect = QordobaResponseError('Not found')
+    mock_api.page_search.return_value = page_search_paginated
 
     page_id = 1
     with pytest.raises(QordobaResponseError):
@@ -74,3 +76,63 @@ def test_delete_response_not_found(mock_api, project_response, curdir):
 
     assert mock_api.get_project.call_count == 1
     mock_api.delete_page.assert_called_once_with(page_id)
+
+
+@pytest.mark.parametrize('targets', [['22'], ['22', 'test.json'], ['22', 'nothing*']])
+def test_delete_unknown_id(mock_api, project_response, curdir, page_search_paginated, targets):
+    mock_api.get_project.return_value = project_response
+    mock_api.page_search.return_value = page_search_paginated
+
+    result = delete_command(curdir, {}, targets, force=True)
+
+    assert '22' in result.missing
+    assert 22 not in [c[0][0] for c in mock_api.delete_page.call_args_list]
+    assert result.failed == []
+
+
+def test_delete_bulk(mock_api, project_response, curdir, page_search_paginated, tmpdir):
+    mock_api.get_project.return_value = project_response
+    mock_api.page_search.return_value = page_search_paginated
+
+    def delete_page(page_id):
+        if page_id == 11:
+            raise QordobaResponseError('Forbidden')
+        return {'success': True}
+
+    mock_api.delete_page.side_effect = delete_page
+    targets = tmpdir.join('targets.txt')
+    targets.write('# stale resources\ntest.json\n\ntest.y*\nmissing.json\n111\n')
+
+    with pytest.raises(DeleteError):
+        delete_command(curdir, {}, read_targets(str(targets)), force=True, jobs=2)
+
+    # one scan of the index for all targets
+    lang = next(get_destination_languages(project_response))
+    mock_api.page_search.assert_called_once_with(lang.id)
+    assert sorted(c[0][0] for c in mock_api.delete_page.call_args_list) == [1, 11, 111]
+
+
+def test_delete_bulk_result(mock_api, project_response, curdir, page_search_paginated, monkeypatch):
+    mock_api.get_project.return_value = project_response
+    mock_api.page_search.return_value = page_search_paginated
+    monkeypatch.setattr('qordoba.commands.delete.ask_bool', MagicMock(return_value=True))
+
+    result = delete_command(curdir, {}, ['test.*', 'nothing*'])
+
+    assert sorted(page['page_id'] for page in result.deleted) == [1, 11, 111]
+    assert result.missing == ['nothing*']
+    assert result.failed == []
+
+
+@pytest.mark.parametrize('all_versions, deleted', [(False, [1]), (True, [1, 2])])
+def test_delete_versions(mock_api, project_response, curdir, page_search_response, all_versions, deleted):
+    version = dict(page_search_response['pages'][0], page_id=2, version_tag='v2')
+    response = dict(page_search_response, pages=page_search_response['pages'] + [version],
+                    meta={'paging': {'total_results': 4}})
+    mock_api.get_project.return_value = project_response
+    mock_api.page_search.return_value = ResponsePaginatedResult('pages', lambda *args, **kwargs: response, (), {})
+
+    result = delete_command(curdir, {}, ['test.json'], force=True, all_versions=all_versions)
+
+    assert [page['page_id'] for page in result.deleted] == deleted
+    assert sorted(c[0][0] for c in mock_api.delete_page.call_args_list) == deleted
@@ -12,6 +12,7 @@ import pytest
 import shutil
 from mock import MagicMock
 from qordoba.commands.pull import pull_command, validate_languges_input
+from qordoba.journal import Journal
 from qordoba.languages import Language
 from qordoba.project import ResponsePaginatedResult, PageStatus
 
@@ -193,3 +194,71 @@ def test_pull_exists_replace(mock_api, mock_tmp_dir,
     mock_api.download_file.assert_called_with(page_details_response['id'], lang_ru.id, milestone=None)
 
     assert os.path.exists(os.path.join(mock_tmp_dir, 'ru-ru.json'))
+
+
+def test_pull_all_languages_prefetch(mock_api, mock_tmp_dir,
+                                     project_response,
+                                     language_response,
+                                     page_details_response):
+    empty_search = {'pages': [], 'meta': {'paging': {'total_results': 0}}}
+    mock_api.get_languages.return_value = language_response
+    mock_api.get_project.return_value = project_response
+    mock_api.page_search.side_effect = lambda *args, **kwargs: ResponsePaginatedResult(
+        'pages', lambda *a, **kw: empty_search, args, kwargs)
+
+    pull_command(mock_tmp_dir, {})
+
+    target_ids = [lang['id'] for lang in project_response['target_languages']]
+    assert mock_api.page_search.call_count == len(target_ids)
+    assert sorted(c[0][0] for c in mock_api.page_search.call_args_list) == sorted(target_ids)
+    mock_api.download_file.assert_not_called()
+
+
+def test_pull_jobs(mock_api, mock_tmp_dir,
+                   project_response,
+                   page_search_paginated,
+                   language_response,
+                   page_details_response):
+    mock_api.get_languages.return_value = language_response
+    mock_api.get_project.return_value = project_response
+    mock_api.page_search.return_value = page_search_paginated
+    mock_api.get_page_details.return_value = page_details_response
+    mock_api.download_file.side_effect = lambda *args, **kwargs: MagicMock(raw=StringIO(b'test'))
+
+    pull_command(mock_tmp_dir, {}, languages=('ru-ru', 'ja-jp'), force=True, jobs=4)
+
+    assert mock_api.download_file.call_count == 2
+    assert os.path.exists(os.path.join(mock_tmp_dir, 'ru-ru.json'))
+    assert os.path.exists(os.path.join(mock_tmp_dir, 'ja-jp.json'))
+
+
+def test_pull_resume(mock_api, mock_tmp_dir,
+                     project_response,
+                     page_search_paginated,
+                     language_response,
+                     page_details_response):
+    mock_api.get_languages.return_value = language_response
+    mock_api.get_project.return_value = project_response
+    mock_api.page_search.return_value = page_search_paginated
+    mock_api.get_page_details.return_value = page_details_response
+    mock_api.download_file.return_value.raw = StringIO(b'test')
+
+    path = os.path.join(mock_tmp_dir, '.qordoba-pull.journal')
+    journal = Journal(path, 'pull', 1)
+    pull_command(mock_tmp_dir, {}, languages=('ru-ru',), journal=journal)
+
+    assert mock_api.download_file.call_count == 1
+    assert not os.path.exists(os.path.join(mock_tmp_dir, 'ru-ru.json.part'))
+
+    journal = Journal(path, 'pull', 1, resume=True)
+    pull_command(mock_tmp_dir, {}, languages=('ru-ru',), journal=journal)
+
+    assert mock_api.download_file.call_count == 1
+
+    # the file was changed since, so it is downloaded again
+    with open(os.path.join(mock_tmp_dir, 'ru-ru.json'), 'w') as f:
+        f.write('changed')
+    mock_api.download_file.return_value.raw = StringIO(b'test')
+    pull_command(mock_tmp_dir, {}, languages=('ru-ru',), force=True, journal=Journal(path, 'pull', 1, resume=True))
+
+    assert mock_api.download_file.call_count == 2
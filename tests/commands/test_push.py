@@ -6,6 +6,7 @@ from mock import MagicMock
 from qordoba.commands.push import select_version_tag, select_source_columns, push_command, update_file, upload_file
 from qordoba.languages import Language
 from qordoba.settings import PatternNotFound
+from qordoba.sharding import Shard
 from qordoba.sources import validate_path
 
 
@@ -162,3 +163,20 @@ def test_upload_file(mock_api, mock_change_dir,
 
     mock_api.upload_anytype_file.assert_called_once()
     mock_api.append_file.assert_called_with(1, 'test.json', version_tag='v1')
+
+
+def test_push_command_shard(mock_api, mock_change_dir,
+                            mock_update,
+                            mock_upload,
+                            language_response,
+                            project_response):
+    mock_api.get_languages.return_value = language_response
+    mock_api.get_project.return_value = project_response
+    mock_api.page_search.return_value = ()
+    config = {'push': {'sources': [{'file': './sources/*/*'}]}}
+
+    for index in (1, 2):
+        push_command(mock_change_dir, config, shard=Shard(index, 2))
+
+    pushed = sorted(c[0][1].posix_path for c in mock_upload.call_args_list)
+    assert pushed == ['./sources/C/sampleC.json', './sources/D/sampleD.json']
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from qordoba.commands.status import org_status_command, page_status_command
+from qordoba.project import QordobaResponseError
+
+
+def milestone(name, order, percent):
+    return {'id': order, 'name': name, 'order': order, 'count': 1, 'words_count': 1, 'percent': percent}
+
+
+REPORTS = {
+    1: {'languages': [{'id': 10, 'code': 'fr-fr', 'total_words': 100, 'segments': 10,
+                       'milestones': [milestone('Completed', 1000, 50.0), milestone('Editing', 10, 75.0)]}]},
+    2: {'languages': [{'id': 11, 'code': 'de-de', 'total_words': 20, 'segments': 2,
+                       'milestones': [milestone('Completed', 1000, 100.0), milestone('Review', 20, 100.0)]}]},
+}
+
+
+PAGES = [{'page_id': i, 'url': 'page-{}.json'.format(i), 'deleted': i == 3} for i in range(1, 201)]
+
+# complete segments per (language, page), missing stats are not available
+STATS = {(10, 1): 5, (11, 1): 10, (10, 2): 0}
+
+
+class FakeAPI(object):
+    def __init__(self, config):
+        self.project_id = config.get('project_id')
+        self.pages = PAGES[:config.get('pages', 3)]
+        self.stats_calls = 0
+        self._lock = threading.Lock()
+        FakeAPI.instance = self
+
+    def get_projects(self):
+        return iter([{'id': 1, 'name': 'Web'}, {'id': 2, 'name': 'App'}, {'id': 3, 'name': 'Archived'}])
+
+    def get_report_progress(self):
+        if self.project_id not in REPORTS:
+            raise QordobaResponseError('Forbidden')
+        return REPORTS[self.project_id]
+
+    def get_project(self):
+        return {'id': 1, 'target_languages': [{'id': 10, 'code': 'fr-fr'}, {'id': 11, 'code': 'de-de'}]}
+
+    def page_search(self, language_id):
+        return iter(self.pages)
+
+    def get_page_stats(self, language_id, page_id):
+        with self._lock:
+            self.stats_calls += 1
+        if page_id > 3:
+            return {'stats': 10, 'complete_segment_count': 10}
+        if (language_id, page_id) not in STATS:
+            raise QordobaResponseError('Not found')
+        return {'stats': 10 if page_id == 1 else 0, 'complete_segment_count': STATS[(language_id, page_id)]}
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    monkeypatch.setattr('qordoba.commands.status.ProjectAPI', FakeAPI)
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_org_status(mock_api, jobs):
+    rows = list(org_status_command({'organization_id': 1, 'project_id': 1, 'access_token': 'token'}, jobs=jobs))
+
+    assert rows == [
+        ['PROJECT_ID', 'PROJECT', 'LOCALE', '#WORDS', '#SEGMENTS', 'EDITING %', 'REVIEW %', 'COMPLETED %'],
+        [1, 'Web', 'fr-fr', 100, 10, 75.0, None, 50.0],
+        [2, 'App', 'de-de', 20, 2, None, 100.0, 100.0],
+    ]
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_page_status(mock_api, jobs):
+    rows = list(page_status_command({'project_id': 1}, jobs=jobs))
+
+    assert rows[0] == ['PAGE_ID', 'NAME', 'FR-FR', 'DE-DE']
+    # page 2 has no segments and its stats in de-de are missing, page 3 is deleted
+    assert sorted(rows[1:]) == [[1, 'page-1.json', 50.0, 100.0], [2, 'page-2.json', None, None]]
+
+
+def test_page_status_closed(mock_api):
+    rows = page_status_command({'project_id': 1, 'pages': 200}, jobs=4)
+    assert next(rows)[0] == 'PAGE_ID'
+    next(rows)
+    rows.close()
+
+    # the workers stopped with the generator
+    assert not any(thread.name == 'qordoba-page-status' for thread in threading.enumerate())
+    assert FakeAPI.instance.stats_calls < 2 * 199
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from qordoba.commands.sync import sync_command, SyncAction
+
+PATTERN = 'i18n/<language_code>/<filename>.<extension>'
+
+
+FAKE_SERVER = {'pages': 4}
+
+
+@pytest.fixture
+def config(server, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    os.mkdir('sources')
+    for name in ('a.json', 'b.json'):
+        with open(os.path.join('sources', name), 'w') as f:
+            f.write('{"key": "value"}')
+    return server.config(mirror=str(tmpdir.join('meta.db')), push={'sources': [{'file': 'sources/*.json'}]},
+                         pull={'targets': [{'file': PATTERN}]})
+
+
+def counts(plan):
+    return {action: count for action, count in plan.counts().items() if count}
+
+
+def test_sync(server, config, tmpdir):
+    plan = sync_command(str(tmpdir), config, jobs=4)
+    assert counts(plan) == {SyncAction.upload: 2, SyncAction.download: 4}
+    assert plan.requests() == 2 * 2 + 4 * 3
+    assert sorted(p['name'] for p in server.project.created) == ['a.json', 'b.json']
+    assert sorted(os.listdir(os.path.join('i18n', 'fr-fr'))) == ['page-000000.json', 'page-000001.json']
+
+    # the pushed pages are completed by the fake server
+    plan = sync_command(str(tmpdir), config)
+    assert counts(plan) == {SyncAction.download: 4, SyncAction.skip: 6}
+
+    calls = sum(server.calls.values())
+    plan = sync_command(str(tmpdir), config)
+    assert counts(plan) == {SyncAction.skip: 10}
+    assert plan.rows() == [['ACTION', 'FILE', 'LANGUAGE', 'REASON']]
+    assert plan.requests() == 0
+    # project, languages and one page of the listing of every language
+    assert sum(server.calls.values()) - calls == 4
+
+    with open(os.path.join('sources', 'a.json'), 'w') as f:
+        f.write('{"key": "changed"}')
+    server.project.updated[1] = 1500000000000
+    os.remove(os.path.join('i18n', 'de-de', 'page-000001.json'))
+    plan = sync_command(str(tmpdir), config)
+    assert counts(plan) == {SyncAction.update: 1, SyncAction.download: 3, SyncAction.skip: 6}
+    assert [item.reason for item in plan.items if item.action == SyncAction.download] == [
+        'changed', 'changed', 'missing locally']
+    assert os.path.exists(os.path.join('i18n', 'de-de', 'page-000001.json'))
+
+    server.project.deleted.add(2)
+    with open(os.path.join('i18n', 'de-de', 'page-000001.json'), 'w') as f:
+        f.write('local edit')
+    plan = sync_command(str(tmpdir), config)
+    # the translations of the updated source are downloaded again
+    assert counts(plan) == {SyncAction.download: 2, SyncAction.prune: 2, SyncAction.skip: 6}
+    assert not os.path.exists(os.path.join('i18n', 'fr-fr', 'page-000001.json'))
+    # changed locally, so it is kept
+    assert os.path.exists(os.path.join('i18n', 'de-de', 'page-000001.json'))
+    assert counts(sync_command(str(tmpdir), config)) == {SyncAction.skip: 8}
+
+
+def test_sync_keeps_local_edits(server, config, tmpdir):
+    sync_command(str(tmpdir), config)
+    # the translations of the pushed pages
+    sync_command(str(tmpdir), config)
+    path = os.path.join('i18n', 'fr-fr', 'page-000000.json')
+    with open(path, 'w') as f:
+        f.write('local edit')
+
+    plan = sync_command(str(tmpdir), config)
+    assert [(item.action, item.reason) for item in plan.items if item.reason.startswith('changed locally')] == [
+        (SyncAction.skip, 'changed locally')]
+    assert counts(plan) == {SyncAction.skip: 10}
+
+    server.project.updated[1] = 1500000000000
+    plan = sync_command(str(tmpdir), config)
+    assert counts(plan) == {SyncAction.download: 1, SyncAction.conflict: 1, SyncAction.skip: 8}
+    assert ['CONFLICT', 'page-000000.json', 'fr-fr', 'changed locally and remotely'] in plan.rows()
+    with open(path) as f:
+        assert f.read() == 'local edit'
+
+    plan = sync_command(str(tmpdir), config, force=True)
+    assert counts(plan) == {SyncAction.download: 1, SyncAction.skip: 9}
+    with open(path) as f:
+        assert f.read() != 'local edit'
+    assert counts(sync_command(str(tmpdir), config)) == {SyncAction.skip: 10}
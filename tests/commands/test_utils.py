@@ -1,7 +1,8 @@
 import pytest
+from mock import MagicMock
 
 from tests.assertions import assert_deep_equal
-from qordoba.commands.utils import ask_question, ask_bool, ask_select, ask_select_multiple
+from qordoba.commands.utils import ask_question, ask_bool, ask_select, ask_select_multiple, bootstrap
 
 
 @pytest.mark.parametrize('question,answer,answer_type', [
@@ -72,3 +73,17 @@ def test_ask_select_multiple(mock_input, question_list, answers, promt, expected
     assert mock_input.call_count == 2
     mock_input.assert_called_with(promt)
 
+
+
+def test_bootstrap(language_response, project_response):
+    api = MagicMock()
+    api.get_languages.return_value = language_response
+    api.get_project.return_value = project_response
+    search = MagicMock()
+
+    project, pages = bootstrap(api, page_index=lambda p: [('ru-ru', search)])
+
+    assert project == project_response
+    api.get_languages.assert_called_once()
+    search.prefetch.assert_called_once()
+    assert list(pages.items()) == [('ru-ru', search)]
@@ -7,6 +7,7 @@ from mock import MagicMock
 
 from qordoba.languages import init_language_storage
 from qordoba.settings import load_settings
+from tests.fake_server import FakeProject, FakeQordobaServer
 
 
 @pytest.fixture
@@ -85,3 +86,30 @@ def curdir():
 @pytest.fixture
 def projectdir(curdir):
     return os.path.abspath(os.path.join(curdir, '../'))
+
+
+@pytest.fixture
+def fake_server_factory():
+    """
+    Start fake servers for a test and stop them at teardown.
+    Extra keyword arguments are passed to :class:`FakeQordobaServer`.
+    """
+    servers = []
+
+    def factory(pages=10, languages=2, completed=0.5, **options):
+        server = FakeQordobaServer(FakeProject(pages=pages, languages=languages, completed=completed), **options)
+        servers.append(server.start())
+        return server
+
+    yield factory
+
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def server(request, fake_server_factory):
+    """
+    Fake server for the project described by ``FAKE_SERVER`` in the test module, e.g. ``FAKE_SERVER = {'pages': 30}``.
+    """
+    return fake_server_factory(**getattr(request.module, 'FAKE_SERVER', {}))
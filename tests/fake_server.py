@@ -0,0 +1,531 @@
+"""
+Stand-in for the Qordoba API which serves a synthetic project over real HTTP.
+
+Unlike the MagicMock based tests, a client pointed to FakeQordobaServer goes through requests, pagination and
+the worker threads, so the server is the base for the end-to-end and performance tests.
+The project is generated lazily, so 100k pages x 100 languages cost nothing until they are requested.
+
+Run it standalone to point ``qor --api-url`` to it:
+
+    python -m tests.fake_server --pages 100000 --languages 100 --latency 0.05 --throttle-rate 0.01
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # python27
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+from qordoba.project import DEFAULT_MILESTONE_ID
+from qordoba.routes import ROUTES
+
+ACCESS_TOKEN = 'fake-token'
+CREATED = 1481661587000
+
+LANGUAGE_CODES = ('fr-fr', 'de-de', 'ja-jp', 'ru-ru', 'es-es', 'it-it', 'zh-cn', 'pt-br', 'ko-kr', 'nl-nl')
+
+_FILENAME_RE = re.compile(br'filename="([^"]*)"')
+
+
+class NotFound(Exception):
+    pass
+
+
+class FakeProject(object):
+    """
+    Synthetic project with ``pages`` source pages translated to ``languages`` target languages.
+
+    Page ``i`` has ``page_id = i + 1`` and the name ``page-<i>.json``. The first ``completed`` share of the pages
+    is completed in every language, the rest is in progress. Pages created by push are added after the
+    synthetic ones.
+    """
+
+    def __init__(self, pages=10, languages=3, project_id=1, organization_id=1, content_size=256, completed=1.0):
+        self.project_id = project_id
+        self.organization_id = organization_id
+        self.page_count = pages
+        self.content_size = content_size
+        self.completed_count = int(pages * completed)
+
+        self.source_language = {'id': 94, 'name': 'English - United States', 'code': 'en-us', 'direction': 'ltr'}
+        self.target_languages = [self._language(i) for i in range(languages)]
+        self.all_languages = [self.source_language] + self.target_languages
+        self._language_ids = {lang['id'] for lang in self.target_languages}
+
+        self.uploads = {}
+        self.created = []
+        self.updated = {}
+        self.deleted = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _language(index):
+        if index < len(LANGUAGE_CODES):
+            code = LANGUAGE_CODES[index]
+        else:
+            code = 'x{:03d}-xx'.format(index)
+        return {'id': 1000 + index, 'name': 'Language {} - Fake'.format(index), 'code': code, 'direction': 'ltr'}
+
+    def project(self):
+        return {
+            'id': self.project_id,
+            'name': 'Fake project',
+            'created_on': CREATED,
+            'source_language': self.source_language,
+            'target_languages': self.target_languages,
+        }
+
+    def check_language(self, language_id):
+        if int(language_id) not in self._language_ids:
+            raise NotFound('Language {} is not a target language of the project'.format(language_id))
+
+    def _page_name(self, page_id):
+        if page_id <= self.page_count:
+            return 'page-{:06d}.json'.format(page_id - 1)
+        return self.created[page_id - self.page_count - 1]['name']
+
+    def _exists(self, page_id):
+        return 0 < page_id <= self.page_count + len(self.created) and page_id not in self.deleted
+
+    def _is_completed(self, page_id):
+        return page_id <= self.completed_count or page_id > self.page_count
+
+    def page(self, page_id):
+        if not self._exists(page_id):
+            raise NotFound('Page {} not found'.format(page_id))
+        name = self._page_name(page_id)
+        page = {
+            'id': page_id,
+            'page_id': page_id,
+            'type': 'page',
+            'enabled': True,
+            'completed': self._is_completed(page_id),
+            'url': name,
+            'segment_count': 12,
+            'update': self.updated.get(page_id, CREATED),
+            'created_at': CREATED,
+            'preparing': False,
+            'deleted': False,
+        }
+        if page_id > self.page_count and self.created[page_id - self.page_count - 1].get('version_tag'):
+            page['version_tag'] = self.created[page_id - self.page_count - 1]['version_tag']
+        return page
+
+    def details(self, page_id):
+        page = self.page(page_id)
+        return {
+            'id': page_id,
+            'name': page['url'],
+            'url': page['url'],
+            'title': page['url'],
+            'content_type': 'JSON',
+            'content_type_code': 'JSON',
+            'status': {'id': DEFAULT_MILESTONE_ID if page['completed'] else 7952,
+                       'name': 'Completed' if page['completed'] else 'Editing'},
+            'update': page['update'],
+        }
+
+    def _page_ids(self, status=None):
+        completed_only = bool(status) and 'completed' in status and 'enabled' not in status
+        ids = range(1, (self.completed_count if completed_only else self.page_count) + 1)
+        if self.created:
+            ids = list(ids) + list(range(self.page_count + 1, self.page_count + len(self.created) + 1))
+        if self.deleted:
+            ids = [i for i in ids if i not in self.deleted]
+        return ids
+
+    def search(self, offset=0, limit=50, status=None, title=None):
+        """
+        :return: pages of one result page and the total number of results
+        """
+        with self._lock:
+            ids = self._page_ids(status)
+            if title:
+                ids = [i for i in ids if title in self._page_name(i)]
+            return [self.page(i) for i in ids[offset:offset + limit]], len(ids)
+
+    def content(self, page_id, language_id):
+        self.page(page_id)
+        header = '{{"page": {}, "language": {}, "text": "'.format(page_id, language_id)
+        return (header + 'x' * max(self.content_size - len(header) - 2, 0) + '"}').encode('utf-8')
+
+    def upload(self, file_name):
+        upload_id = '{}_{}'.format(uuid.uuid4(), file_name)
+        with self._lock:
+            self.uploads[upload_id] = file_name
+            version_tags = [p.get('version_tag') or '' for p in self.created if p['name'] == file_name]
+        return upload_id, [tag for tag in version_tags if tag]
+
+    def append(self, upload_id, file_name, version_tag=None):
+        with self._lock:
+            if upload_id not in self.uploads:
+                raise NotFound('Upload {} not found'.format(upload_id))
+            for i, page in enumerate(self.created, start=self.page_count + 1):
+                if page['name'] == file_name and page.get('version_tag') == version_tag and i not in self.deleted:
+                    raise ValueError('File {} already exist'.format(file_name))
+            self.created.append({'name': file_name, 'version_tag': version_tag})
+            return self.page_count + len(self.created)
+
+    def apply(self, upload_id, page_id):
+        with self._lock:
+            if upload_id not in self.uploads:
+                raise NotFound('Upload {} not found'.format(upload_id))
+            self.page(page_id)
+            self.updated[page_id] = int(time.time() * 1000)
+
+    def delete(self, page_id):
+        with self._lock:
+            self.page(page_id)
+            self.deleted.add(page_id)
+
+    def progress(self):
+        total = self.page_count + len(self.created) - len(self.deleted)
+        completed = len(self._page_ids(status=['completed']))
+        percent = round(100.0 * completed / total, 2) if total else 0
+        milestones = [
+            {'id': DEFAULT_MILESTONE_ID, 'name': 'Completed', 'order': 1000, 'count': completed * 12,
+             'words_count': completed * 80, 'percent': percent},
+            {'id': 7952, 'name': 'Editing', 'order': 0, 'count': (total - completed) * 12,
+             'words_count': (total - completed) * 80, 'percent': round(100 - percent, 2) if total else 0},
+        ]
+        languages = [dict(lang, segments=total * 12, words=total * 80, total=total * 12, total_words=total * 80,
+                          milestones=milestones) for lang in self.target_languages]
+        return {'languages': languages}
+
+
+def _route_pattern(route):
+    pattern = re.sub(r'\{(\w+)\}', r'(?P<\1>[^/]+)', route.template)
+    return route.method, re.compile('^/' + pattern + '$'), route.name
+
+
+class FakeQordobaServer(ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server for a FakeProject with injected faults.
+
+    :param float|tuple latency: seconds added to every response, or a (min, max) range
+    :param int bandwidth: bytes per second for request and response bodies. None is unlimited
+    :param float error_rate: share of requests answered with 500
+    :param float throttle_rate: share of requests answered with 429 and the Retry-After header
+    :param dict route_latency: latency overrides by route name, see qordoba.routes.ROUTES
+    :param set fault_routes: inject errors and throttling only for these route names
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, project=None, host='127.0.0.1', port=0, latency=0, bandwidth=None, error_rate=0.0,
+                 throttle_rate=0.0, retry_after=1, route_latency=None, fault_routes=None, seed=None,
+                 access_token=ACCESS_TOKEN):
+        HTTPServer.__init__(self, (host, port), FakeQordobaHandler)
+        self.project = project or FakeProject()
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.route_latency = route_latency or {}
+        self.fault_routes = fault_routes
+        self.access_token = access_token
+        self.routes = [_route_pattern(route) for route in ROUTES]
+
+        self.calls = Counter()
+        self.faults = Counter()
+        self.active = 0
+        self.max_active = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://{}:{}/api/'.format(host, port)
+
+    def config(self, **kwargs):
+        """
+        Settings for ProjectAPI and the commands
+        """
+        config = {
+            'api_url': self.url,
+            'access_token': self.access_token,
+            'project_id': self.project.project_id,
+            'organization_id': self.project.organization_id,
+        }
+        config.update(kwargs)
+        return config
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name='fake-qordoba-server')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle_error(self, request, client_address):
+        # the client gave up on a slow response, e.g. after its read timeout
+        if isinstance(sys.exc_info()[1], socket.error):
+            return
+        HTTPServer.handle_error(self, request, client_address)
+
+    def match(self, method, path):
+        for route_method, pattern, name in self.routes:
+            if route_method != method:
+                continue
+            match = pattern.match(path)
+            if match:
+                return name, match.groupdict()
+        return None, {}
+
+    def delay(self, route):
+        latency = self.route_latency.get(route, self.latency)
+        if isinstance(latency, (tuple, list)):
+            with self._lock:
+                latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def fault(self, route):
+        """
+        :return: None or the (status, headers, body) of an injected failure
+        """
+        if self.fault_routes is not None and route not in self.fault_routes:
+            return None
+        with self._lock:
+            value = self._random.random()
+        if value < self.throttle_rate:
+            self.faults['429'] += 1
+            return 429, {'Retry-After': str(self.retry_after)}, {'errMessage': 'Too many requests'}
+        if value < self.throttle_rate + self.error_rate:
+            self.faults['500'] += 1
+            return 500, {}, {'errMessage': 'Internal server error'}
+        return None
+
+    def request_started(self, route):
+        with self._lock:
+            self.calls[route] += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def request_finished(self):
+        with self._lock:
+            self.active -= 1
+
+
+class FakeQordobaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if body and self.server.bandwidth:
+            time.sleep(float(len(body)) / self.server.bandwidth)
+        return body
+
+    def send(self, status, body, headers=None, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+
+        chunk_size = max(int(bandwidth / 20), 1)
+        for offset in range(0, len(body), chunk_size):
+            chunk = body[offset:offset + chunk_size]
+            self.wfile.write(chunk)
+            time.sleep(float(len(chunk)) / bandwidth)
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        route, fields = self.server.match(method, url.path[len('/api'):])
+        body = self.read_body()
+
+        if route is None:
+            return self.send(404, {'errMessage': 'Unknown endpoint {} {}'.format(method, url.path)})
+        if self.headers.get('X-AUTH-TOKEN') != self.server.access_token:
+            return self.send(401, {'errMessage': 'Unauthorized'})
+
+        self.server.request_started(route)
+        try:
+            self.server.delay(route)
+            fault = self.server.fault(route)
+            if fault is not None:
+                status, headers, data = fault
+                return self.send(status, data, headers=headers)
+
+            handler = getattr(self, 'route_' + route, None)
+            if handler is None:
+                return self.send(501, {'errMessage': 'Endpoint {} is not implemented'.format(route)})
+            try:
+                handler(fields, query, body)
+            except NotFound as e:
+                self.send(404, {'errMessage': str(e)})
+            except ValueError as e:
+                self.send(400, {'errMessage': str(e)})
+        finally:
+            self.server.request_finished()
+
+    def route_languages(self, fields, query, body):
+        self.send(200, {'languages': self.server.project.all_languages})
+
+    def route_project(self, fields, query, body):
+        self.send(200, {'project': self.server.project.project()})
+
+    def route_projects(self, fields, query, body):
+        projects = [self.server.project.project()]
+        self.send(200, {'projects': projects, 'meta': {'paging': {'total_results': len(projects)}}})
+
+    def route_page_search(self, fields, query, body):
+        project = self.server.project
+        project.check_language(fields['language_id'])
+        payload = json.loads(body.decode('utf-8')) if body else {}
+        pages, total = project.search(offset=int(query.get('offset', 0)), limit=int(query.get('limit', 50)),
+                                      status=payload.get('status'), title=payload.get('title'))
+        self.send(200, {'pages': pages, 'meta': {'paging': {'total_results': total, 'total_enabled': total}}})
+
+    def route_pages(self, fields, query, body):
+        project = self.server.project
+        project.check_language(fields['language_id'])
+        pages, total = project.search(offset=int(query.get('offset', 0)), limit=int(query.get('limit', 50)))
+        files = [{'id': p['page_id'], 'title': p['url'], 'url': p['url'], 'type': 'page'} for p in pages]
+        self.send(200, {'files': files, 'meta': {'paging': {'total_results': total}}})
+
+    def route_page_details(self, fields, query, body):
+        self.server.project.check_language(fields['language_id'])
+        self.send(200, {'page': self.server.project.details(int(fields['page_id']))})
+
+    def route_page_stats(self, fields, query, body):
+        self.server.project.check_language(fields['language_id'])
+        page = self.server.project.page(int(fields['page_id']))
+        self.send(200, {'result': 'success', 'stats': page['segment_count'],
+                        'complete_segment_count': page['segment_count'] if page['completed'] else 0})
+
+    def route_report_progress(self, fields, query, body):
+        self.send(200, self.server.project.progress())
+
+    def route_export(self, fields, query, body):
+        project = self.server.project
+        project.check_language(fields['language_id'])
+        details = project.details(int(fields['page_id']))
+        token = '{}:{}'.format(fields['page_id'], fields['language_id'])
+        self.send(200, {'token': token, 'filename': details['name']})
+
+    def route_file_download(self, fields, query, body):
+        try:
+            page_id, language_id = (int(v) for v in query['token'].split(':'))
+        except (KeyError, ValueError):
+            raise NotFound('Unknown download token')
+        self.send(200, self.server.project.content(page_id, language_id), content_type='application/octet-stream')
+
+    def route_upload_anytype_file(self, fields, query, body):
+        match = _FILENAME_RE.search(body)
+        if not match:
+            raise ValueError('File is missing')
+        file_name = match.group(1).decode('utf-8')
+        upload_id, version_tags = self.server.project.upload(file_name)
+        self.send(200, {'result': 'success', 'upload_id': upload_id, 'file_name': file_name,
+                        'version_tags': version_tags, 'columns': None})
+
+    def route_append_files(self, fields, query, body):
+        for item in json.loads(body.decode('utf-8')):
+            self.server.project.append(item['id'], item['file_name'], version_tag=item.get('version_tag'))
+        self.send(200, {'result': 'success'})
+
+    def route_update_upload_file(self, fields, query, body):
+        project = self.server.project
+        page = project.page(int(fields['file_id']))
+        upload_id, _ = project.upload(page['url'])
+        self.send(200, {'result': 'success', 'id': upload_id})
+
+    def route_apply_upload_file(self, fields, query, body):
+        payload = json.loads(body.decode('utf-8'))
+        self.server.project.apply(payload['new_file_id'], int(fields['file_id']))
+        self.send(200, {'result': 'success'})
+
+    def route_delete_page(self, fields, query, body):
+        self.server.project.delete(int(fields['page_id']))
+        self.send(200, {'result': 'success'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic Qordoba project.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--languages', type=int, default=3)
+    parser.add_argument('--content-size', type=int, default=256)
+    parser.add_argument('--completed', type=float, default=1.0, help='Share of completed pages.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response.')
+    parser.add_argument('--bandwidth', type=int, default=None, help='Bytes per second.')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    project = FakeProject(pages=args.pages, languages=args.languages, content_size=args.content_size,
+                          completed=args.completed)
+    server = FakeQordobaServer(project, host=args.host, port=args.port, latency=args.latency,
+                               bandwidth=args.bandwidth, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed)
+    print('Serving {} pages x {} languages at {}'.format(args.pages, args.languages, server.url))
+    print('Use: qor <command> --api-url {} --access-token {} --project-id {} --organization-id {}'.format(
+        server.url, server.access_token, project.project_id, project.organization_id))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+from qordoba.cassette import enable_recording, enable_replay, disable_cassette, CassetteError, request_key
+from qordoba.commands.pull import pull_command
+from qordoba.project import ProjectAPI
+from tests.fake_server import FakeProject, FakeQordobaServer
+
+PULL_PATTERN = 'i18n/<language_code>/<filename>.<extension>'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# lists the projects and the pages of a language, both urls with a query of several parameters
+CHILD_SCRIPT = '''
+import json, sys
+from qordoba.cassette import enable_recording, enable_replay
+from qordoba.project import ProjectAPI
+mode, path, config, language_id = sys.argv[1], sys.argv[2], json.loads(sys.argv[3]), int(sys.argv[4])
+if mode == 'record':
+    enable_recording(path)
+else:
+    enable_replay(path, scale=0)
+api = ProjectAPI(config)
+print(json.dumps([list(api.get_projects()), list(api.get_pages(language_id))], sort_keys=True))
+'''
+
+
+@pytest.fixture
+def workdir(tmpdir):
+    curdir = os.getcwd()
+    os.chdir(str(tmpdir))
+    yield str(tmpdir)
+    os.chdir(curdir)
+    disable_cassette()
+
+
+def read_files(root):
+    result = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            with open(os.path.join(dirpath, name), 'rb') as f:
+                result[os.path.relpath(os.path.join(dirpath, name), root)] = f.read()
+    return result
+
+
+@pytest.mark.parametrize('name', ['pull.cassette', 'pull.cassette.gz'])
+def test_record_and_replay_pull(workdir, name):
+    path = os.path.join(workdir, name)
+    with FakeQordobaServer(FakeProject(pages=20, languages=2), latency=0.01) as server:
+        config = server.config(pull={'targets': [{'file': PULL_PATTERN}]})
+        recorder = enable_recording(path)
+        recorder.set_settings(config)
+        pull_command(workdir, config, jobs=4)
+        disable_cassette()
+        requests_sent = sum(server.calls.values())
+
+    recorded = read_files('i18n')
+    assert len(recorded) == 40
+
+    opener = gzip.open if name.endswith('.gz') else io.open
+    with opener(path, 'rb') as f:
+        content = f.read()
+    assert server.access_token.encode('utf-8') not in content
+    # identical responses, e.g. of the page details in both languages, are saved once
+    assert content.count(b'"sha1"') < requests_sent
+
+    os.rename('i18n', 'recorded')
+    player = enable_replay(path, scale=0)
+    assert player.settings == {'api_url': server.url, 'project_id': 1, 'organization_id': 1}
+    # the server is stopped, every response comes from the cassette
+    pull_command(workdir, dict(config, access_token='replay'), jobs=4)
+
+    assert read_files('i18n') == recorded
+
+
+def run_child(mode, path, config, language_id, hash_seed):
+    env = dict(os.environ, PYTHONHASHSEED=str(hash_seed), PYTHONPATH=ROOT)
+    output = subprocess.check_output([sys.executable, '-c', CHILD_SCRIPT, mode, path, json.dumps(config),
+                                      str(language_id)], env=env)
+    return json.loads(output.decode('utf-8'))
+
+
+def test_replay_in_other_process(workdir):
+    path = os.path.join(workdir, 'pages.cassette')
+    with FakeQordobaServer(FakeProject(pages=3)) as server:
+        config = server.config()
+        language_id = server.project.target_languages[0]['id']
+        recorded = run_child('record', path, config, language_id, hash_seed=1)
+
+    # the server is stopped and the order of dicts differs with the hash seed on python35
+    assert run_child('replay', path, config, language_id, hash_seed=2) == recorded
+
+
+def test_replay_timings(workdir):
+    path = os.path.join(workdir, 'project.cassette')
+    with FakeQordobaServer(FakeProject(), latency=0.1) as server:
+        enable_recording(path)
+        ProjectAPI(server.config()).get_project()
+        disable_cassette()
+
+    api = ProjectAPI(server.config())
+    for scale, low, high in ((1.0, 0.1, 1.0), (0.0, 0.0, 0.05)):
+        enable_replay(path, scale=scale)
+        started = time.time()
+        assert api.get_project()['id'] == 1
+        assert low <= time.time() - started < high
+
+
+def test_replay_not_recorded(workdir):
+    path = os.path.join(workdir, 'project.cassette')
+    with FakeQordobaServer(FakeProject()) as server:
+        enable_recording(path)
+        ProjectAPI(server.config()).get_project()
+        disable_cassette()
+
+    enable_replay(path, scale=0)
+    with pytest.raises(CassetteError):
+        ProjectAPI(server.config()).get_languages()
+
+
+def test_record_connection_error(workdir):
+    path = os.path.join(workdir, 'error.cassette')
+    config = {'api_url': 'http://127.0.0.1:1/api/', 'access_token': 'secret', 'project_id': 1}
+    enable_recording(path)
+    with pytest.raises(requests.ConnectionError):
+        ProjectAPI(config).get_project()
+    disable_cassette()
+
+    enable_replay(path, scale=0)
+    with pytest.raises(requests.ConnectionError):
+        ProjectAPI(config).get_project()
+
+
+def test_request_key():
+    assert request_key('post', 'http://a/b', json={'b': 1, 'a': [2]}) == 'POST http://a/b {"a":[2],"b":1}'
+    assert request_key('POST', 'http://a/b', files={'file': ('a.json', io.BytesIO(b'1'), 'text/plain')},
+                       data={'file_names': '[]'}) == 'POST http://a/b {"file_names":"[]"} file=a.json'
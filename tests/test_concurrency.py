@@ -0,0 +1,164 @@
+import argparse
+import threading
+
+import pytest
+
+from qordoba.concurrency import AIMDLimiter, JobsType, RateLimiter, parse_jobs
+from qordoba.metrics import enable_metrics, disable_metrics
+from qordoba.progress import enable_progress, disable_progress
+from qordoba.tracing import Span
+from qordoba.utils import PositiveFloatType
+from qordoba.workers import WorkerPool
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_span(status=200, duration=0.01, name='/projects/<project_id>'):
+    span = Span(name, 'GET')
+    span.status = status
+    span.duration = duration
+    return span
+
+
+def saturate(limiter):
+    limiter.active = limiter.limit
+
+
+def test_additive_increase():
+    limiter = AIMDLimiter(initial=2, max_limit=4)
+    for _ in range(3):
+        saturate(limiter)
+        limiter.observe_span(make_span())
+    assert limiter.limit == 3
+
+    for _ in range(100):
+        saturate(limiter)
+        limiter.observe_span(make_span())
+    assert limiter.limit == 4
+
+
+def test_no_increase_when_idle():
+    limiter = AIMDLimiter(initial=2)
+    for _ in range(10):
+        limiter.observe_span(make_span())
+    assert limiter.limit == 2
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_multiplicative_decrease(status):
+    clock = Clock()
+    limiter = AIMDLimiter(initial=16, cooldown=1.0, clock=clock)
+
+    limiter.observe_span(make_span(status=status))
+    assert limiter.limit == 8
+    # the same overload is counted once
+    limiter.observe_span(make_span(status=status))
+    assert limiter.limit == 8
+
+    clock.now = 1.5
+    limiter.observe_span(make_span(status=status))
+    assert limiter.limit == 4
+    assert limiter.decreases == 2
+
+
+def test_retried_request_decreases():
+    limiter = AIMDLimiter(initial=8)
+    span = make_span()
+    span.retries = 1
+    limiter.observe_span(span)
+    assert limiter.limit == 4
+
+
+def test_latency_spike():
+    limiter = AIMDLimiter(initial=8, min_samples=5, latency_factor=3.0)
+    for _ in range(5):
+        limiter.observe_span(make_span(duration=0.1))
+    limiter.observe_span(make_span(duration=0.2))
+    assert limiter.limit == 8
+    limiter.observe_span(make_span(duration=0.5, name='/other'))
+    assert limiter.limit == 8
+
+    limiter.observe_span(make_span(duration=0.5))
+    assert limiter.limit == 4
+
+
+def test_limit_gauge():
+    registry = enable_metrics()
+    try:
+        limiter = AIMDLimiter(initial=6)
+        limiter.observe_span(make_span(status=500))
+    finally:
+        disable_metrics()
+    assert ('gauge', 'concurrency_limit', {}, 3) in [(k, n, dict(l), v) for k, n, l, v in registry.samples()]
+
+
+def test_parse_jobs():
+    assert parse_jobs(4) == (4, False)
+    assert parse_jobs('auto') == (32, True)
+    assert parse_jobs('auto:8') == (8, True)
+    assert JobsType()('3') == 3
+    assert JobsType()('auto:8') == 'auto:8'
+    with pytest.raises(argparse.ArgumentTypeError):
+        JobsType()('auto:0')
+    with pytest.raises(argparse.ArgumentTypeError):
+        JobsType()('many')
+
+
+def test_pool_follows_limit():
+    pool = WorkerPool('auto:8')
+    limiter = pool.limiter
+    assert limiter.limit == 4
+
+    active = []
+    max_active = []
+    lock = threading.Lock()
+
+    def func(unit):
+        with lock:
+            active.append(unit)
+            max_active.append(len(active))
+        if unit == 10:
+            limiter.observe_span(make_span(status=429))
+        with lock:
+            active.remove(unit)
+
+    progress = enable_progress(interval=0)
+    try:
+        assert pool.run(func, range(40)) == 40
+        assert 'limit: 2/8' in progress.render()
+    finally:
+        disable_progress()
+    assert max(max_active) <= 4
+    assert limiter.active == 0
+
+
+def test_rate_limiter():
+    now = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+
+    limiter = RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3):
+        limiter.wait()
+    assert sleeps == [0.25, 0.5]
+
+    # an idle limiter does not save up calls for a burst
+    now[0] = 200.0
+    limiter.wait()
+    limiter.wait()
+    assert sleeps == [0.25, 0.5, 0.25]
+
+
+@pytest.mark.parametrize('rate', ['0', '-2', 'nan', 'fast'])
+def test_rate_argument(rate):
+    assert PositiveFloatType()('0.5') == 0.5
+    with pytest.raises(argparse.ArgumentTypeError):
+        PositiveFloatType()(rate)
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from qordoba.commands.delete import delete_command
+from qordoba.commands.pull import pull_command
+from qordoba.commands.push import push_command
+from qordoba.dryrun import DryRun, DryRunError, DRY_RUN_SAMPLES, enable_dry_run, disable_dry_run
+from qordoba.journal import Journal, file_sha256
+from qordoba.project import ProjectAPI
+from qordoba.tracing import Span
+
+
+FAKE_SERVER = {'pages': 20}
+
+
+@pytest.fixture
+def dry_run():
+    yield enable_dry_run(jobs=2)
+    disable_dry_run()
+
+
+def test_mutating_request_is_blocked(server, dry_run):
+    api = ProjectAPI(server.config())
+    assert api.get_project()['id'] == server.project.project_id
+
+    with pytest.raises(DryRunError):
+        api.delete_page(1)
+    assert not server.project.deleted
+    assert 'delete_page' not in server.calls
+
+
+def test_pull_dry_run(server, dry_run, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    config = server.config(pull={'targets': [{'file': 'i18n/<language_code>/<filename>.<extension>'}]})
+
+    pull_command(str(tmpdir), config, jobs=2)
+
+    assert not os.listdir(str(tmpdir))
+    assert dry_run.files == 20
+    assert server.calls['file_download'] == DRY_RUN_SAMPLES
+    assert dry_run.planned['file_download'] == 20
+    assert dry_run.estimated_bytes_in() == 20 * server.project.content_size
+    assert dry_run.duration() > 0
+    assert '20 files' in dry_run.summary()
+
+
+def test_pull_dry_run_skips(server, dry_run, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    config = server.config(pull={'targets': [{'file': 'i18n/<language_code>/<filename>.<extension>'}]})
+    for code in ('fr-fr', 'de-de'):
+        os.makedirs(os.path.join('i18n', code))
+        with open(os.path.join('i18n', code, 'page-000000.json'), 'w') as f:
+            f.write('{}')
+    # the de-de translation was pulled by the interrupted run
+    target = os.path.join('i18n', 'de-de', 'page-000000.json')
+    Journal('pull.journal', 'pull', 1).record('pull:1:de-de', target=target, sha256=file_sha256(target))
+    journal = Journal('pull.journal', 'pull', 1, resume=True)
+
+    pull_command(str(tmpdir), config, update_action='skip', jobs=2, journal=journal)
+
+    assert dry_run.files == 18
+    assert dry_run.planned['file_download'] == 18
+    assert dry_run.planned['page_details'] == 19
+
+
+def test_push_dry_run(server, dry_run, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    os.mkdir('sources')
+    for name in ('a.json', 'b.json'):
+        with open(os.path.join('sources', name), 'w') as f:
+            f.write('{"key": "value"}')
+    config = server.config(push={'sources': [{'file': 'sources/*.json'}]})
+
+    push_command(str(tmpdir), config, update=True)
+
+    assert not server.project.created
+    assert dry_run.files == 2
+    assert dry_run.bytes_out == 32
+    assert dry_run.planned['upload_anytype_file'] == 2
+    assert dry_run.planned['append_files'] == 2
+    assert dry_run.sent['page_search'] == 2
+
+
+def test_delete_dry_run(server, dry_run):
+    delete_command('.', server.config(), '3', force=True)
+
+    assert not server.project.deleted
+    assert dry_run.planned['delete_page'] == 1
+
+
+def test_delete_dry_run_unknown_id(server, dry_run):
+    result = delete_command('.', server.config(), ['3', '999'], force=True)
+
+    assert result.missing == ['999']
+    assert dry_run.planned['delete_page'] == 1
+
+
+def span(name, duration):
+    span = Span(name, 'GET')
+    span.duration = duration
+    return span
+
+
+def test_duration_estimate():
+    dry_run = DryRun(jobs=2)
+    dry_run.observe_span(span('projects/{project_id}/languages/{language_id}/pages/{page_id}', 0.2))
+    dry_run.observe_span(span('file/download', 1.0))
+    dry_run.add_sample(1000)
+    dry_run.add_requests('page_details', 'file_download', 'page_details', 'file_download')
+    dry_run.add_requests('delete_page')
+    dry_run.add_file(bytes_out=500)
+
+    # 2 x 0.2 + 2 x 1.0 + 0.6 mean latency + 500 bytes at 1000 bytes per second, on two threads
+    assert dry_run.duration() == pytest.approx((0.4 + 2.0 + 0.6 + 0.5) / 2)
+    assert dry_run.rows()[0] == ['ENDPOINT', 'REQUESTS', 'SENT BY DRY RUN', 'MEAN LATENCY']
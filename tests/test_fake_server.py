@@ -0,0 +1,176 @@
+import os
+import time
+
+import pytest
+import requests
+
+from qordoba.commands.ls import ls_command
+from qordoba.commands.pull import pull_command
+from qordoba.commands.push import push_command
+from qordoba.commands.status import status_command, page_status_command
+from qordoba.project import MAX_RETRIES, ProjectAPI, QordobaResponseError, FileAlreadyExistResponse
+from tests.fake_server import FakeProject
+
+
+FAKE_SERVER = {'pages': 120, 'seed': 1}
+
+
+@pytest.fixture
+def workdir(tmpdir):
+    curdir = os.getcwd()
+    os.chdir(str(tmpdir))
+    yield str(tmpdir)
+    os.chdir(curdir)
+
+
+def test_paginated_search(server):
+    api = ProjectAPI(server.config())
+    language_id = server.project.target_languages[0]['id']
+
+    pages = api.page_search(language_id, status=['completed'])
+    assert len(list(pages)) == 60
+    assert len(pages) == 60
+    assert len(list(api.page_search(language_id, status=['enabled']))) == 120
+    assert server.calls['page_search'] == 2 + 3
+
+
+def test_pull_end_to_end(server, workdir):
+    config = server.config(pull={'targets': [{'file': 'i18n/<language_code>/<filename>.<extension>'}]})
+
+    pull_command(workdir, config, jobs=4)
+
+    for code in ('fr-fr', 'de-de'):
+        assert len(os.listdir(os.path.join(workdir, 'i18n', code))) == 60
+    assert server.calls['file_download'] == 120
+    assert server.max_active > 1
+
+
+def test_push_end_to_end(server, workdir):
+    os.mkdir('sources')
+    for name in ('a.json', 'b.json'):
+        with open(os.path.join('sources', name), 'w') as f:
+            f.write('{"key": "value"}')
+    config = server.config(push={'sources': [{'file': 'sources/*.json'}]})
+
+    push_command(workdir, config)
+    assert sorted(p['name'] for p in server.project.created) == ['a.json', 'b.json']
+
+    with pytest.raises(FileAlreadyExistResponse):
+        push_command(workdir, config)
+
+    push_command(workdir, config, update=True)
+    assert len(server.project.updated) == 2
+
+
+def test_status(server):
+    rows = list(status_command(server.config()))
+
+    assert rows[0] == ['LOCALE', '#WORDS', '#SEGMENTS', 'EDITING', 'COMPLETED']
+    assert rows[1] == ['fr-fr', 9600, 1440, '50.0%', '50.0%']
+    assert len(rows) == 3
+
+
+def test_status_pages(server):
+    rows = list(page_status_command(server.config(), jobs=8))
+
+    assert rows[0] == ['PAGE_ID', 'NAME', 'FR-FR', 'DE-DE']
+    assert sorted(row[0] for row in rows[1:]) == list(range(1, 121))
+    assert sum(1 for row in rows[1:] if row[2:] == [100.0, 100.0]) == 60
+    assert sum(1 for row in rows[1:] if row[2:] == [0.0, 0.0]) == 60
+    assert server.calls['page_stats'] == 240
+
+
+def test_status_pages_memo(server, monkeypatch):
+    apis = []
+
+    class API(ProjectAPI):
+        def __init__(self, *args, **kwargs):
+            super(API, self).__init__(*args, **kwargs)
+            apis.append(self)
+
+    monkeypatch.setattr('qordoba.commands.status.ProjectAPI', API)
+    assert len(list(page_status_command(server.config(), jobs=4))) == 121
+
+    # no stats are kept once their rows are written
+    assert len(apis[0]._memo) == 0
+
+
+def test_ls_filters(server):
+    config = server.config()
+
+    assert len(list(ls_command(config))) == 120
+    assert server.calls['page_search'] == 3
+
+    completed = list(ls_command(config, status=['completed']))
+    assert len(completed) == 60
+    assert set(row.status for row in completed) == {'Completed'}
+    assert server.calls['page_search'] == 3 + 2
+
+    assert [row.name for row in ls_command(config, name='page-00001')] == [
+        'page-{:06d}.json'.format(i) for i in range(10, 20)]
+    assert [row.id for row in ls_command(config, limit=7)] == list(range(1, 8))
+    assert server.calls['page_search'] == 3 + 2 + 1 + 1
+
+
+def test_faults(server):
+    api = ProjectAPI(server.config())
+    server.throttle_rate = 1.0
+    server.retry_after = 0
+    with pytest.raises(QordobaResponseError) as e:
+        api.get_project()
+    assert 'Too many requests' in str(e.value)
+
+    server.throttle_rate = 0.0
+    server.error_rate = 1.0
+    server.fault_routes = {'languages'}
+    assert api.get_project()['id'] == server.project.project_id
+    with pytest.raises(QordobaResponseError):
+        api.get_languages()
+    assert server.faults == {'429': MAX_RETRIES + 1, '500': 1}
+
+
+def test_pull_adaptive_jobs_throttled(server, workdir):
+    server.throttle_rate = 0.2
+    server.retry_after = 0
+    config = server.config(pull={'targets': [{'file': 'i18n/<language_code>/<filename>.<extension>'}]})
+
+    pull_command(workdir, config, jobs='auto:8')
+
+    for code in ('fr-fr', 'de-de'):
+        assert len(os.listdir(os.path.join(workdir, 'i18n', code))) == 60
+    assert server.faults['429'] > 0
+    assert server.max_active <= 8
+
+
+def test_latency_and_bandwidth(server):
+    api = ProjectAPI(server.config())
+    server.route_latency = {'project': 0.1}
+    started = time.time()
+    api.get_project()
+    assert time.time() - started >= 0.1
+
+    server.bandwidth = 10000
+    server.project.content_size = 2000
+    started = time.time()
+    content = api.download_file(1, server.project.target_languages[0]['id']).content
+    assert len(content) == 2000
+    # the last chunk is received before the server sleeps after it
+    assert time.time() - started >= 0.15
+
+
+def test_large_project_is_lazy():
+    project = FakeProject(pages=100000, languages=100)
+    pages, total = project.search(offset=99950, limit=50, status=['completed'])
+
+    assert total == 100000
+    assert pages[-1]['url'] == 'page-099999.json'
+    assert len(project.target_languages) == 100
+
+
+def test_read_timeout(server):
+    server.route_latency = {'project': 0.5}
+    api = ProjectAPI(server.config(timeouts={'metadata': 0.1}))
+
+    with pytest.raises(requests.Timeout):
+        api.get_project()
+    assert api.get_languages()
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from qordoba.hedging import HedgePolicy, enable_hedging, disable_hedging
+from qordoba.project import ProjectAPI
+from qordoba.routes import ROUTES
+from tests.fake_server import FakeProject, FakeQordobaServer
+
+
+def slow_first_call(delay):
+    calls = []
+    lock = threading.Lock()
+
+    def func(value):
+        with lock:
+            calls.append(value)
+            first = len(calls) == 1
+        if first:
+            time.sleep(delay)
+        return value, first
+
+    return func, calls
+
+
+def test_hedge_wins():
+    policy = HedgePolicy(budget=1.0, max_delay=0.05, min_samples=1)
+    func, calls = slow_first_call(1.0)
+
+    started = time.time()
+    (value, first), hedged = policy.send('page_details', func, 'a')
+
+    assert time.time() - started < 0.5
+    assert hedged and not first
+    assert len(calls) == 2
+    assert (policy.requests, policy.hedged, policy.hedge_wins) == (1, 1, 1)
+    policy.shutdown()
+
+
+def test_fast_request_is_not_hedged():
+    policy = HedgePolicy(budget=1.0, max_delay=0.5)
+    func, calls = slow_first_call(0)
+
+    assert policy.send('page_details', func, 'a') == (('a', True), False)
+    assert len(calls) == 1
+    policy.shutdown()
+
+
+def test_budget():
+    policy = HedgePolicy(budget=0.25, max_delay=0.01)
+
+    def slow(value):
+        time.sleep(0.03)
+        return value
+
+    results = [policy.send('page_details', slow, i) for i in range(8)]
+
+    assert [r[0] for r in results] == list(range(8))
+    assert policy.hedged == 2
+    policy.shutdown()
+
+
+def test_failed_hedge_is_ignored():
+    policy = HedgePolicy(budget=1.0, max_delay=0.01)
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 2:
+            raise ValueError('hedge failed')
+        time.sleep(0.05)
+        return 'primary'
+
+    assert policy.send('page_details', func) == ('primary', True)
+    policy.shutdown()
+
+
+def test_adaptive_delay():
+    policy = HedgePolicy(percentile=90, min_delay=0.01, max_delay=1.0, min_samples=10)
+    assert policy.delay('pages') == 1.0
+
+    for i in range(1, 11):
+        policy.observe('pages', i / 100.0)
+    assert policy.delay('pages') == 0.09
+    assert policy.delay('project') == 1.0
+    policy.shutdown()
+
+
+def test_hedgeable_routes():
+    hedgeable = {route.name for route in ROUTES if route.hedgeable}
+    assert 'page_search' in hedgeable
+    assert 'page_details' in hedgeable
+    assert not hedgeable & {'file_download', 'upload_anytype_file', 'apply_upload_file', 'delete_page',
+                            'append_files'}
+
+
+def test_api_hedging():
+    with FakeQordobaServer(FakeProject(), route_latency={'page_details': 0.3}) as server:
+        policy = enable_hedging(budget=1.0, max_delay=0.05)
+        try:
+            api = ProjectAPI(server.config())
+            api.get_project()
+            assert policy.hedged == 0
+
+            assert api.get_page_details(server.project.target_languages[0]['id'], 1)['id'] == 1
+            assert policy.hedged == 1
+            assert server.calls['page_details'] == 2
+        finally:
+            disable_hedging()
@@ -0,0 +1,78 @@
+import io
+import os
+
+import pytest
+
+from qordoba.journal import Journal, JournalError, temp_file, cleanup_temp_files, file_sha256, is_file_unchanged
+
+
+def test_journal_resume(tmpdir):
+    path = str(tmpdir.join('pull.journal'))
+    journal = Journal(path, 'pull', 1)
+    journal.record('pull:1:fr-fr', target='fr.json', sha256='abc')
+    journal.record('pull:2:fr-fr', target='fr2.json', sha256='def')
+
+    # a crash in the middle of the write leaves an incomplete last line
+    with io.open(path, 'a', encoding='utf-8') as f:
+        f.write(u'{"key": "pull:3:fr-fr", "tar')
+
+    resumed = Journal(path, 'pull', 1, resume=True)
+    assert resumed.get('pull:1:fr-fr')['target'] == 'fr.json'
+    assert resumed.get('pull:2:fr-fr')['sha256'] == 'def'
+    assert resumed.get('pull:3:fr-fr') is None
+
+    resumed.remove()
+    assert not os.path.exists(path)
+
+
+def test_journal_without_resume_starts_over(tmpdir):
+    path = str(tmpdir.join('pull.journal'))
+    Journal(path, 'pull', 1).record('pull:1:fr-fr', target='fr.json', sha256='abc')
+
+    Journal(path, 'pull', 1)
+    assert Journal(path, 'pull', 1, resume=True).entries == {}
+
+
+def test_journal_of_another_run(tmpdir):
+    path = str(tmpdir.join('pull.journal'))
+    Journal(path, 'pull', 1)
+
+    with pytest.raises(JournalError):
+        Journal(path, 'push', 1, resume=True)
+    with pytest.raises(JournalError):
+        Journal(path, 'pull', 2, resume=True)
+
+
+def test_temp_file(tmpdir):
+    path = str(tmpdir.join('fr.json'))
+    with temp_file(path) as tmp_path:
+        assert tmp_path == path + '.part'
+        with open(tmp_path, 'w') as f:
+            f.write('done')
+
+    assert not os.path.exists(path + '.part')
+    assert is_file_unchanged(path, file_sha256(path))
+
+    with pytest.raises(IOError):
+        with temp_file(path) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                f.write('partial')
+            raise IOError('connection lost')
+
+    assert not os.path.exists(path + '.part')
+    with open(path) as f:
+        assert f.read() == 'done'
+
+
+def test_cleanup_temp_files(tmpdir):
+    path = str(tmpdir.join('fr.json'))
+    with pytest.raises(OSError):
+        with temp_file(path) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                f.write('partial')
+            # interrupted by a signal
+            assert cleanup_temp_files() == [tmp_path]
+            assert not os.path.exists(tmp_path)
+
+    assert not os.path.exists(path)
+    assert cleanup_temp_files() == []
@@ -0,0 +1,136 @@
+import pytest
+
+from qordoba.memo import TTLMemo, memoized, invalidates
+from qordoba.project import ProjectAPI
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class API(object):
+    def __init__(self, ttl=60, clock=None):
+        self._memo = TTLMemo(ttl=ttl, clock=clock or Clock())
+        self.calls = []
+
+    @memoized('page:{page_id}')
+    def details(self, language_id, page_id):
+        self.calls.append((language_id, page_id))
+        return {'page_id': page_id}
+
+    @memoized('pages')
+    def search(self, status=None):
+        self.calls.append(status)
+        return []
+
+    @invalidates('pages', 'page:{page_id}')
+    def delete(self, page_id):
+        pass
+
+
+def test_memoized_ttl():
+    clock = Clock()
+    api = API(ttl=10, clock=clock)
+    assert api.details(1, page_id=5) is api.details(1, page_id=5)
+    api.details(2, 5)
+    assert api.calls == [(1, 5), (2, 5)]
+    assert api._memo.hits == 1
+
+    clock.now = 11
+    api.details(1, page_id=5)
+    assert len(api.calls) == 3
+
+
+def test_arguments_by_name():
+    api = API()
+    api.details(1, page_id=5)
+    api.details(1, 5)
+    api.details(page_id=5, language_id=1)
+    api.search()
+    api.search(None)
+    assert api.calls == [(1, 5), None]
+
+
+def test_unhashable_arguments():
+    api = API()
+    api.search(status=['enabled'])
+    api.search(status=['enabled'])
+    api.search(status=['completed'])
+    assert api.calls == [['enabled'], ['completed']]
+
+
+def test_invalidates():
+    api = API()
+    api.details(1, 5)
+    api.details(1, 6)
+    api.search()
+    api.delete(5)
+    api.details(1, 5)
+    api.details(1, 6)
+    api.search()
+    assert api.calls == [(1, 5), (1, 6), None, (1, 5), None]
+
+
+def test_read_during_write_is_not_kept():
+    memo = TTLMemo()
+    generation = memo.generation
+    memo.invalidate('pages')
+    memo.set('key', 'stale', tags=['pages'], generation=generation)
+    assert memo.get('key') == (False, None)
+
+
+def test_eviction():
+    clock = Clock()
+    memo = TTLMemo(ttl=10, clock=clock, max_size=3)
+    for key in range(5):
+        memo.set(key, key, tags=['pages', 'page:{}'.format(key)])
+    # the oldest entries were evicted
+    assert len(memo) == 3
+    assert memo.get(0) == (False, None)
+    assert memo.get(4) == (True, 4)
+
+    clock.now = 11
+    assert memo.get(3) == (False, None)
+    assert len(memo) == 2
+    memo.invalidate('page:4')
+    assert len(memo) == 1
+    memo.invalidate('pages')
+    assert len(memo) == 0
+    assert not memo._tags
+
+
+def test_disabled():
+    api = API(ttl=0)
+    api.search()
+    api.search()
+    assert len(api.calls) == 2
+
+
+FAKE_SERVER = {'pages': 3, 'languages': 1, 'completed': 1.0}
+
+
+def test_project_api(server):
+    api = ProjectAPI(server.config())
+    language_id = server.project.target_languages[0]['id']
+
+    for _ in range(3):
+        api.get_project()
+        assert len(list(api.page_search(language_id))) == 3
+    assert server.calls['project'] == 1
+    assert server.calls['page_search'] == 1
+
+    upload = api.upload_anytype_file(b'{}', 'new.json', 'JSON')
+    api.append_file(upload['upload_id'], 'new.json')
+    assert len(list(api.page_search(language_id))) == 4
+    assert server.calls['page_search'] == 2
+
+    api.get_page_details(language_id, 1)
+    api.get_page_details(language_id, 2)
+    api.delete_page(2)
+    api.get_page_details(language_id, 1)
+    assert server.calls['page_details'] == 2
+    assert len(list(api.page_search(language_id))) == 3
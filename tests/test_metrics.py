@@ -0,0 +1,86 @@
+import argparse
+import os
+import socket
+import tempfile
+
+import pytest
+
+from qordoba.metrics import Metrics, StatsdSink, format_prometheus, write_prometheus_textfile, \
+    parse_statsd_address, StatsdAddressType, enable_metrics, disable_metrics, inc
+from qordoba.stages import stage, Stage
+from qordoba.tracing import Span
+
+
+@pytest.fixture
+def metrics():
+    yield enable_metrics(labels={'command': 'pull'})
+    disable_metrics()
+
+
+def test_prometheus_format(metrics):
+    span = Span('projects/{project_id}', 'GET')
+    span.status = 200
+    span.duration = 0.5
+    span.bytes_in = 100
+    metrics.observe_span(span)
+    inc('files_total', action='pulled')
+    inc('files_total', action='pulled')
+    with stage(Stage.download):
+        pass
+
+    text = format_prometheus(metrics)
+
+    assert '# TYPE qordoba_requests_total counter' in text
+    assert 'qordoba_requests_total{command="pull",endpoint="projects/{project_id}",method="GET",status="200"} 1' \
+        in text
+    assert 'qordoba_bytes_total{command="pull",direction="in"} 100' in text
+    assert 'qordoba_files_total{action="pulled",command="pull"} 2' in text
+    assert 'qordoba_request_duration_seconds_sum{' in text
+    assert 'qordoba_stage_duration_seconds_count{command="pull",stage="download"} 1' in text
+
+
+def test_prometheus_textfile(metrics):
+    metrics.set('run_success', 1)
+    path = os.path.join(tempfile.mkdtemp(), 'qor.prom')
+
+    write_prometheus_textfile(metrics, path)
+
+    with open(path) as f:
+        assert 'qordoba_run_success{command="pull"} 1' in f.read()
+    assert os.listdir(os.path.dirname(path)) == ['qor.prom']
+
+
+def test_statsd_sink():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(2)
+    host, port = server.getsockname()
+
+    metrics = Metrics(labels={'command': 'push'}, sinks=[StatsdSink(*parse_statsd_address('{}:{}'.format(host, port)))])
+    metrics.inc('files_total', action='pushed')
+    metrics.observe('stage_duration_seconds', 0.25, stage='upload')
+    metrics.set('concurrency_limit', 4)
+    metrics.flush()
+
+    packet = server.recv(4096).decode('utf-8')
+    server.close()
+    assert packet.split('\n') == [
+        'qordoba.files_total:1|c|#action:pushed,command:push',
+        'qordoba.stage_duration_seconds:250|ms|#command:push,stage:upload',
+        'qordoba.concurrency_limit:4|g|#command:push',
+    ]
+
+
+def test_inc_disabled():
+    disable_metrics()
+    inc('files_total', action='pulled')
+
+
+def test_parse_statsd_address():
+    assert parse_statsd_address('localhost:9125') == ('localhost', 9125)
+    assert parse_statsd_address(':9125') == ('127.0.0.1', 9125)
+    assert parse_statsd_address('localhost') == ('localhost', 8125)
+    assert StatsdAddressType()('statsd.local:9125') == ('statsd.local', 9125)
+    for value in ('localhost:port', 'localhost:0', 'localhost:70000'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            StatsdAddressType()(value)
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from qordoba.commands.ls import ls_command
+from qordoba.commands.pull import pull_command
+from qordoba.commands.status import status_command, page_status_command
+from qordoba.commands.sync_meta import sync_meta_command
+from qordoba.mirror import Mirror, MirrorAPI, MirrorError
+from qordoba.project import PageStatus
+
+
+FAKE_SERVER = {'pages': 30}
+
+
+@pytest.fixture
+def config(server, tmpdir):
+    return server.config(mirror=str(tmpdir.join('meta.db')))
+
+
+def test_sync_meta(server, config):
+    result = sync_meta_command(config, jobs=4)
+    assert result == (len(server.project.all_languages), 60, 60, 0)
+    assert server.calls['page_stats'] == 60
+
+    server.project.deleted.add(3)
+    server.project.updated[4] = 1500000000000
+    result = sync_meta_command(config)
+    assert (result.pages, result.changed, result.removed) == (58, 2, 2)
+    assert server.calls['page_stats'] == 62
+
+    with Mirror(config['mirror']) as mirror:
+        language_id = server.project.target_languages[0]['id']
+        assert mirror.find_pages(1, 'page-000003.json')[0]['update'] == 1500000000000
+        assert mirror.find_pages(1, 'page-000002.json') == []
+        assert mirror.page_stats(1, language_id, 4)['stats'] == 12
+        pages, total = mirror.pages(1, language_id, status=[PageStatus.completed], limit=5)
+        assert total == 14
+        assert [p['page_id'] for p in pages] == [1, 2, 4, 5, 6]
+
+
+def test_offline_ls_and_status(server, config):
+    online_ls = list(ls_command(config))
+    online_status = list(status_command(config))
+    sync_meta_command(config, stats=False)
+
+    calls = sum(server.calls.values())
+    offline = dict(config, offline=True)
+    assert list(ls_command(offline)) == online_ls
+    assert list(status_command(offline)) == online_status
+    assert sum(server.calls.values()) == calls
+
+
+def test_offline_pull(server, config, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    sync_meta_command(config, stats=False)
+    searches = server.calls['page_search']
+
+    config = dict(config, offline=True, pull={'targets': [{'file': 'i18n/<language_code>/<filename>.<extension>'}]})
+    pull_command(str(tmpdir), config, force=True)
+    assert len(os.listdir(str(tmpdir.join('i18n', 'fr-fr')))) == 15
+    assert server.calls['page_search'] == searches
+
+
+def test_warm_start(server, config):
+    sync_meta_command(config, jobs=4)
+    server.project.updated[4] = 1500000000000
+    server.project.deleted.add(3)
+    warm = dict(config, warm_start=True)
+
+    rows = list(page_status_command(warm, jobs=4))
+    rows = rows[:1] + sorted(rows[1:])
+    assert len(rows) == 1 + 29
+    # only the stats of the changed page are requested, in both languages
+    assert server.calls['page_stats'] == 60 + 2
+    online = list(page_status_command(config, jobs=4))
+    assert rows == online[:1] + sorted(online[1:])
+
+    # the listing refreshed the changed rows, so the mirror answers like the API
+    offline = dict(config, offline=True)
+    names = [row.name for row in ls_command(warm)]
+    assert [row.name for row in ls_command(offline)] == names
+    with Mirror(config['mirror']) as mirror:
+        language_id = server.project.target_languages[0]['id']
+        pages, _ = mirror.pages(1, language_id, search_string='page-000003.json')
+        assert pages[0]['update'] == 1500000000000
+    assert list(page_status_command(offline)) == rows
+
+
+def test_not_synced(config):
+    with pytest.raises(MirrorError):
+        list(ls_command(dict(config, offline=True)))
+
+    with Mirror(config['mirror']) as mirror:
+        api = MirrorAPI(mirror, config)
+        with pytest.raises(MirrorError):
+            api.download_file(1, 1)
@@ -0,0 +1,41 @@
+import io
+import json
+
+from qordoba.output import write_rows, field_name
+
+
+def test_output_formats():
+    rows = [['ID', '#SEGMENTS', 'COMPLETED %'], [1, 10, 50.0], [2, None, 100.0]]
+
+    stream = io.StringIO()
+    assert write_rows(rows, fmt='jsonl', stream=stream) == 2
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [
+        {'id': 1, 'segments': 10, 'completed': 50.0}, {'id': 2, 'segments': None, 'completed': 100.0}]
+
+    stream = io.StringIO()
+    write_rows(rows, fmt='csv', stream=stream)
+    assert stream.getvalue() == 'id,segments,completed\n1,10,50.0\n2,,100.0\n'
+
+    stream = io.StringIO()
+    write_rows([['PROJECT', 'LOCALE'], [u'Caf\xe9 "web"', u'ja-jp'], [u'\u30a6\u30a7\u30d6', None]], fmt='csv',
+               stream=stream)
+    assert stream.getvalue() == u'project,locale\n"Caf\xe9 ""web""",ja-jp\n\u30a6\u30a7\u30d6,\n'
+
+    stream = io.StringIO()
+    write_rows(rows, fmt='table', stream=stream)
+    assert '| 1  | 10        | 50.0        |' in stream.getvalue()
+    assert field_name('UPDATED_ON') == 'updated_on'
+
+
+def test_table_batches():
+    rows = [['ID', 'NAME']] + [[i, 'page-{}'.format(i)] for i in range(5)]
+
+    stream = io.StringIO()
+    write_rows(iter(rows), fmt='table', stream=stream, batch=2)
+    # two full batches and the rest, each table with the header
+    assert stream.getvalue().count('| ID |') == 3
+    assert 'page-4' in stream.getvalue()
+
+    stream = io.StringIO()
+    write_rows(iter(rows[:1]), fmt='table', stream=stream, batch=2)
+    assert stream.getvalue().count('| ID |') == 1
@@ -0,0 +1,52 @@
+import os
+import tempfile
+
+import pytest
+
+from qordoba.profiling import create_profiler, ProfilerError, tracemalloc
+from qordoba.stages import Stage, stage, iterate
+
+
+@pytest.fixture
+def output_prefix():
+    return os.path.join(tempfile.mkdtemp(), 'qor-test-profile')
+
+
+def _work():
+    with stage(Stage.search):
+        data = [str(i) * 10 for i in range(2000)]
+    for _ in iterate(Stage.write, range(3)):
+        pass
+    return data
+
+
+def test_cpu_profile(output_prefix):
+    profiler = create_profiler('cpu', output_prefix)
+    profiler.start()
+    _work()
+    pstats_path, collapsed_path = profiler.stop()
+
+    assert os.path.exists(pstats_path)
+    assert os.path.exists(collapsed_path)
+
+
+@pytest.mark.skipif(tracemalloc is None, reason='tracemalloc is not available')
+def test_mem_profile(output_prefix):
+    profiler = create_profiler('mem', output_prefix)
+    profiler.start()
+    data = _work()
+    path, = profiler.stop()
+
+    assert profiler.stages[Stage.search]['calls'] == 1
+    assert profiler.stages[Stage.search]['allocated'] > 0
+    assert profiler.stages[Stage.write]['calls'] == 4
+    with open(path) as f:
+        report = f.read()
+    assert 'Peak traced memory' in report
+    assert 'search' in report
+    assert data
+
+
+def test_unknown_mode(output_prefix):
+    with pytest.raises(ProfilerError):
+        create_profiler('io', output_prefix)
@@ -1,8 +1,11 @@
 import pytest
 
 from copy import deepcopy
+from mock import MagicMock
 
-from qordoba.project import ResponsePaginatedResult
+from qordoba.project import ResponsePaginatedResult, ApiResponse, exception_from_response, \
+    FileAlreadyExistResponse, QordobaResponseError
+from qordoba.utils import get_json_loads, JSON_BACKENDS
 from tests.assertions import assert_deep_equal
 
 
@@ -33,3 +36,37 @@ def test_paginated_result(api_pages_response, page_search_response):
 
     records = list(query.filter_by(lambda p: p['url'] == 'test.yml'))
     assert len(records) == 2
+
+
+def test_api_response_decodes_once(monkeypatch):
+    loads = MagicMock(return_value={'pages': []})
+    monkeypatch.setattr('qordoba.project.json_loads', loads)
+    raw = MagicMock(content=b'{"pages": []}', status_code=200)
+
+    resp = ApiResponse(raw)
+
+    assert resp.json() == {'pages': []}
+    assert resp.json() is resp.json()
+    assert resp.status_code == 200
+    loads.assert_called_once_with(b'{"pages": []}')
+
+
+def test_exception_from_response():
+    raw = MagicMock(content=b'{"errMessage": "File already exist"}')
+    error = exception_from_response(ApiResponse(raw))
+    assert isinstance(error, FileAlreadyExistResponse)
+    assert error.message == 'File already exist'
+
+    raw = MagicMock(content=b'Bad gateway')
+    error = exception_from_response(ApiResponse(raw))
+    assert type(error) is QordobaResponseError
+    assert error.message == 'Bad gateway'
+
+
+@pytest.mark.parametrize('backend', ['json', None])
+def test_json_backend(backend):
+    name, loads = get_json_loads(backend)
+    assert name in JSON_BACKENDS
+    assert loads(b'{"a": [1, "\\u00e9"]}') == {'a': [1, u'\xe9']}
+    with pytest.raises(ValueError):
+        loads(b'not json')
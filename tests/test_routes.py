@@ -0,0 +1,65 @@
+from argparse import ArgumentTypeError
+
+import pytest
+
+from qordoba.routes import Route, RouteTable, ROUTES, get_timeouts, TimeoutType
+from qordoba.utils import build_url
+
+API_URL = 'https://app.qordoba.com/api/'
+
+
+@pytest.fixture
+def routes():
+    return RouteTable(API_URL, project_id=1111, organization_id=22)
+
+
+@pytest.mark.parametrize('name,fields,segments', [
+    ('languages', {}, ('languages',)),
+    ('project', {}, ('projects', 1111)),
+    ('page_details', {'language_id': 190, 'page_id': 5}, ('projects', 1111, 'languages', 190, 'pages', 5)),
+    ('export', {'language_id': 190, 'page_id': 5, 'milestone': -100},
+     ('projects', 1111, 'languages', 190, 'pages', 5, 'segments', 'milestones', -100, 'export')),
+    ('delete_page', {'page_id': 5}, ('organizations', 22, 'projects', 1111, 'pages', 5)),
+])
+def test_route_url(routes, name, fields, segments):
+    assert routes.url(name, **fields) == build_url(API_URL, *segments)
+
+
+def test_route_url_query(routes):
+    url = routes.url('page_search', query={'limit': 50}, language_id=190)
+    assert url == build_url(API_URL, 'projects', 1111, 'languages', 190, 'page_settings', 'search', limit=50)
+
+
+def test_route_quote_and_base_url():
+    routes = RouteTable('http://127.0.0.1:8080/api', project_id='a b')
+    assert routes.url('project') == 'http://127.0.0.1:8080/api/projects/a%20b'
+    assert routes.url('file_download', query={'filename': 'x y.json'}) == \
+        'http://127.0.0.1:8080/api/file/download?filename=x+y.json'
+
+
+def test_route_missing_field(routes):
+    with pytest.raises(KeyError):
+        routes.url('page_details', page_id=1)
+
+
+def test_routes_unique():
+    assert len(set(r.name for r in ROUTES)) == len(ROUTES)
+    assert Route('x', 'GET', 'a/{b}').fields == ('b',)
+
+
+def test_timeouts():
+    timeouts = get_timeouts({'timeouts': {'connect': 3, 'download': 900}})
+    assert timeouts['download'] == (3.0, 900.0)
+    assert timeouts['metadata'] == (3.0, 60.0)
+    assert get_timeouts({})['upload'] == (10.0, 300.0)
+
+    with pytest.raises(ValueError):
+        get_timeouts({'timeouts': {'search': 1}})
+
+
+def test_timeout_type():
+    assert TimeoutType()('upload=120') == ('upload', 120.0)
+    with pytest.raises(ArgumentTypeError):
+        TimeoutType()('upload')
+    with pytest.raises(ArgumentTypeError):
+        TimeoutType()('search=1')
@@ -0,0 +1,46 @@
+from argparse import ArgumentTypeError
+
+import pytest
+
+from qordoba.sharding import Shard, ShardBalance, ShardType, stable_hash, filter_shard
+
+KEYS = ['{}:ru-ru'.format(i) for i in range(1000)]
+
+
+def test_stable_hash():
+    assert stable_hash('test.json') == stable_hash(u'test.json')
+    # must never change, otherwise machines running different versions would overlap
+    assert stable_hash('1:ru-ru') == 0x906bf715de127e09
+
+
+def test_shards_partition():
+    owned = []
+    for index in range(1, 5):
+        owned.append(set(filter_shard(KEYS, Shard(index, 4), key=lambda k: k)))
+
+    assert set.union(*owned) == set(KEYS)
+    assert sum(len(o) for o in owned) == len(KEYS)
+    for o in owned:
+        assert 200 < len(o) < 300
+
+
+def test_shard_balance():
+    balance = ShardBalance(Shard(2, 3))
+    owned = list(balance.filter(KEYS, key=lambda k: k))
+
+    assert balance.total == len(KEYS)
+    assert balance.counts[1] == len(owned)
+    assert balance.imbalance() < 10
+    assert balance.report().startswith('Shard 2/3: {} of 1000'.format(len(owned)))
+
+
+@pytest.mark.parametrize('value,index,count', [('1/1', 1, 1), ('3/4', 3, 4)])
+def test_shard_type(value, index, count):
+    shard = ShardType()(value)
+    assert (shard.index, shard.count) == (index, count)
+
+
+@pytest.mark.parametrize('value', ['0/4', '5/4', '1', 'a/b', '1/0'])
+def test_shard_type_error(value):
+    with pytest.raises(ArgumentTypeError):
+        ShardType()(value)
@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+import pytest
+from mock import MagicMock
+
+from qordoba.project import ProjectAPI
+from qordoba.tracing import Tracer, percentile, enable_tracing, disable_tracing
+
+
+@pytest.fixture
+def tracer():
+    yield enable_tracing(command='pull')
+    disable_tracing()
+
+
+@pytest.fixture
+def mock_request(monkeypatch):
+    resp = MagicMock(status_code=200, content=b'{"page": {"id": 1}}', headers={})
+    resp.elapsed = timedelta(milliseconds=15)
+    resp.request.body = b'{}'
+    request = MagicMock(return_value=resp)
+    monkeypatch.setattr('qordoba.project.requests.request', request)
+    return request
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_request_span(tracer, mock_request):
+    api = ProjectAPI({'access_token': 'token', 'project_id': 1})
+
+    api.get_page_details(190, 5)
+    api.get_page_details(190, 6)
+
+    assert len(tracer.spans) == 2
+    span = tracer.spans[0]
+    assert span.name == 'projects/{project_id}/languages/{language_id}/pages/{page_id}'
+    assert span.method == 'GET'
+    assert span.command == 'pull'
+    assert span.status == 200
+    assert span.wait == 0.015
+    assert span.bytes_in == len(b'{"page": {"id": 1}}')
+    assert span.bytes_out == 2
+
+    summary = tracer.summary()
+    assert len(summary) == 1
+    assert summary[0]['calls'] == 2
+    assert list(tracer.calls_per_command().values()) == [2]
+
+
+@pytest.mark.parametrize('file_name,fmt', [('trace.jsonl', 'jsonl'), ('trace.json', 'chrome')])
+def test_export(mock_request, file_name, fmt):
+    tracer = Tracer(command='ls')
+    span = tracer.start_span('languages', 'GET')
+    tracer.finish_span(span)
+
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, file_name)
+    tracer.export(path)
+
+    with open(path) as f:
+        if fmt == 'chrome':
+            events = json.load(f)['traceEvents']
+            assert events[0]['ph'] == 'X'
+            assert events[0]['name'] == 'GET languages'
+        else:
+            lines = [json.loads(l) for l in f]
+            assert lines[0]['name'] == 'languages'
+            assert lines[0]['command'] == 'ls'
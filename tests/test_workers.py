@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from qordoba.deadline import set_deadline, clear_deadline, DeadlineExceeded
+from qordoba.progress import enable_progress, disable_progress
+from qordoba.stages import stage, Stage
+from qordoba.workers import WorkerPool
+
+
+def test_pool_inline():
+    threads = set()
+    done = []
+
+    def func(unit):
+        threads.add(threading.current_thread().name)
+        done.append(unit)
+
+    assert WorkerPool(1).run(func, iter(range(5))) == 5
+    assert done == [0, 1, 2, 3, 4]
+    assert threads == {threading.current_thread().name}
+
+
+def test_pool_parallel():
+    active = []
+    max_active = []
+    lock = threading.Lock()
+
+    def func(unit):
+        with lock:
+            active.append(unit)
+            max_active.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.remove(unit)
+
+    assert WorkerPool(4).run(func, range(12)) == 12
+    assert max(max_active) == 4
+
+
+def test_pool_error():
+    done = []
+
+    def func(unit):
+        if unit == 3:
+            raise ValueError('unit 3')
+        time.sleep(0.01)
+        done.append(unit)
+
+    with pytest.raises(ValueError):
+        WorkerPool(2).run(func, range(100))
+    assert len(done) < 99
+
+
+def test_progress():
+    progress = enable_progress(interval=0)
+    try:
+        progress.add_total(4)
+
+        def func(unit):
+            with stage(Stage.download):
+                pass
+
+        WorkerPool(2).run(func, range(2))
+
+        assert progress.done == 2
+        assert progress.eta() is not None
+        assert progress.stages[Stage.download].done == 2
+        assert progress.render().startswith('2/4 files')
+        totals, stages = progress.summary()
+        assert totals[1][0] == 2
+        assert stages[1][:2] == [Stage.download, 2]
+    finally:
+        disable_progress()
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_deadline(jobs):
+    started = []
+
+    def func(unit):
+        started.append(unit)
+        time.sleep(0.02)
+
+    set_deadline(0.05)
+    try:
+        with pytest.raises(DeadlineExceeded) as e:
+            WorkerPool(jobs).run(func, list(range(100)))
+    finally:
+        clear_deadline()
+
+    # units in flight were finished, the rest was never started
+    assert 0 < e.value.done == len(started) < 100
+    assert e.value.left == 100 - len(started)
+    assert 'not started' in str(e.value)
+
+
+def test_deadline_not_reached():
+    set_deadline(10)
+    try:
+        assert WorkerPool(2).run(lambda unit: None, iter(range(10))) == 10
+    finally:
+        clear_deadline()
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from qordoba.commands.pull import pull_command
+from qordoba.session import get_session
+from qordoba.settings import dump_settings
+from qordoba.workspace import WorkspaceError, load_workspace, run_workspace, summary_rows
+
+PULL = {'targets': [{'file': 'i18n/<language_code>/<filename>.<extension>'}]}
+
+
+def make_workspace(root, server, projects):
+    path = os.path.join(root, '.qordoba-workspace.yml')
+    dump_settings(path, {'access_token': server.access_token, 'api_url': server.url, 'pull': PULL,
+                         'projects': projects})
+    return path
+
+
+def test_load_workspace(tmpdir, server):
+    root = str(tmpdir)
+    os.mkdir(os.path.join(root, 'web'))
+    dump_settings(os.path.join(root, 'web', '.qordoba.yml'), {'project_id': 7, 'organization_id': 3})
+    path = make_workspace(root, server, ['web', {'path': 'api', 'name': 'backend', 'project_id': 8}])
+
+    web, api = load_workspace(path, organization_id=None, api_url='http://example.com/')
+
+    assert web.name == 'web'
+    assert web.curdir == os.path.join(root, 'web')
+    assert (web.config['project_id'], web.config['organization_id']) == (7, 3)
+    assert web.config['access_token'] == server.access_token
+    assert web.config['api_url'] == 'http://example.com/'
+    assert (api.name, api.config['project_id']) == ('backend', 8)
+
+    with pytest.raises(WorkspaceError):
+        load_workspace(make_workspace(root, server, [{'path': 'no-id'}]))
+
+
+def test_run_workspace(tmpdir, server, monkeypatch):
+    root = str(tmpdir)
+    monkeypatch.chdir(root)
+    path = make_workspace(root, server, [{'path': 'a', 'project_id': server.project.project_id},
+                                         {'path': 'b', 'project_id': 2, 'access_token': 'expired'},
+                                         {'path': 'c', 'project_id': server.project.project_id}])
+    for name in ('a', 'b', 'c'):
+        os.mkdir(os.path.join(root, name))
+    sessions = []
+
+    def run(project, pool):
+        sessions.append(get_session())
+        return pull_command(project.curdir, project.config, jobs=pool)
+
+    results = run_workspace(load_workspace(path), run, jobs=2)
+
+    assert [(r.name, r.files) for r in results] == [('a', 10), ('b', None), ('c', 10)]
+    assert results[1].error is not None
+    for name in ('a', 'c'):
+        assert len(os.listdir(os.path.join(root, name, 'i18n', 'fr-fr'))) == 5
+    assert not os.path.exists(os.path.join(root, 'i18n'))
+    # the catalog of languages and the connections are shared by the projects
+    assert server.calls['languages'] == 1
+    assert sessions[0] is not None and sessions.count(sessions[0]) == 3
+    assert get_session() is None
+    assert len(summary_rows(results)) == 4